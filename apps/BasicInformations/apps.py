@@ -6,4 +6,10 @@ class BasicInformationsConfig(AppConfig):
     name = 'apps.BasicInformations'
 
     verbose_name = _('اطلاعات پایه')
-    verbose_name_plural = _('اطلاعات پایه') 
+    verbose_name_plural = _('اطلاعات پایه')
+
+    def ready(self):
+        import apps.BasicInformations.checks
+        import apps.BasicInformations.signals
+        from .refdata import install_reference_descriptors
+        install_reference_descriptors()
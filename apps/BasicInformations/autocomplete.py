@@ -0,0 +1,95 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.admin.utils import lookup_needs_distinct
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+
+from .queryplan import str_query_plan
+from .search import matching_ids, related_fields, search_related_q, search_terms
+
+PAGE_SIZE = AutocompleteJsonView.paginate_by
+
+
+def related_matching_ids(queryset, term, related, offset, limit):
+    """The ids of the rows of `queryset` matching `term` in the index or in `related`.
+
+    `related` are lookups through a relation, see `search_related_q`. The rows
+    come in the order of their ids.
+    """
+    opts = queryset.model._meta
+    matches = queryset.filter(search_related_q(queryset.model, term, related))
+    if any(lookup_needs_distinct(opts, name) for name in related):
+        matches = matches.distinct()
+    return list(matches.order_by('pk').values_list('pk', flat=True)[offset:offset + limit])
+
+
+def autocomplete(queryset, term, page=1, search_fields=()):
+    """The (id, label) pairs of page `page` of the rows of `queryset` matching `term`.
+
+    Returns them with whether another page follows. The rows come in the order
+    of the search index, or of their ids without a term or when `search_fields`
+    has lookups through a relation; only the columns `str()` reads are loaded
+    and nothing is counted.
+    """
+    offset = (page - 1) * PAGE_SIZE
+    plan = str_query_plan(queryset.model)
+    related = related_fields(search_fields)
+    if search_terms(term):
+        if related:
+            ids = related_matching_ids(queryset, term, related, offset, PAGE_SIZE + 1)
+        else:
+            ids = matching_ids(queryset, term, offset, PAGE_SIZE + 1)
+        more = len(ids) > PAGE_SIZE
+        ids = ids[:PAGE_SIZE]
+        found = plan.apply(queryset.model._base_manager.all()).in_bulk(ids)
+        rows = [found[pk] for pk in ids if pk in found]
+    else:
+        rows = list(plan.apply(queryset.order_by('pk'))[offset:offset + PAGE_SIZE + 1])
+        more = len(rows) > PAGE_SIZE
+        rows = rows[:PAGE_SIZE]
+    return [(str(row.pk), str(row)) for row in rows], more
+
+
+def cache_key(user, model, term, page, filters):
+    """One key for the users who see the same rows: the superusers, or a garrison."""
+    scope = 'all' if user.is_superuser else getattr(user, 'garrison_id', None)
+    key = f'{model._meta.label}|{scope}|{sorted(filters.items())!r}|{search_terms(term)!r}|{page}'
+    return 'autocomplete:' + hashlib.md5(key.encode()).hexdigest()
+
+
+class IndexedAutocompleteJsonView(AutocompleteJsonView):
+    """Answer the autocomplete widgets from `autocomplete()`, cached for a while.
+
+    `ModelAdmin.get_search_results` is not called: the admin narrows the
+    choices in `autocomplete_filters` instead. The JSON is the one of Django.
+    """
+
+    def get(self, request, *args, **kwargs):
+        search_fields = self.model_admin.get_search_fields(request)
+        if not search_fields:
+            raise Http404(
+                '%s must have search_fields for the autocomplete_view.' %
+                type(self.model_admin).__name__
+            )
+        if not self.has_perm(request):
+            return JsonResponse({'error': '403 Forbidden'}, status=403)
+
+        term = request.GET.get('term', '')
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        filters = self.model_admin.autocomplete_filters(request)
+        key = cache_key(request.user, self.model_admin.model, term, page, filters)
+        found = cache.get(key)
+        if found is None:
+            queryset = self.model_admin.get_queryset(request).filter(**filters)
+            found = autocomplete(queryset, term, page, search_fields)
+            cache.set(key, found, settings.AUTOCOMPLETE_CACHE_TIMEOUT)
+        results, more = found
+        return JsonResponse({
+            'results': [{'id': pk, 'text': text} for pk, text in results],
+            'pagination': {'more': more},
+        })
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+def is_shared_cache(cache):
+    """Whether what one process stores in `cache` is seen by the others."""
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+@register(Tags.caches)
+def check_reference_data_cache(app_configs, **kwargs):
+    """The versions of the reference tables must be seen by every worker."""
+    if not is_shared_cache(caches[settings.REFERENCE_DATA_CACHE]):
+        return [Error(
+            f'REFERENCE_DATA_CACHE {settings.REFERENCE_DATA_CACHE!r} is not shared '
+            f'by the processes, which would keep serving stale reference data.',
+            hint='Point it at a cache shared by the workers, e.g. a file based, '
+                 'database or memcached cache.',
+            id='BasicInformations.E001')]
+    return []
@@ -0,0 +1,175 @@
+import csv
+import tempfile
+from itertools import islice
+
+from django.conf import settings
+from django.db.models.constants import LOOKUP_SEP
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .jalali import DATE_FORMAT, DATETIME_FORMAT, format_jalali_column
+from .refdata import is_reference_model, reference_table
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class ExportColumn:
+    """One column of an export: the values of `lookups` turned into text.
+
+    A foreign key to a model with `reference_data` is labelled from its
+    table in `refdata`, without a join. Another foreign key is labelled by
+    the columns of its `str_fields`, read in the same query.
+    """
+
+    def __init__(self, model, lookup, title=None, format=None):
+        field = None
+        for name in lookup.split(LOOKUP_SEP):
+            field = model._meta.get_field(name)
+            if field.is_relation:
+                model = field.related_model
+        self.title = str(title or field.verbose_name)
+        self.lookups = [lookup]
+        self.labels = None
+        self.format = None
+        if field.is_relation and is_reference_model(model):
+            self.labels = {obj.pk: str(obj) for obj in reference_table(model).all()}
+        elif field.is_relation:
+            names = [name for name in getattr(model, 'str_fields', ())
+                     if not model._meta.get_field(name).is_relation]
+            self.lookups = [f'{lookup}{LOOKUP_SEP}{name}' for name in names] or [lookup]
+        elif field.choices:
+            self.labels = dict(field.flatchoices)
+        elif field.get_internal_type() == 'BooleanField':
+            self.labels = {True: 'بله', False: 'خیر'}
+        elif field.get_internal_type() == 'DateTimeField':
+            self.format = format or DATETIME_FORMAT
+        elif field.get_internal_type() == 'DateField':
+            self.format = format or DATE_FORMAT
+
+    def texts(self, *columns):
+        """The cells of this column, from the values of each of its lookups."""
+        if self.format:
+            columns = [format_jalali_column(values, self.format) for values in columns]
+        elif self.labels is not None:
+            columns = [[self.labels.get(value, value) for value in values]
+                       for values in columns]
+        return [' '.join(str(value) for value in values if value not in (None, ''))
+                for values in zip(*columns)]
+
+
+def default_export_fields(model_admin):
+    """The columns of `list_display` backed by the database, with their titles.
+
+    Fields, `jalali_column`s and methods sorted by an `admin_order_field`;
+    other methods, e.g. links, are left out.
+    """
+    model = model_admin.model
+    fields = []
+    for name in model_admin.list_display:
+        if isinstance(name, str) and name != '__str__':
+            if any(field.name == name for field in model._meta.get_fields()):
+                fields.append(name)
+                continue
+            attr = getattr(model_admin, name, None) or getattr(model, name, None)
+        else:
+            attr = name
+        if hasattr(attr, 'jalali_field'):
+            fields.append((attr.jalali_field, attr.short_description, attr.jalali_format))
+        elif isinstance(getattr(attr, 'admin_order_field', None), str):
+            fields.append((attr.admin_order_field.lstrip('-'),
+                           getattr(attr, 'short_description', None)))
+    return fields
+
+
+def export_columns(model_admin):
+    """The `ExportColumn`s of the admin's `export_fields`, or of its changelist.
+
+    `export_fields` lists lookups, or (lookup, title[, Jalali format]) tuples.
+    """
+    fields = model_admin.export_fields
+    if fields is None:
+        fields = default_export_fields(model_admin)
+    return [ExportColumn(model_admin.model, *((field,) if isinstance(field, str) else field))
+            for field in fields]
+
+
+def export_rows(queryset, columns, chunk_size=None):
+    """Yield the rows of `queryset` as lists of texts, a chunk of rows at a time.
+
+    The values are read with values_list() through iterator(), so the rows
+    are never all in memory, and the dates of a chunk converted together.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    lookups = [lookup for column in columns for lookup in column.lookups]
+    rows = queryset.values_list(*lookups).iterator(chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        values = iter(list(zip(*chunk)))
+        cells = [column.texts(*islice(values, len(column.lookups))) for column in columns]
+        yield list(zip(*cells))
+
+
+class Echo:
+    """A file for csv.writer, returning what is written instead of keeping it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(titles, chunks):
+    writer = csv.writer(Echo())
+    # with a BOM, so that Excel reads the Persian text
+    yield '\ufeff' + writer.writerow(titles)
+    for chunk in chunks:
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def export_filename(name, format):
+    return f'{name}-{timezone.localtime():%Y%m%d-%H%M}.{format}'
+
+
+def csv_response(titles, chunks, name):
+    """Stream the CSV, the first bytes sent before the first row is read."""
+    response = StreamingHttpResponse(iter_csv(titles, chunks),
+                                     content_type='text/csv; charset=utf-8')
+    filename = export_filename(name, 'csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_response(titles, chunks, name):
+    """The XLSX, written row by row to a temporary file then sent.
+
+    A zip can not be streamed before it is complete; openpyxl's write-only
+    mode keeps the memory flat meanwhile. Raises ImportError without openpyxl.
+    """
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(titles)
+    for chunk in chunks:
+        for row in chunk:
+            sheet.append(row)
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, content_type=XLSX_CONTENT_TYPE,
+                        filename=export_filename(name, 'xlsx'))
+
+
+def table_response(titles, chunks, name, format):
+    """Download `chunks`, lists of rows of texts under `titles`, as CSV or XLSX."""
+    if format == 'xlsx':
+        return xlsx_response(titles, chunks, name)
+    return csv_response(titles, chunks, name)
+
+
+def export_response(model_admin, queryset, format):
+    columns = export_columns(model_admin)
+    return table_response([column.title for column in columns],
+                          export_rows(queryset, columns),
+                          queryset.model._meta.model_name, format)
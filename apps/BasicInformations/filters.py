@@ -0,0 +1,115 @@
+import re
+from collections import Counter
+
+import jdatetime
+from django.conf import settings
+from django.contrib.admin import FieldListFilter, RelatedFieldListFilter, SimpleListFilter
+from django.db import models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .jalali import date_range_q, jalali_period_range
+from .refdata import is_reference_model, reference_choices
+
+JALALI_PERIOD = re.compile(r'^(\d{4})(?:/(\d{1,2})(?:/(\d{1,2}))?)?$')
+
+
+class JalaliDateHierarchyFilter(SimpleListFilter):
+    """Drill down a date field by Jalali year, month and day, like `date_hierarchy`.
+
+    The buckets and their counts come from a single `TruncDate` aggregate and
+    selecting one filters the changelist with a range lookup, so the
+    queryset stays lazy and paginated.
+    """
+    field_name = None
+
+    def selected_period(self):
+        match = JALALI_PERIOD.match(self.value() or '')
+        if not match:
+            return None
+        period = tuple(int(part) for part in match.groups() if part)
+        try:
+            jalali_period_range(*period)
+        except ValueError:
+            return None
+        return period
+
+    def period_q(self, model, period):
+        field = model._meta.get_field(self.field_name)
+        return date_range_q(field, *jalali_period_range(*period))
+
+    def day_counts(self, queryset):
+        field = queryset.model._meta.get_field(self.field_name)
+        if isinstance(field, models.DateTimeField):
+            tzinfo = timezone.get_default_timezone() if settings.USE_TZ else None
+            day = TruncDate(self.field_name, tzinfo=tzinfo)
+        else:
+            day = models.F(self.field_name)
+        return queryset.order_by().annotate(day=day).values('day').annotate(
+            count=Count('pk')).values_list('day', 'count')
+
+    def lookups(self, request, model_admin):
+        selected = self.selected_period() or ()
+        # years, then the months of a year, then the days of a month
+        depth = min(len(selected), 2)
+        queryset = model_admin.get_queryset(request)
+        if depth:
+            queryset = queryset.filter(self.period_q(model_admin.model, selected[:depth]))
+
+        buckets = Counter()
+        for day, count in self.day_counts(queryset):
+            if day is None:
+                continue
+            jday = jdatetime.date.fromgregorian(date=day)
+            buckets[(jday.year, jday.month, jday.day)[:depth + 1]] += count
+
+        parents = [selected[:size] for size in range(1, len(selected) + 1)
+                   if size <= depth]
+        choices = [(self.format_period(period), self.format_period(period))
+                   for period in parents]
+        choices += [(self.format_period(period),
+                     '{0} ({1})'.format(self.format_period(period), count))
+                    for period, count in sorted(buckets.items())]
+        return choices
+
+    def queryset(self, request, queryset):
+        selected = self.selected_period()
+        if selected:
+            return queryset.filter(self.period_q(queryset.model, selected))
+
+    @staticmethod
+    def format_period(period):
+        return '/'.join(['{0:04d}'.format(period[0])] +
+                        ['{0:02d}'.format(part) for part in period[1:]])
+
+
+class CreationDateFilter(JalaliDateHierarchyFilter):
+    title = 'تاریخ و زمان درج'
+    parameter_name = 'created_jalali'
+    field_name = 'created'
+
+
+class ReferenceFieldListFilter(RelatedFieldListFilter):
+    """The choices of a relation to a reference model, without a query.
+
+    Used instead of `RelatedFieldListFilter` for every such relation, see
+    `refdata.reference_choices`.
+    """
+
+    @staticmethod
+    def applies_to(field):
+        return (field.is_relation and not field.auto_created
+                and is_reference_model(field.related_model)
+                and not field.remote_field.limit_choices_to)
+
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        choices = reference_choices(field.related_model, ordering)
+        if choices is None:
+            return super().field_choices(field, request, model_admin)
+        return choices
+
+
+FieldListFilter.register(
+    ReferenceFieldListFilter.applies_to, ReferenceFieldListFilter, take_priority=True)
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+import datetime
+import functools
+import re
+
+import jdatetime
+from django.conf import settings
+from django.db import models
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils import timezone
+
+PERSIAN_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+JALALI_TERM = re.compile(r'^(\d{2}|\d{4})/(\d{1,2})(?:/(\d{1,2}))?$')
+RANGE_SEPARATOR = re.compile(r'\s*(?:-|تا)\s*')
+
+DATE_FORMAT = '%y/%m/%d'
+DATETIME_FORMAT = '%y/%m/%d - %H:%M:%S'
+# the arguments of the str.format() templates built by `jalali_template`
+DIRECTIVES = {'%Y': '{0:04d}', '%y': '{1:02d}', '%m': '{2:02d}', '%d': '{3:02d}',
+              '%H': '{4:02d}', '%M': '{5:02d}', '%S': '{6:02d}', '%%': '%'}
+DIRECTIVE = re.compile('%.')
+# Gregorian days converted once at startup, the others on demand
+DAY_TABLE_FIRST = datetime.date(1990, 1, 1)
+DAY_TABLE_LAST = datetime.date(2049, 12, 31)
+
+
+def full_jalali_year(year):
+    """Expand a two digit year, as printed by `%y`, to the nearest Jalali year."""
+    if year >= 100:
+        return year
+    this_year = jdatetime.date.today().year
+    candidate = this_year - this_year % 100 + year
+    return candidate - 100 if candidate > this_year + 20 else candidate
+
+
+def jalali_period_range(year, month=None, day=None):
+    """Return the Gregorian `[start, end)` dates of a Jalali year, month or day.
+
+    Raises ValueError for dates which do not exist in the Jalali calendar.
+    """
+    if day:
+        start = jdatetime.date(year, month, day)
+        end = start + datetime.timedelta(days=1)
+    elif month:
+        start = jdatetime.date(year, month, 1)
+        end = jdatetime.date(year + 1, 1, 1) if month == 12 else\
+            jdatetime.date(year, month + 1, 1)
+    else:
+        start = jdatetime.date(year, 1, 1)
+        end = jdatetime.date(year + 1, 1, 1)
+    return start.togregorian(), end.togregorian()
+
+
+def jalali_year_case(field, first, last):
+    """A CASE giving the Jalali year of the dates of `field` from `first` to `last`.
+
+    One WHEN per year, on the Gregorian bounds of the year, so that the
+    database can group the rows by Jalali year.
+    """
+    whens = []
+    for year in range(jdatetime.date.fromgregorian(date=first).year,
+                      jdatetime.date.fromgregorian(date=last).year + 1):
+        start, end = jalali_period_range(year)
+        whens.append(When(**{f'{field}__gte': start, f'{field}__lt': end}, then=Value(year)))
+    return Case(*whens, output_field=IntegerField())
+
+
+@functools.lru_cache(maxsize=4096)
+def add_jalali_months(date, months):
+    """Add `months` to a Gregorian date, counting them as Jalali calendar months."""
+    jdate = jdatetime.date.fromgregorian(date=date)
+    year, month = divmod(jdate.month - 1 + months, 12)
+    year, month = jdate.year + year, month + 1
+    last_day = jdatetime.j_days_in_month[month - 1]
+    if month == 12 and jdatetime.date(year, 1, 1).isleap():
+        last_day += 1
+    return jdatetime.date(year, month, min(jdate.day, last_day)).togregorian()
+
+
+def jalali_months(first, last):
+    """Yield the Jalali (year, month) of every month from date `first` to `last`."""
+    first = jdatetime.date.fromgregorian(date=first)
+    last = jdatetime.date.fromgregorian(date=last)
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        yield year, month
+        year, month = (year, month + 1) if month < 12 else (year + 1, 1)
+
+
+def build_day_table(first, last):
+    """The Jalali (year, month, day) of every Gregorian day from `first` to `last`.
+
+    Only `first` goes through jdatetime, the next days are counted from it.
+    """
+    jdate = jdatetime.date.fromgregorian(date=first)
+    year, month, day = jdate.year, jdate.month, jdate.day
+    month_days = jdatetime.j_days_in_month[month - 1] + (month == 12 and jdate.isleap())
+    table = []
+    for _ in range(last.toordinal() - first.toordinal() + 1):
+        table.append((year, month, day))
+        day += 1
+        if day > month_days:
+            day = 1
+            year, month = (year, month + 1) if month < 12 else (year + 1, 1)
+            month_days = jdatetime.j_days_in_month[month - 1]
+            if month == 12 and jdatetime.date(year, 1, 1).isleap():
+                month_days += 1
+    return tuple(table)
+
+
+DAY_TABLE = build_day_table(DAY_TABLE_FIRST, DAY_TABLE_LAST)
+
+
+@functools.lru_cache(maxsize=4096)
+def convert_day(date):
+    jdate = jdatetime.date.fromgregorian(date=date)
+    return jdate.year, jdate.month, jdate.day
+
+
+def jalali_day(date):
+    """The Jalali (year, month, day) of a Gregorian date."""
+    index = date.toordinal() - DAY_TABLE_FIRST.toordinal()
+    if 0 <= index < len(DAY_TABLE):
+        return DAY_TABLE[index]
+    return convert_day(date)
+
+
+@functools.lru_cache(maxsize=None)
+def jalali_template(format):
+    """The str.format() template of a strftime `format`, or None if it has other directives."""
+    parts = DIRECTIVE.split(format.replace('{', '{{').replace('}', '}}'))
+    directives = DIRECTIVE.findall(format)
+    if any(directive not in DIRECTIVES for directive in directives):
+        return None
+    return ''.join(part + DIRECTIVES[directive]
+                   for part, directive in zip(parts, directives)) + parts[-1]
+
+
+def format_jalali(value, format=DATETIME_FORMAT, tz=None):
+    """`value`, a date or a datetime shown in local time, formatted as a Jalali date.
+
+    The same as `datetime2jalali(value).strftime(format)`, or `date2jalali`,
+    without building a jdatetime object. Returns None for None. `tz` is the
+    current time zone, when the caller already has it.
+    """
+    if value is None:
+        return None
+    template = jalali_template(format)
+    if isinstance(value, datetime.datetime):
+        if settings.USE_TZ and timezone.is_aware(value):
+            value = value.astimezone(tz or timezone.get_current_timezone())
+        if template is None:
+            return jdatetime.datetime.fromgregorian(datetime=value).strftime(format)
+        year, month, day = jalali_day(value.date())
+        return template.format(year, year % 100, month, day,
+                               value.hour, value.minute, value.second)
+    if template is None:
+        return jdatetime.date.fromgregorian(date=value).strftime(format)
+    year, month, day = jalali_day(value)
+    return template.format(year, year % 100, month, day, 0, 0, 0)
+
+
+def format_jalali_column(values, format=DATETIME_FORMAT):
+    """`format_jalali` of a column of values, e.g. the `created` of a changelist page.
+
+    Repeated values, common in a page sorted by date, are formatted once,
+    and the time zone is looked up once for the column.
+    """
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    formatted = {}
+    texts = []
+    for value in values:
+        if value not in formatted:
+            formatted[value] = format_jalali(value, format, tz)
+        texts.append(formatted[value])
+    return texts
+
+
+def parse_jalali_term(term):
+    """Return the Gregorian `[start, end)` dates of a 'yy/mm/dd' or 'yy/mm' term.
+
+    Returns None when the term is not a valid Jalali day or month.
+    """
+    match = JALALI_TERM.match(term.strip().translate(PERSIAN_DIGITS))
+    if not match:
+        return None
+    year, month, day = match.groups()
+    try:
+        return jalali_period_range(full_jalali_year(int(year)), int(month),
+                                   int(day) if day else None)
+    except ValueError:
+        return None
+
+
+def parse_jalali_day(term):
+    """Return the Gregorian date of a 'yy/mm/dd' or 'yyyy/mm/dd' term, or None."""
+    bounds = parse_jalali_term(term)
+    if bounds is None or bounds[1] - bounds[0] != datetime.timedelta(days=1):
+        return None
+    return bounds[0]
+
+
+def jalali_search_range(search_term):
+    """Return the Gregorian `[start, end)` dates covered by a Jalali search term.
+
+    Accepts a single day or month, or a range of them such as
+    '02/01/01 - 02/03/15' or '02/01 تا 02/06'.
+    """
+    if not search_term:
+        return None
+    parts = RANGE_SEPARATOR.split(search_term.strip(), maxsplit=1)
+    bounds = [parse_jalali_term(part) for part in parts]
+    if not all(bounds):
+        return None
+    start = min(bound[0] for bound in bounds)
+    end = max(bound[1] for bound in bounds)
+    return start, end
+
+
+def local_midnight(date):
+    """The start of `date` in the project time zone (Asia/Tehran).
+
+    On the days the clocks moved forward at midnight, the day starts at 01:00.
+    """
+    value = datetime.datetime.combine(date, datetime.time.min)
+    if settings.USE_TZ:
+        return timezone.make_aware(value, timezone.get_default_timezone(), is_dst=False)
+    return value
+
+
+def date_range_q(field, start, end):
+    """Build a range lookup on `field` which the database can serve from an index."""
+    if isinstance(field, models.DateTimeField):
+        start, end = local_midnight(start), local_midnight(end)
+    return Q(**{f'{field.name}__gte': start, f'{field.name}__lt': end})
+
+
+def jalali_date_q(model, search_term, field_names):
+    """OR together the range lookups of `field_names` for a Jalali search term.
+
+    Returns None when `search_term` is not a Jalali date.
+    """
+    bounds = jalali_search_range(search_term)
+    if bounds is None:
+        return None
+    query = Q()
+    for name in field_names:
+        query |= date_range_q(model._meta.get_field(name), *bounds)
+    return query
@@ -0,0 +1,31 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.BasicInformations.search import index_objects, model_documents
+
+
+class Command(BaseCommand):
+    help = ('Rewrite the search documents, e.g. after bulk changes which '
+            'bypassed the save signals.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', metavar='app_label.Model',
+                            help='Only rebuild these models (default: every indexed model)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        indexed = [model for model in apps.get_models()
+                   if hasattr(model, 'search_document_fields')]
+        if options['models']:
+            wanted = {label.lower() for label in options['models']}
+            indexed = [model for model in indexed if model._meta.label.lower() in wanted]
+            if len(indexed) != len(wanted):
+                raise CommandError('Only these models are indexed: {}.'.format(', '.join(
+                    model._meta.label for model in apps.get_models()
+                    if hasattr(model, 'search_document_fields'))))
+        for model in indexed:
+            rows = model._base_manager.all()
+            model_documents(model).exclude(object_id__in=rows.values('pk')).delete()
+            written = index_objects(rows, options['chunk_size'])
+            self.stdout.write(f'{model._meta.label}: {written} documents.')
+        self.stdout.write(self.style.SUCCESS('Rebuilt the search index.'))
@@ -0,0 +1,112 @@
+# Generated by Django 3.1.14 on 2026-10-18 18:32
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# frozen copy of apps.BasicInformations.search.normalize as of this migration
+PERSIAN_LETTERS = str.maketrans({
+    '\u064a': '\u06cc', '\u0649': '\u06cc', '\u0643': '\u06a9',  # yeh, keheh
+    '\u0629': '\u0647', '\u06c0': '\u0647', '\u0624': '\u0648',  # heh, waw
+    '\u0623': '\u0627', '\u0625': '\u0627', '\u0622': '\u0627', '\u0671': '\u0627',  # alef
+})
+PERSIAN_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+IGNORED_CHARACTERS = re.compile('[\u200c\u200d\u0640\u064b-\u065f\u0670]')
+
+
+def normalize(text):
+    text = IGNORED_CHARACTERS.sub('', str(text))
+    return text.translate(PERSIAN_LETTERS).translate(PERSIAN_DIGITS).casefold()
+
+
+TABLE = 'BasicInformations_searchdocument'
+FTS_TABLE = TABLE + '_fts'
+
+SEARCH_DOCUMENT_FIELDS = {
+    ('Garrisons', 'Personal'): (
+        'first_name', 'last_name', 'personalCode', 'nationalCode', 'jobSubject', 'actionJob',
+        'phoneNumber', 'mobile_phone_number', 'office_phone_number', 'description'),
+    ('Garrisons', 'Soldier'): (
+        'first_name', 'last_name', 'national_code', 'father_name', 'phone_number',
+        'home_phone_number', 'father_phone_number', 'mother_phone_number', 'description'),
+    ('Garrisons', 'Location'): ('name', 'liable', 'phone_number', 'description'),
+    ('Stores', 'Equipment'): (
+        'name', 'brand', 'model', 'serial_number', 'sis_number', 'lp_number',
+        'deploy_location', 'imperialistic', 'ip_address', 'port_number', 'amount',
+        'description_equipment', 'description'),
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5('
+            f'document, content="{TABLE}", content_rowid="id")')
+        schema_editor.execute(
+            f'CREATE TRIGGER "{FTS_TABLE}_insert" AFTER INSERT ON "{TABLE}" BEGIN '
+            f'INSERT INTO "{FTS_TABLE}"(rowid, document) VALUES (new.id, new.document); END')
+        schema_editor.execute(
+            f'CREATE TRIGGER "{FTS_TABLE}_delete" AFTER DELETE ON "{TABLE}" BEGIN '
+            f'INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, document) '
+            f'VALUES (\'delete\', old.id, old.document); END')
+        schema_editor.execute(
+            f'CREATE TRIGGER "{FTS_TABLE}_update" AFTER UPDATE ON "{TABLE}" BEGIN '
+            f'INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, document) '
+            f'VALUES (\'delete\', old.id, old.document); '
+            f'INSERT INTO "{FTS_TABLE}"(rowid, document) VALUES (new.id, new.document); END')
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX "{TABLE}_tsv" ON "{TABLE}" '
+            f"USING gin (to_tsvector('simple', document))")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE "{FTS_TABLE}"')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX "{TABLE}_tsv"')
+
+
+def fill_search_documents(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    SearchDocument = apps.get_model('BasicInformations', 'SearchDocument')
+    for (app_label, model_name), fields in SEARCH_DOCUMENT_FIELDS.items():
+        model = apps.get_model(app_label, model_name)
+        content_type, _ = ContentType.objects.get_or_create(
+            app_label=app_label, model=model_name.lower())
+        documents = (
+            SearchDocument(content_type=content_type, object_id=row[0], document=' '.join(
+                normalize(value) for value in row[1:] if value not in (None, '')))
+            for row in model.objects.values_list('pk', *fields).iterator())
+        SearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('BasicInformations', '0001_initial'),
+        ('Garrisons', '0004_report_job'),
+        ('Stores', '0003_history_event_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('document', models.TextField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 3.1.14 on 2026-10-18 21:05
+
+import re
+
+from django.db import migrations
+
+# frozen copy of apps.BasicInformations.search.normalize as of this migration
+PERSIAN_LETTERS = str.maketrans({
+    '\u064a': '\u06cc', '\u0649': '\u06cc', '\u0643': '\u06a9',  # yeh, keheh
+    '\u0629': '\u0647', '\u06c0': '\u0647', '\u0624': '\u0648',  # heh, waw
+    '\u0623': '\u0627', '\u0625': '\u0627', '\u0622': '\u0627', '\u0671': '\u0627',  # alef
+})
+PERSIAN_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+IGNORED_CHARACTERS = re.compile('[\u200c\u200d\u0640\u064b-\u065f\u0670]')
+
+
+def normalize(text):
+    text = IGNORED_CHARACTERS.sub('', str(text))
+    return text.translate(PERSIAN_LETTERS).translate(PERSIAN_DIGITS).casefold()
+
+
+TABLE = 'BasicInformations_searchdocument'
+FTS_TABLE = TABLE + '_fts'
+
+
+def create_fts_table(schema_editor, columns):
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    for trigger in ('insert', 'delete', 'update'):
+        schema_editor.execute(f'DROP TRIGGER "{FTS_TABLE}_{trigger}"')
+    schema_editor.execute(f'DROP TABLE "{FTS_TABLE}"')
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5('
+        f'{names}, content="{TABLE}", content_rowid="id")')
+    schema_editor.execute(
+        f'CREATE TRIGGER "{FTS_TABLE}_insert" AFTER INSERT ON "{TABLE}" BEGIN '
+        f'INSERT INTO "{FTS_TABLE}"(rowid, {names}) VALUES (new.id, {new}); END')
+    schema_editor.execute(
+        f'CREATE TRIGGER "{FTS_TABLE}_delete" AFTER DELETE ON "{TABLE}" BEGIN '
+        f'INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, {names}) '
+        f'VALUES (\'delete\', old.id, {old}); END')
+    schema_editor.execute(
+        f'CREATE TRIGGER "{FTS_TABLE}_update" AFTER UPDATE ON "{TABLE}" BEGIN '
+        f'INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, {names}) '
+        f'VALUES (\'delete\', old.id, {old}); '
+        f'INSERT INTO "{FTS_TABLE}"(rowid, {names}) VALUES (new.id, {new}); END')
+    schema_editor.execute(f'INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}") VALUES (\'rebuild\')')
+
+
+def index_content_type(apps, schema_editor):
+    # a prefix common in one model is no longer walked when searching another
+    if schema_editor.connection.vendor == 'sqlite':
+        create_fts_table(schema_editor, ('document', 'content_type_id'))
+
+
+def unindex_content_type(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        create_fts_table(schema_editor, ('document',))
+
+
+def fill_garrison_documents(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    SearchDocument = apps.get_model('BasicInformations', 'SearchDocument')
+    Garrison = apps.get_model('Garrisons', 'Garrison')
+    content_type, _ = ContentType.objects.get_or_create(app_label='Garrisons', model='garrison')
+    SearchDocument.objects.bulk_create(
+        SearchDocument(content_type=content_type, object_id=pk, document=normalize(name))
+        for pk, name in Garrison.objects.values_list('pk', 'name').iterator())
+
+
+def drop_garrison_documents(apps, schema_editor):
+    SearchDocument = apps.get_model('BasicInformations', 'SearchDocument')
+    SearchDocument.objects.filter(
+        content_type__app_label='Garrisons', content_type__model='garrison').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BasicInformations', '0002_search_document'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_content_type, unindex_content_type),
+        migrations.RunPython(fill_garrison_documents, drop_garrison_documents),
+    ]
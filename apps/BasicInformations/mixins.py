@@ -0,0 +1,213 @@
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import lookup_needs_distinct
+from django.contrib.admin.views.main import IS_POPUP_VAR, ORDER_VAR
+from django.core.exceptions import PermissionDenied
+from django.db.models import Case, IntegerField, Value, When
+from django.http import Http404
+from django.shortcuts import redirect
+from django.urls import path, reverse
+
+from .autocomplete import IndexedAutocompleteJsonView
+from .export import EXPORT_FORMATS, export_response
+from .jalali import DATETIME_FORMAT, format_jalali, format_jalali_column, jalali_date_q
+from .pagination import EXACT_COUNT_VAR, CachedCountPaginator, KeysetChangeList
+from .queryplan import QueryPlanChangeList
+from .search import ranked_ids, related_fields, search_q, search_related_q, search_terms
+
+
+class JalaliDateSearchMixin:
+    """Match Jalali dates typed in the admin search box, e.g. '02/07/15'.
+
+    The term is turned into a Gregorian range once and filtered in the
+    database, instead of converting every row to Jalali in Python.
+    """
+    jalali_search_fields = ('created', 'updated')
+
+    def get_search_results(self, request, queryset, search_term):
+        """To filter with regard of JalaliDate"""
+        results, use_distinct = super().get_search_results(request, queryset, search_term)
+        date_q = jalali_date_q(self.model, search_term, self.jalali_search_fields)
+        if date_q is not None:
+            # keep the order of the search, e.g. by rank
+            results = (results | queryset.filter(date_q)).order_by(*results.query.order_by)
+        return results, use_distinct
+
+
+def jalali_column(field_name, short_description, format=DATETIME_FORMAT):
+    """A changelist column showing the date `field_name` in Jalali, sorted by it.
+
+    e.g. ``get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')``.
+    `JalaliColumnsAdminMixin` formats the column of a whole page at once.
+    """
+    def column(self, obj):
+        cells = getattr(obj, '_jalali_cells', None)
+        if cells is not None and (field_name, format) in cells:
+            return cells[field_name, format]
+        return format_jalali(getattr(obj, field_name), format)
+    column.admin_order_field = field_name
+    column.short_description = short_description
+    column.jalali_field = field_name
+    column.jalali_format = format
+    return column
+
+
+class JalaliColumnsAdminMixin:
+    """Format each `jalali_column` of the changelist page in one pass."""
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        columns = {(column.jalali_field, column.jalali_format)
+                   for column in (getattr(self, name, None) if isinstance(name, str) else name
+                                  for name in changelist.list_display)
+                   if hasattr(column, 'jalali_field')}
+        rows = list(changelist.result_list)
+        for field_name, format in columns:
+            texts = format_jalali_column([getattr(obj, field_name) for obj in rows], format)
+            for obj, text in zip(rows, texts):
+                obj.__dict__.setdefault('_jalali_cells', {})[field_name, format] = text
+        return changelist
+
+
+class SearchIndexAdminMixin:
+    """Search the changelist and the autocomplete in the model's `SearchDocument`.
+
+    The columns of the model are looked up in the index, spelled the same
+    whether typed with Arabic or Persian letters and digits or with ZWNJ. The
+    best matches come first unless a column is sorted. Lookups through a
+    relation in `search_fields` are still matched with icontains.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_terms(search_term):
+            return super().get_search_results(request, queryset, search_term)
+
+        related = related_fields(self.get_search_fields(request))
+        if related:
+            results = queryset.filter(search_related_q(self.model, search_term, related))
+        else:
+            results = queryset.filter(search_q(self.model, search_term))
+        use_distinct = any(lookup_needs_distinct(self.opts, name) for name in related)
+
+        if ORDER_VAR not in request.GET:
+            ranked = ranked_ids(self.model, search_term, settings.SEARCH_RANKED_RESULTS)
+            if ranked:
+                rank = Case(*(When(pk=pk, then=Value(position))
+                              for position, pk in enumerate(ranked)),
+                            default=Value(len(ranked)), output_field=IntegerField())
+                results = results.order_by(rank, *results.query.order_by)
+        return results, use_distinct
+
+
+class IndexedAutocompleteAdminMixin:
+    """Answer the autocomplete from the model's `SearchDocument`, by prefix.
+
+    See `autocomplete.IndexedAutocompleteJsonView`. `autocomplete_filters`
+    returns the lookups narrowing the choices, e.g. by the form asking.
+    """
+
+    def autocomplete_filters(self, request):
+        return {}
+
+    def autocomplete_view(self, request):
+        return IndexedAutocompleteJsonView.as_view(model_admin=self)(request)
+
+
+class GarrisonScopedAdminMixin:
+    """Limit the changelist, change form and autocomplete to the user's garrison.
+
+    The model's default manager must be built on `GarrisonScopedQuerySet`.
+    """
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_user(request.user)
+
+
+class QueryPlanAdminMixin:
+    """Load the changelist rows by a query plan derived from `list_display`.
+
+    See `queryplan.list_query_plan`. `list_select_related` adds the relations
+    read by admin methods, `list_prefetch_related` the multi-valued ones.
+    """
+    list_prefetch_related = ()
+
+    def get_changelist(self, request, **kwargs):
+        return QueryPlanChangeList
+
+
+class KeysetPaginationAdminMixin(QueryPlanAdminMixin):
+    """Page the changelist by a cursor on its `ordering`, with a cached count.
+
+    See `KeysetChangeList`. The exact count is taken only when asked for.
+    """
+    change_list_template = 'admin/keyset_change_list.html'
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        return CachedCountPaginator(queryset, per_page, orphans, allow_empty_first_page,
+                                    exact=EXACT_COUNT_VAR in request.GET)
+
+
+class ExportAdminMixin:
+    """Export the changelist, or its selected rows, as CSV or XLSX.
+
+    See `export`. The export link of the changelist keeps its filters,
+    search and sorting. `export_fields` names the columns, by default the
+    columns of `list_display` read from the database.
+    """
+    export_fields = None
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('export/<str:format>/', self.admin_site.admin_view(self.export_view),
+                 name='%s_%s_export' % info),
+            *super().get_urls(),
+        ]
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if (self.actions is not None and IS_POPUP_VAR not in request.GET
+                and self.has_view_or_change_permission(request)):
+            for name in ('export_csv', 'export_xlsx'):
+                actions[name] = self.get_action(name)
+        return actions
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {'export_formats': EXPORT_FORMATS, **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+
+    def export(self, request, queryset, format):
+        try:
+            return export_response(self, queryset, format)
+        except ImportError:
+            self.message_user(request, 'برای خروجی xlsx بسته openpyxl نصب نیست.',
+                              messages.ERROR)
+            return None
+
+    def export_view(self, request, format):
+        if format not in EXPORT_FORMATS:
+            raise Http404()
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        changelist_url = reverse('%s:%s_%s_changelist' % (
+            self.admin_site.name, self.model._meta.app_label, self.model._meta.model_name))
+        try:
+            changelist = self.get_changelist_instance(request)
+        except IncorrectLookupParameters:
+            return redirect(changelist_url)
+        return self.export(request, changelist.queryset, format) or redirect(
+            changelist_url + changelist.get_query_string())
+
+    def export_csv(self, request, queryset):
+        return self.export(request, queryset, 'csv')
+    export_csv.short_description = 'خروجی csv از موارد انتخاب شده'
+
+    def export_xlsx(self, request, queryset):
+        return self.export(request, queryset, 'xlsx')
+    export_xlsx.short_description = 'خروجی xlsx از موارد انتخاب شده'
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
 from jalali_date import datetime2jalali
 
@@ -10,6 +11,9 @@ class State(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و ز مان بروز رسانی')
 
+    str_fields = ('name',)
+    reference_data = True
+
     class Meta:
         verbose_name = 'استان'
         verbose_name_plural = 'استان ها'
@@ -28,6 +32,9 @@ class City(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و ز مان بروز رسانی')
 
+    str_fields = ('name', 'state')
+    reference_data = True
+
     class Meta:
         verbose_name = 'شهر'
         verbose_name_plural = 'شهر ها'
@@ -45,6 +52,9 @@ class Chevron(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و ز مان بروز رسانی')
 
+    str_fields = ('title',)
+    reference_data = True
+
     class Meta:
         verbose_name = 'درجه نظامی'
         verbose_name_plural = 'درجات نظامی'
@@ -63,6 +73,9 @@ class StatusEquipment(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و ز مان بروز رسانی')
 
+    str_fields = ('title',)
+    reference_data = True
+
     class Meta:
         verbose_name = 'وضعیت تجهیزات'
         verbose_name_plural = 'وضعیت های تجهیزات'
@@ -81,6 +94,9 @@ class Skill(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و ز مان بروز رسانی')
 
+    str_fields = ('title',)
+    reference_data = True
+
     class Meta:
         verbose_name = 'تخصص و رسته'
         verbose_name_plural = 'تخصص ها و رسته ها'
@@ -98,6 +114,9 @@ class ZonetHreat(models.Model):
         auto_now=True, null=True, verbose_name='تاریخ و ز مان بروز رسانی')
     pass
 
+    str_fields = ('title',)
+    reference_data = True
+
     class Meta:
         verbose_name = 'تهدید منطقه ای'
         verbose_name_plural = 'تهدیدات منطقه ای'
@@ -116,6 +135,9 @@ class Card(models.Model):
     updated = models.DateTimeField(verbose_name='تاریخ و ز مان بروز رسانی',
                                    auto_now=True,)
 
+    str_fields = ('title',)
+    reference_data = True
+
     class Meta:
         verbose_name = 'کارت حفاظتی'
         verbose_name_plural = 'کارت های حفاظتی'
@@ -128,6 +150,9 @@ class AcademicField(models.Model):
     name = models.CharField(verbose_name='رشته تحصیلی', max_length=50,
                             null=False, blank=False, unique=True)
 
+    str_fields = ('name',)
+    reference_data = True
+
     class Meta:
         verbose_name = 'رشته دانشگاهی'
         verbose_name_plural = 'رشته های دانشگاهی'
@@ -140,6 +165,9 @@ class ToolsCategory(models.Model):
     name = models.CharField(verbose_name='عنوان دسته بندی',
                             max_length=50, null=False, blank=False, unique=True)
 
+    str_fields = ('name',)
+    reference_data = True
+
     class Meta:
         verbose_name = 'دسته بندی تجهیزات'
         verbose_name_plural = 'دسته بندی های تجهیزات'
@@ -152,9 +180,29 @@ class EventCategory(models.Model):
     name = models.CharField(verbose_name='عنوان دسته بندی',
                             max_length=50, null=False, blank=False, unique=True)
 
+    str_fields = ('name',)
+    reference_data = True
+
     class Meta:
         verbose_name = 'دسته بندی رویداد'
         verbose_name_plural = 'دسته بندی های رویداد ها'
 
     def __str__(self):
         return '{0}'.format(self.name)
+
+
+class SearchDocument(models.Model):
+    """The normalised text searched for one object, see `BasicInformations.search`.
+
+    A model lists the columns put in its document in `search_document_fields`.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    document = models.TextField()
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [('content_type', 'object_id')]
+
+    def __str__(self):
+        return '{0} {1}'.format(self.content_type, self.object_id)
@@ -0,0 +1,151 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .queryplan import QueryPlanChangeList
+
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+EXACT_COUNT_VAR = 'exact'
+KEYSET_PARAMS = (AFTER_VAR, BEFORE_VAR, EXACT_COUNT_VAR)
+
+
+class CachedCountPaginator(Paginator):
+    """Count the changelist once per ADMIN_COUNT_CACHE_TIMEOUT seconds.
+
+    `exact` counts again and refreshes the cached value. `count` is always a
+    count of rows; the keyset pages, which label their count as approximate,
+    may show `estimated_count` instead.
+    """
+
+    def __init__(self, *args, exact=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact = exact
+
+    def estimated_count(self):
+        """The rows of an unfiltered table on PostgreSQL, from its statistics"""
+        query = self.object_list.query
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql' or query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s',
+                           [self.object_list.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] > 0 else None
+
+    @cached_property
+    def count(self):
+        sql, params = self.object_list.query.sql_with_params()
+        key = 'admin-count:' + hashlib.md5(f'{sql}{params!r}'.encode()).hexdigest()
+        count = None if self.exact else cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.ADMIN_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class KeysetChangeList(QueryPlanChangeList):
+    """Page through the admin's default ordering with a cursor instead of OFFSET.
+
+    The first field of `ModelAdmin.ordering` and the primary key make the
+    key, e.g. ('created', 'id'). A page is then `WHERE key > cursor LIMIT n`,
+    as fast at the end of the table as at its start. Sorting by a column
+    header or searching falls back to the numbered pages of Django.
+
+    The count shown with the cursor is approximate, see `CachedCountPaginator`,
+    unless `exact` is asked for. The numbered pages are built on the count,
+    so they never use the estimate.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.request = request
+        self.cursor = None
+        for direction in (AFTER_VAR, BEFORE_VAR):
+            if request.GET.get(direction):
+                self.cursor = (direction, request.GET[direction])
+        self.exact_count = EXACT_COUNT_VAR in request.GET
+        super().__init__(request, *args, **kwargs)
+        for name in KEYSET_PARAMS:
+            self.params.pop(name, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for name in KEYSET_PARAMS:
+            lookup_params.pop(name, None)
+        return lookup_params
+
+    @cached_property
+    def keyset(self):
+        """(field, descending) of the key, or None when it does not apply"""
+        ordering = self.model_admin.get_ordering(self.request) or self._get_default_ordering()
+        # a search may be ordered by rank, and is short enough for OFFSET
+        if (not ordering or not isinstance(ordering[0], str) or self.list_editable
+                or ORDER_VAR in self.params or ALL_VAR in self.params or self.query):
+            return None
+        return self.lookup_opts.get_field(ordering[0].lstrip('-')), ordering[0][0] == '-'
+
+    def encode_cursor(self, obj):
+        field, _ = self.keyset
+        return '{}~{}'.format(field.value_to_string(obj), obj.pk)
+
+    def cursor_q(self, cursor, forward):
+        field, descending = self.keyset
+        value, _, pk = cursor.rpartition('~')
+        try:
+            value = field.to_python(value)
+            pk = self.lookup_opts.pk.to_python(pk)
+        except ValidationError:
+            return None
+        lookup = 'lt' if descending == forward else 'gt'
+        # the bare range first, so the index on the field is searched, not scanned
+        return Q(**{f'{field.name}__{lookup}e': value}) & (
+            Q(**{f'{field.name}__{lookup}': value}) | Q(**{f'pk__{lookup}': pk}))
+
+    def get_results(self, request):
+        if self.keyset is None:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        field, descending = self.keyset
+        direction, cursor = self.cursor or (AFTER_VAR, None)
+        forward = direction == AFTER_VAR
+        prefix = '-' if descending != (not forward) else ''
+        queryset = self.queryset.order_by(f'{prefix}{field.name}', f'{prefix}pk')
+        if cursor is not None:
+            cursor_q = self.cursor_q(cursor, forward)
+            if cursor_q is not None:
+                queryset = queryset.filter(cursor_q)
+
+        rows = list(queryset[:self.list_per_page + 1])
+        more = len(rows) > self.list_per_page
+        rows = rows[:self.list_per_page]
+        if not forward:
+            rows.reverse()
+        has_next = more if forward else True
+        has_previous = cursor is not None if forward else more
+
+        estimate = None if self.exact_count else paginator.estimated_count()
+        self.result_count = paginator.count if estimate is None else estimate
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = has_next or has_previous
+        self.paginator = paginator
+        self.next_url = self.previous_url = None
+        if rows and has_next:
+            self.next_url = self.get_query_string(
+                {AFTER_VAR: self.encode_cursor(rows[-1])}, [BEFORE_VAR, EXACT_COUNT_VAR])
+        if rows and has_previous:
+            self.previous_url = self.get_query_string(
+                {BEFORE_VAR: self.encode_cursor(rows[0])}, [AFTER_VAR, EXACT_COUNT_VAR])
+        self.exact_count_url = self.get_query_string({EXACT_COUNT_VAR: 1})
@@ -0,0 +1,153 @@
+from collections import namedtuple
+
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.constants import LOOKUP_SEP
+
+from .refdata import is_reference_model
+
+
+class QueryPlan(namedtuple('QueryPlan', 'select_related prefetch_related only')):
+    """How a changelist loads its rows: select_related, prefetch_related, only()."""
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def forward_relation(model, name):
+    """The many-to-one or one-to-one field `name` of `model`, or None."""
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if field.many_to_one or field.one_to_one:
+        return field
+    return None
+
+
+def relation_path(model, lookup):
+    """The longest prefix of `lookup` following single-valued relations."""
+    names = []
+    for name in lookup.split(LOOKUP_SEP):
+        field = forward_relation(model, name)
+        if field is None:
+            break
+        names.append(name)
+        model = field.related_model
+    return LOOKUP_SEP.join(names)
+
+
+class PlanBuilder:
+    """Collect the relations and the columns the cells of a changelist read.
+
+    A model declares in `str_fields` the fields its `__str__` reads, e.g.
+    ('name', 'garrison') for 'مکان {name} در {garrison}'. Relations among
+    them are followed in turn. A model without `str_fields` is loaded whole.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.select_related = set()
+        self.only = {field.name for field in model._meta.concrete_fields}
+
+    def add_row(self, path):
+        """Load every column of the related rows along `path`."""
+        model = self.model
+        prefix = ''
+        for name in path.split(LOOKUP_SEP):
+            model = forward_relation(model, name).related_model
+            prefix += name
+            self.select_related.add(prefix)
+            self.only.update(f'{prefix}{LOOKUP_SEP}{field.name}'
+                             for field in model._meta.concrete_fields)
+            prefix += LOOKUP_SEP
+
+    def add_str(self, path, model, seen=()):
+        """Load what `str()` of the row reached by `path` reads."""
+        if is_reference_model(model):
+            # read from the process-local copy, see `refdata`
+            return
+        self.select_related.add(path)
+        prefix = path + LOOKUP_SEP
+        str_fields = getattr(model, 'str_fields', None)
+        if str_fields is None or model in seen:
+            self.only.update(prefix + field.name for field in model._meta.concrete_fields)
+            return
+        self.only.add(prefix + model._meta.pk.name)
+        for name in str_fields:
+            self.only.add(prefix + name)
+            field = forward_relation(model, name)
+            if field is not None:
+                self.add_str(prefix + name, field.related_model, (*seen, model))
+
+    def plan(self, prefetch_related=()):
+        return QueryPlan(tuple(sorted(self.select_related)), tuple(prefetch_related),
+                         tuple(sorted(self.only)))
+
+
+def list_query_plan(model_admin, list_display, list_select_related=(),
+                    list_prefetch_related=()):
+    """Derive the query plan of a changelist from its columns.
+
+    A foreign key column, or '__str__' through `str_fields`, shows `str()`
+    of the related row. A column computed by a method loads the relation its
+    `admin_order_field` goes through, e.g. 'ledger__discharge_date' loads
+    `ledger`. `list_select_related` names the relations other methods read.
+    """
+    model = model_admin.model
+    builder = PlanBuilder(model)
+    for name in list_display:
+        if name == '__str__':
+            for str_field in getattr(model, 'str_fields', ()):
+                field = forward_relation(model, str_field)
+                if field is not None:
+                    builder.add_str(str_field, field.related_model)
+            continue
+        field = forward_relation(model, name) if isinstance(name, str) else None
+        if field is not None:
+            builder.add_str(name, field.related_model)
+            continue
+        if callable(name):
+            attr = name
+        else:
+            attr = getattr(model_admin, name, None) or getattr(model, name, None)
+        order_field = getattr(attr, 'admin_order_field', None)
+        if isinstance(order_field, str):
+            path = relation_path(model, order_field.lstrip('-'))
+            if path:
+                builder.add_row(path)
+    if not isinstance(list_select_related, bool):
+        for path in list_select_related:
+            builder.add_row(path)
+    return builder.plan(list_prefetch_related)
+
+
+def str_query_plan(model):
+    """The query plan loading only what `str()` of a row of `model` reads."""
+    str_fields = getattr(model, 'str_fields', None)
+    if str_fields is None:
+        return QueryPlan((), (), ())
+    builder = PlanBuilder(model)
+    builder.only = {model._meta.pk.name, *str_fields}
+    for name in str_fields:
+        field = forward_relation(model, name)
+        if field is not None:
+            builder.add_str(name, field.related_model, (model,))
+    return builder.plan()
+
+
+class QueryPlanChangeList(ChangeList):
+    """Load the rows by `list_query_plan` instead of a bare select_related()."""
+
+    def apply_select_related(self, qs):
+        if self.list_select_related is True:
+            return super().apply_select_related(qs)
+        return list_query_plan(
+            self.model_admin, self.list_display, self.list_select_related,
+            getattr(self.model_admin, 'list_prefetch_related', ())).apply(qs)
@@ -0,0 +1,137 @@
+import time
+import uuid
+from operator import attrgetter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
+
+# model label -> ReferenceTable, in this process
+_tables = {}
+
+
+def is_reference_model(model):
+    return getattr(model, 'reference_data', False)
+
+
+class ReferenceTable:
+    """The values of every row of a reference model, loaded in one query."""
+
+    def __init__(self, model, version):
+        self.model = model
+        self.version = version
+        self.attnames = [field.attname for field in model._meta.concrete_fields]
+        pk_index = self.attnames.index(model._meta.pk.attname)
+        self.rows = {values[pk_index]: values
+                     for values in model._base_manager.values_list(*self.attnames)}
+        self.checked = time.monotonic()
+
+    def get(self, pk):
+        values = self.rows.get(pk)
+        if values is None:
+            return None
+        # a new instance each time, it may be changed by the caller
+        return self.model.from_db(self.model._base_manager.db, self.attnames, values)
+
+    def all(self):
+        return [self.get(pk) for pk in self.rows]
+
+
+def reference_cache():
+    return caches[settings.REFERENCE_DATA_CACHE]
+
+
+def version_key(model):
+    return f'reference-data:{model._meta.label}'
+
+
+def current_version(model):
+    cache = reference_cache()
+    key = version_key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def reference_table(model):
+    """The rows of `model`, loaded again once another process changed them.
+
+    The version in REFERENCE_DATA_CACHE is read at most once every
+    REFERENCE_DATA_CHECK_INTERVAL seconds; changes made in this process are
+    seen once committed, see `invalidate`.
+    """
+    label = model._meta.label
+    table = _tables.get(label)
+    now = time.monotonic()
+    if table is not None and now - table.checked < settings.REFERENCE_DATA_CHECK_INTERVAL:
+        return table
+    version = current_version(model)
+    if table is None or table.version != version:
+        table = _tables[label] = ReferenceTable(model, version)
+    table.checked = now
+    return table
+
+
+def invalidate(model):
+    """Drop the rows of `model` here, and in the other processes at their next check.
+
+    Done when the transaction commits, so that no process loads the rows
+    before the change is visible to it, or keeps rows rolled back.
+    """
+    def bump():
+        reference_cache().set(version_key(model), uuid.uuid4().hex, None)
+        _tables.pop(model._meta.label, None)
+
+    transaction.on_commit(bump)
+
+
+def clear_tables():
+    """Forget every table loaded in this process, e.g. after a test changed the rows."""
+    _tables.clear()
+
+
+def reference_object(model, pk):
+    """The row `pk` of the reference model `model`, or None."""
+    return reference_table(model).get(pk)
+
+
+def reference_choices(model, ordering=()):
+    """The (pk, str()) choices of every row of `model`, sorted by `ordering`.
+
+    The rows without a value come last, in either direction. Returns None for
+    an ordering by expressions, which only the database knows.
+    """
+    ordering = ordering or model._meta.ordering
+    if not all(isinstance(name, str) for name in ordering):
+        return None
+    rows = reference_table(model).all()
+    # one stable sort per field, the last one first
+    for name in reversed(ordering):
+        attname = name.lstrip('-')
+        empty = [obj for obj in rows if getattr(obj, attname) is None]
+        rows = sorted((obj for obj in rows if getattr(obj, attname) is not None),
+                      key=attrgetter(attname), reverse=name.startswith('-')) + empty
+    return [(obj.pk, str(obj)) for obj in rows]
+
+
+class ReferenceForwardDescriptor(ForwardManyToOneDescriptor):
+    """Read the row of a foreign key to a reference model from `reference_object`."""
+
+    def get_object(self, instance):
+        obj = reference_object(self.field.related_model, getattr(instance, self.field.attname))
+        if obj is None:
+            return super().get_object(instance)
+        return obj
+
+
+def install_reference_descriptors():
+    """Serve the foreign keys to the models with `reference_data` from their tables."""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if (field.many_to_one and is_reference_model(field.related_model)
+                    and field.target_field.primary_key):
+                setattr(model, field.name, ReferenceForwardDescriptor(field))
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, transaction
+from django.db.models import BooleanField, Exists, OuterRef, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import RawSQL
+
+from .jalali import PERSIAN_DIGITS
+from .models import SearchDocument
+
+# Arabic letters typed on Arabic keyboards, and the variants of alef and heh
+PERSIAN_LETTERS = str.maketrans({
+    '\u064a': '\u06cc', '\u0649': '\u06cc', '\u0643': '\u06a9',  # yeh, keheh
+    '\u0629': '\u0647', '\u06c0': '\u0647', '\u0624': '\u0648',  # heh, waw
+    '\u0623': '\u0627', '\u0625': '\u0627', '\u0622': '\u0627', '\u0671': '\u0627',  # alef
+})
+# ZWNJ, ZWJ, tatweel and the harakat
+IGNORED_CHARACTERS = re.compile('[\u200c\u200d\u0640\u064b-\u065f\u0670]')
+WORD = re.compile(r'\w+')
+MAX_TERMS = 8
+FTS_TABLE = SearchDocument._meta.db_table + '_fts'
+
+
+def normalize(text):
+    """Fold the spellings of a Persian text to the one kept in the index."""
+    text = IGNORED_CHARACTERS.sub('', str(text))
+    return text.translate(PERSIAN_LETTERS).translate(PERSIAN_DIGITS).casefold()
+
+
+def search_terms(text):
+    """The words of a search, each matched as the prefix of a word."""
+    return WORD.findall(normalize(text))[:MAX_TERMS]
+
+
+def document_text(instance):
+    values = (getattr(instance, name) for name in instance.search_document_fields)
+    return ' '.join(normalize(value) for value in values if value not in (None, ''))
+
+
+class SearchBackend:
+    """Match every term as a substring, on databases without full-text search."""
+
+    def match(self, content_type, terms):
+        query = Q()
+        for term in terms:
+            query &= Q(document__contains=term)
+        return query
+
+    def ranked(self, documents, content_type, terms, limit):
+        documents = documents.filter(self.match(content_type, terms))
+        return list(documents.order_by('object_id').values_list('object_id', flat=True)[:limit])
+
+    def page(self, documents, content_type, terms, offset, limit):
+        documents = documents.filter(self.match(content_type, terms))
+        return list(documents.order_by('id').values_list(
+            'object_id', flat=True)[offset:offset + limit])
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 over the documents, kept in sync by the triggers of the migrations.
+
+    The content type is indexed too, so that the words of the other models
+    are skipped by the index rather than read and filtered out.
+    """
+
+    def expression(self, content_type, terms):
+        words = ' '.join(f'"{term}"*' for term in terms)
+        return f'content_type_id : "{content_type.pk}" AND document : ({words})'
+
+    def match(self, content_type, terms):
+        # `id` is the one of the documents, even inside a subquery
+        return RawSQL(f'id IN (SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s)',
+                      [self.expression(content_type, terms)], output_field=BooleanField())
+
+    def ranked(self, documents, content_type, terms, limit):
+        # the rank of FTS5 is only known to the query doing the MATCH
+        sql, params = documents.values('id', 'object_id').query.sql_with_params()
+        with connections[documents.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT d.object_id FROM "{FTS_TABLE}" JOIN ({sql}) d '
+                f'ON d.id = "{FTS_TABLE}".rowid WHERE "{FTS_TABLE}" MATCH %s '
+                f'ORDER BY "{FTS_TABLE}".rank LIMIT %s',
+                [*params, self.expression(content_type, terms), limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def page(self, documents, content_type, terms, offset, limit):
+        # walked in rowid order, FTS5 stops at the last row asked for
+        sql, params = documents.values('id', 'object_id').query.sql_with_params()
+        with connections[documents.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT d.object_id FROM "{FTS_TABLE}" JOIN ({sql}) d '
+                f'ON d.id = "{FTS_TABLE}".rowid WHERE "{FTS_TABLE}" MATCH %s '
+                f'ORDER BY "{FTS_TABLE}".rowid LIMIT %s OFFSET %s',
+                [*params, self.expression(content_type, terms), limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """tsvector prefix queries, served by the GIN index of the migration."""
+    vector = "to_tsvector('simple', document)"
+
+    def expression(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def match(self, content_type, terms):
+        return RawSQL(f"{self.vector} @@ to_tsquery('simple', %s)",
+                      [self.expression(terms)], output_field=BooleanField())
+
+    def ranked(self, documents, content_type, terms, limit):
+        rank = RawSQL(f"ts_rank({self.vector}, to_tsquery('simple', %s))",
+                      [self.expression(terms)])
+        documents = documents.filter(self.match(content_type, terms)).annotate(rank=rank)
+        return list(documents.order_by('-rank').values_list('object_id', flat=True)[:limit])
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+def get_backend(using):
+    return BACKENDS.get(connections[using].vendor, SearchBackend)()
+
+
+def model_content_type(model):
+    return ContentType.objects.get_for_model(model, for_concrete_model=False)
+
+
+def model_documents(model):
+    return SearchDocument.objects.filter(content_type=model_content_type(model))
+
+
+def search_q(model, text):
+    """Q of the rows of `model` whose document contains every word of `text`."""
+    terms = search_terms(text)
+    if not terms:
+        return Q()
+    content_type = model_content_type(model)
+    documents = SearchDocument.objects.filter(content_type=content_type)
+    documents = documents.filter(get_backend(documents.db).match(content_type, terms))
+    return Q(pk__in=documents.values('object_id'))
+
+
+def related_fields(search_fields):
+    """The lookups of `search_fields` through a relation, which the index does not hold."""
+    return [name for name in search_fields if LOOKUP_SEP in name]
+
+
+def search_related_q(model, text, names):
+    """`search_q`, where each word may also be in one of the lookups `names` instead.
+
+    The lookups through a relation are matched with icontains, word by word
+    like the admin does.
+    """
+    return reduce(and_, (
+        reduce(or_, (Q(**{f'{name}__icontains': bit}) for name in names), search_q(model, bit))
+        for bit in text.split()))
+
+
+def ranked_ids(model, text, limit):
+    """The ids of the `limit` rows of `model` matching `text` best, best first."""
+    terms = search_terms(text)
+    if not terms:
+        return []
+    content_type = model_content_type(model)
+    documents = SearchDocument.objects.filter(content_type=content_type)
+    return get_backend(documents.db).ranked(documents, content_type, terms, limit)
+
+
+def matching_ids(queryset, text, offset, limit):
+    """The ids of the rows of `queryset` matching `text`, in the order of the index.
+
+    Unlike `search_q`, the index is read first and stops after `limit` rows,
+    so a common prefix costs no more than a rare one.
+    """
+    terms = search_terms(text)
+    if not terms or queryset.query.is_empty():
+        return []
+    content_type = model_content_type(queryset.model)
+    documents = SearchDocument.objects.filter(content_type=content_type)
+    if queryset.query.has_filters():
+        documents = documents.filter(Exists(queryset.filter(pk=OuterRef('object_id'))))
+    return get_backend(documents.db).page(documents, content_type, terms, offset, limit)
+
+
+def index_object(instance):
+    SearchDocument.objects.update_or_create(
+        content_type=model_content_type(type(instance)), object_id=instance.pk,
+        defaults={'document': document_text(instance)})
+
+
+def unindex_object(instance):
+    model_documents(type(instance)).filter(object_id=instance.pk).delete()
+
+
+def index_objects(queryset, chunk_size=2000):
+    """Replace the documents of the rows of `queryset`; returns how many were written."""
+    content_type = model_content_type(queryset.model)
+    written = 0
+    with transaction.atomic():
+        chunk = []
+        for instance in queryset.only('pk', *queryset.model.search_document_fields).iterator(
+                chunk_size):
+            chunk.append(instance)
+            if len(chunk) == chunk_size:
+                written += write_documents(content_type, chunk)
+                chunk = []
+        written += write_documents(content_type, chunk)
+    return written
+
+
+def write_documents(content_type, instances):
+    SearchDocument.objects.filter(
+        content_type=content_type, object_id__in=[obj.pk for obj in instances]).delete()
+    return len(SearchDocument.objects.bulk_create([
+        SearchDocument(content_type=content_type, object_id=obj.pk,
+                       document=document_text(obj)) for obj in instances]))
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .refdata import invalidate, is_reference_model
+from .search import index_object, unindex_object
+
+
+@receiver(post_save)
+def _index_search_document(sender, instance, raw, **kwargs):
+    if raw or not hasattr(sender, 'search_document_fields'):
+        return
+    index_object(instance)
+
+
+@receiver(post_delete)
+def _unindex_search_document(sender, instance, **kwargs):
+    if hasattr(sender, 'search_document_fields'):
+        unindex_object(instance)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def _invalidate_reference_data(sender, **kwargs):
+    if is_reference_model(sender):
+        invalidate(sender)
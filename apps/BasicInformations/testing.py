@@ -0,0 +1,150 @@
+import datetime
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, models
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .refdata import clear_tables
+
+FIRST_DAY = datetime.date(2021, 3, 21)
+
+
+def field_value(field, number):
+    """A value of `field` for the row `number`, unique for unique fields."""
+    if field.choices:
+        return field.choices[number % len(field.choices)][0]
+    if isinstance(field, models.DateTimeField):
+        return timezone.now() - datetime.timedelta(hours=number)
+    if isinstance(field, models.DateField):
+        return FIRST_DAY + datetime.timedelta(days=number)
+    if isinstance(field, models.TimeField):
+        return datetime.time(number % 24)
+    if isinstance(field, models.BooleanField):
+        return False
+    if isinstance(field, models.GenericIPAddressField):
+        return f'10.0.{number // 256}.{number % 256}'
+    if isinstance(field, (models.IntegerField, models.DecimalField, models.FloatField)):
+        return number + 1
+    if isinstance(field, models.FileField):
+        return f'{field.name}-{number}.png'
+    # digits, which every validator of a code or a phone number accepts
+    max_length = field.max_length or 10
+    return f'{number:0{min(max_length, 10)}d}'[-max_length:]
+
+
+class RowFactory:
+    """Create rows of any model, with every field and relation filled in.
+
+    The rows of one factory share one row of each related model, except
+    through one-to-one fields, which `share` may set beforehand. `values`
+    may set the fields, many-to-many ones included.
+    """
+
+    def __init__(self):
+        self.shared = {}
+        self.numbers = {}
+
+    def number(self, model):
+        # unique within the test, the tables are empty at its start
+        self.numbers[model] = self.numbers.get(model, 0) + 1
+        return self.numbers[model]
+
+    def share(self, obj):
+        """Relate the rows made after this to `obj` instead of a new row."""
+        self.shared[type(obj)] = obj
+        return obj
+
+    def related(self, field):
+        model = field.related_model
+        if field.unique:
+            return self.create(model)
+        if model not in self.shared:
+            self.shared[model] = None  # a cycle is left empty
+            self.shared[model] = self.create(model)
+        return self.shared[model]
+
+    def create(self, model, **values):
+        many = {field.name: values.pop(field.name)
+                for field in model._meta.many_to_many if field.name in values}
+        number = self.number(model)
+        for field in model._meta.concrete_fields:
+            if (field.name in values or field.auto_created or not field.editable
+                    or (field.has_default() and not field.unique)
+                    or getattr(field, 'auto_now', False)
+                    or getattr(field, 'auto_now_add', False)):
+                continue
+            if field.is_relation:
+                values[field.name] = self.related(field)
+            else:
+                values[field.name] = field_value(field, number)
+        obj = model._base_manager.create(**values)
+        for field in model._meta.many_to_many:
+            if field.name in many:
+                getattr(obj, field.name).set(many[field.name])
+                continue
+            related = self.related(field)
+            if related is not None:
+                getattr(obj, field.name).add(related)
+        return obj
+
+    def create_rows(self, model, count, **values):
+        return [self.create(model, **values) for _ in range(count)]
+
+
+class ChangelistQueriesMixin:
+    """Assert that an admin changelist runs as many queries for 100 rows as for one.
+
+    `test_changelists` checks every model registered in the admin from the
+    `app_labels` apps.
+    """
+    rows = 100
+    app_labels = ()
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RowFactory()
+        self.superuser = get_user_model().objects.create_superuser(
+            'changelist-admin', password='password', has_valid_password=True)
+
+    def render_changelist(self, model, per_page):
+        model_admin = admin.site._registry[model]
+        opts = model._meta
+        request = RequestFactory().get(
+            reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist'))
+        request.user = self.superuser
+        model_admin.list_per_page = per_page
+        try:
+            response = model_admin.changelist_view(request)
+            response.render()
+        finally:
+            del model_admin.list_per_page
+        return response.context_data['cl'].result_list
+
+    def test_changelists(self):
+        registered = [model for model in admin.site._registry
+                      if model._meta.app_label in self.app_labels]
+        self.assertTrue(registered, self.app_labels)
+        for model in registered:
+            with self.subTest(model=model._meta.label):
+                self.assertChangelistQueries(model)
+
+    def assertChangelistQueries(self, model):
+        """Render the changelist of `model` with 1 and `self.rows` rows.
+
+        The rows missing from the table are made by `self.factory`. The first
+        render fills the caches, e.g. the count of the paginator and the
+        reference tables.
+        """
+        self.factory.create_rows(model, self.rows - model._base_manager.count())
+        cache.clear()
+        clear_tables()
+        self.render_changelist(model, self.rows)
+        with CaptureQueriesContext(connection) as one:
+            self.assertEqual(len(self.render_changelist(model, 1)), 1)
+        with self.assertNumQueries(len(one)):
+            self.assertEqual(len(self.render_changelist(model, self.rows)), self.rows)
@@ -1,3 +1,397 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+import jdatetime
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import ADDITION, CustomLogger, User
+from apps.Garrisons.models import Soldier
+
+from . import models, refdata
+from .filters import CreationDateFilter
+from .jalali import (DAY_TABLE, DAY_TABLE_FIRST, add_jalali_months, date_range_q,
+                     format_jalali, format_jalali_column, jalali_day, jalali_search_range,
+                     local_midnight, parse_jalali_term)
+from .pagination import CachedCountPaginator
+from .search import normalize, search_terms
+from .testing import ChangelistQueriesMixin, RowFactory
+
+
+class NormalizeTests(SimpleTestCase):
+
+    def test_arabic_letters(self):
+        self.assertEqual(normalize('علي'), normalize('علی'))
+        self.assertEqual(normalize('كار'), 'کار')
+        self.assertEqual(normalize('أحمد'), 'احمد')
+        self.assertEqual(normalize('مدرسة'), 'مدرسه')
+
+    def test_ignored_characters(self):
+        self.assertEqual(normalize('می‌روم'), 'میروم')
+        self.assertEqual(normalize('مـــحمد'), 'محمد')
+        self.assertEqual(normalize('مُحَمَّد'), 'محمد')
+
+    def test_digits_and_case(self):
+        self.assertEqual(normalize('۱۴۰۰/٠٢'), '1400/02')
+        self.assertEqual(normalize('Printer HP'), 'printer hp')
+        self.assertEqual(normalize(1400), '1400')
+
+    def test_search_terms(self):
+        self.assertEqual(search_terms(' علي  ۱۲ - Printer '), ['علی', '12', 'printer'])
+        self.assertEqual(search_terms(' '.join('abcdefghij')), list('abcdefgh'))
+
+
+class FormatJalaliTests(SimpleTestCase):
+
+    def test_day_table(self):
+        for date in (DAY_TABLE_FIRST, datetime.date(2020, 3, 20), datetime.date(2021, 3, 20),
+                     datetime.date(2025, 3, 21), datetime.date(2049, 12, 31)):
+            jdate = jdatetime.date.fromgregorian(date=date)
+            self.assertEqual(jalali_day(date), (jdate.year, jdate.month, jdate.day), date)
+        self.assertEqual(len(DAY_TABLE), (datetime.date(2050, 1, 1) - DAY_TABLE_FIRST).days)
+
+    def test_dates(self):
+        for date in (datetime.date(2021, 3, 21), datetime.date(2024, 3, 19),
+                     datetime.date(1980, 6, 1), datetime.date(2060, 1, 1)):
+            for format in ('%y/%m/%d', '%Y-%m-%d', '%d %B %Y'):
+                self.assertEqual(format_jalali(date, format),
+                                 jdatetime.date.fromgregorian(date=date).strftime(format))
+        self.assertIsNone(format_jalali(None))
+
+    def test_aware_datetimes_in_local_time(self):
+        # 22:00 UTC is 01:30 of the next day in Tehran
+        value = datetime.datetime(2021, 3, 20, 22, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(format_jalali(value), '00/01/01 - 01:30:00')
+        local = timezone.localtime(value)
+        self.assertEqual(format_jalali(value, '%Y/%m/%d %H:%M %A'),
+                         jdatetime.datetime.fromgregorian(datetime=local).strftime(
+                             '%Y/%m/%d %H:%M %A'))
+
+    def test_column(self):
+        first = datetime.datetime(2021, 3, 21, 9, 0, tzinfo=datetime.timezone.utc)
+        second = datetime.datetime(2021, 3, 22, 9, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(format_jalali_column([first, second, first, None]),
+                         [format_jalali(first), format_jalali(second),
+                          format_jalali(first), None])
+
+
+class JalaliMonthsTests(SimpleTestCase):
+
+    def test_add_jalali_months(self):
+        # 1399/06/31 plus one month is 1399/07/30, the last day of Mehr
+        self.assertEqual(add_jalali_months(datetime.date(2020, 9, 21), 1),
+                         datetime.date(2020, 10, 21))
+        self.assertEqual(add_jalali_months(datetime.date(2021, 3, 21), 21),
+                         datetime.date(2022, 12, 22))
+
+
+class JalaliSearchTests(SimpleTestCase):
+
+    def test_day(self):
+        day = (datetime.date(2021, 3, 21), datetime.date(2021, 3, 22))
+        self.assertEqual(parse_jalali_term('1400/01/01'), day)
+        self.assertEqual(parse_jalali_term('00/1/1'), day)
+        self.assertEqual(parse_jalali_term(' ۱۴۰۰/۰۱/۰۱ '), day)
+
+    def test_month(self):
+        self.assertEqual(parse_jalali_term('1400/01'),
+                         (datetime.date(2021, 3, 21), datetime.date(2021, 4, 21)))
+        self.assertEqual(parse_jalali_term('٠٠/١٢'),
+                         (datetime.date(2022, 2, 20), datetime.date(2022, 3, 21)))
+
+    def test_not_a_date(self):
+        for term in ('1400', '1400/13', '1400/00/10', '1400/12/30', '1400/01/32', '140/01/01',
+                     'printer', '1400-01-01', ''):
+            self.assertIsNone(parse_jalali_term(term), term)
+        # 1399 is a leap year
+        self.assertEqual(parse_jalali_term('1399/12/30')[0], datetime.date(2021, 3, 20))
+
+    def test_range(self):
+        first_days = (datetime.date(2021, 3, 21), datetime.date(2021, 3, 31))
+        self.assertEqual(jalali_search_range('1400/01/01 - 1400/01/10'), first_days)
+        self.assertEqual(jalali_search_range('۱۴۰۰/۰۱/۱۰ تا ۱۴۰۰/۰۱/۰۱'), first_days)
+        self.assertEqual(jalali_search_range('00/01 - 00/02'),
+                         (datetime.date(2021, 3, 21), datetime.date(2021, 5, 22)))
+        for term in (None, '', '1400/01/01 - printer', 'printer - 1400/01/01'):
+            self.assertIsNone(jalali_search_range(term), term)
+
+    def test_date_range_q(self):
+        start, end = datetime.date(2021, 3, 21), datetime.date(2021, 3, 22)
+        created = models.State._meta.get_field('created')
+        self.assertEqual(date_range_q(created, start, end).children,
+                         [('created__gte', local_midnight(start)),
+                          ('created__lt', local_midnight(end))])
+        self.assertEqual(local_midnight(start).isoformat(), '2021-03-21T00:00:00+03:30')
+        # the clocks moved to 01:00 at the start of 1400/01/02
+        tehran = timezone.get_default_timezone()
+        self.assertEqual(local_midnight(end).astimezone(tehran).isoformat(),
+                         '2021-03-22T01:00:00+04:30')
+        dispatch_date = Soldier._meta.get_field('dispatch_date')
+        self.assertEqual(date_range_q(dispatch_date, start, end).children,
+                         [('dispatch_date__gte', start), ('dispatch_date__lt', end)])
+
+
+class JalaliSearchAdminTests(TestCase):
+
+    def test_search_a_jalali_day(self):
+        user = User.objects.create_superuser('admin', password='password',
+                                             has_valid_password=True)
+        tehran = timezone.get_default_timezone()
+        inside = models.State.objects.create(name='inside')
+        before = models.State.objects.create(name='before')
+        after = models.State.objects.create(name='after')
+        for state, moment in ((inside, datetime.datetime(2021, 3, 21, 0, 30)),
+                              (before, datetime.datetime(2021, 3, 20, 23, 30)),
+                              (after, datetime.datetime(2021, 3, 22, 1, 0))):
+            models.State.objects.filter(pk=state.pk).update(
+                created=timezone.make_aware(moment, tehran), updated=None)
+        self.client.force_login(user)
+        url = reverse('admin:BasicInformations_state_changelist')
+        for term in ('00/01/01', '1400/01/01 - 1400/01/01'):
+            response = self.client.get(url, {'q': term})
+            self.assertEqual(list(response.context['cl'].result_list), [inside], term)
+        response = self.client.get(url, {'q': '00/01/01 - 00/01/02'})
+        self.assertCountEqual(response.context['cl'].result_list, [inside, after])
+
+
+class CreationDateFilterTests(TestCase):
+    moments = [
+        datetime.datetime(2021, 3, 20, 23, 30),  # 1399/12/30
+        datetime.datetime(2021, 3, 21, 0, 30),  # 1400/01/01
+        datetime.datetime(2021, 3, 21, 23, 59),
+        datetime.datetime(2021, 4, 20, 12, 0),  # 1400/01/31
+        datetime.datetime(2021, 4, 21, 8, 0),  # 1400/02/01
+        datetime.datetime(2022, 3, 21, 8, 0),  # 1401/01/01
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', password='password',
+                                                 has_valid_password=True)
+        tehran = timezone.get_default_timezone()
+        for number, moment in enumerate(cls.moments):
+            state = models.State.objects.create(name=f'state {number}')
+            models.State.objects.filter(pk=state.pk).update(
+                created=timezone.make_aware(moment, tehran))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def changelist(self, period=None):
+        response = self.client.get(reverse('admin:BasicInformations_state_changelist'),
+                                   {'created_jalali': period} if period else {})
+        cl = response.context['cl']
+        [date_filter] = [spec for spec in cl.filter_specs
+                         if isinstance(spec, CreationDateFilter)]
+        return [label for value, label in date_filter.lookup_choices], cl
+
+    def expected(self, period, size):
+        # what the filter replaced computed in Python, row by row
+        days = [jdatetime.date.fromgregorian(date=timezone.localtime(state.created).date())
+                for state in models.State.objects.all()]
+        buckets = {}
+        for day in days:
+            parts = (day.year, day.month, day.day)
+            if parts[:len(period)] == period:
+                key = CreationDateFilter.format_period(parts[:size])
+                buckets[key] = buckets.get(key, 0) + 1
+        return [f'{key} ({count})' for key, count in sorted(buckets.items())]
+
+    def test_years(self):
+        choices, cl = self.changelist()
+        self.assertEqual(choices, self.expected((), 1))
+        self.assertEqual(choices, ['1399 (1)', '1400 (4)', '1401 (1)'])
+
+    def test_months(self):
+        choices, cl = self.changelist('1400')
+        self.assertEqual(choices, ['1400'] + self.expected((1400,), 2))
+        self.assertEqual(choices, ['1400', '1400/01 (3)', '1400/02 (1)'])
+        self.assertEqual(cl.result_count, 4)
+
+    def test_days(self):
+        choices, cl = self.changelist('1400/01')
+        self.assertEqual(choices, ['1400', '1400/01'] + self.expected((1400, 1), 3))
+        self.assertEqual(choices, ['1400', '1400/01', '1400/01/01 (2)', '1400/01/31 (1)'])
+
+        choices, cl = self.changelist('1400/01/01')
+        self.assertEqual(choices, ['1400', '1400/01', '1400/01/01 (2)', '1400/01/31 (1)'])
+        self.assertEqual(sorted(state.name for state in cl.result_list),
+                         ['state 1', 'state 2'])
+
+    def test_invalid_period(self):
+        for period in ('1400/13', '1400/12/30', 'printer'):
+            choices, cl = self.changelist(period)
+            self.assertEqual(choices, ['1399 (1)', '1400 (4)', '1401 (1)'], period)
+
+    def test_queries_do_not_grow_with_the_days(self):
+        self.changelist('1400/01')
+        with CaptureQueriesContext(connection) as queries:
+            self.changelist('1400/01')
+        for day in range(20):
+            state = models.State.objects.create(name=f'day {day}')
+            models.State.objects.filter(pk=state.pk).update(
+                created=timezone.make_aware(datetime.datetime(2021, 3, 22, 12))
+                + datetime.timedelta(days=day))
+        with self.assertNumQueries(len(queries)):
+            choices, cl = self.changelist('1400/01')
+        self.assertEqual(len(choices), 2 + 22)
+
+
+class KeysetChangeListTests(TestCase):
+    # the log is ordered by '-event_date', the key is (event_date, id)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', has_valid_password=True)
+        first = timezone.make_aware(datetime.datetime(2021, 5, 1, 12))
+        # three rows share each event date, the pages break in their middle
+        for number in range(8):
+            CustomLogger.objects.create(
+                action=f'action {number}', user='user', action_flag=ADDITION,
+                event_date=first + datetime.timedelta(minutes=number // 3))
+        cls.ordered = list(CustomLogger.objects.order_by('-event_date', '-pk'))
+        cls.url = reverse('admin:accounts_customlogger_changelist')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        model_admin = admin.site._registry[CustomLogger]
+        per_page = mock.patch.object(model_admin, 'list_per_page', 3, create=True)
+        per_page.start()
+        self.addCleanup(per_page.stop)
+
+    def changelist(self, query=''):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_cursor(self):
+        cl = self.changelist()
+        row = cl.result_list[0]
+        self.assertEqual(cl.encode_cursor(row), f'2021-05-01T07:32:00+00:00~{row.pk}')
+        self.assertEqual(QueryDict(cl.next_url[1:]).dict(),
+                         {'after': cl.encode_cursor(cl.result_list[-1])})
+        # a cursor that does not parse shows the first page
+        self.assertEqual(self.changelist('?after=x~y').result_list, self.ordered[:3])
+
+    def test_next_and_previous_pages(self):
+        pages, cl = [], self.changelist()
+        self.assertIsNone(cl.previous_url)
+        while True:
+            pages.append(cl.result_list)
+            if cl.next_url is None:
+                break
+            cl = self.changelist(cl.next_url)
+        self.assertEqual(pages, [self.ordered[:3], self.ordered[3:6], self.ordered[6:]])
+
+        for page in reversed(pages[:-1]):
+            cl = self.changelist(cl.previous_url)
+            self.assertEqual(cl.result_list, page)
+        self.assertIsNone(cl.previous_url)
+        self.assertIsNotNone(cl.next_url)
+
+    def test_ties_on_the_key(self):
+        # a page ending in the middle of one event date goes on with the same date
+        cl = self.changelist()
+        self.assertEqual(cl.result_list[-1].event_date, self.ordered[3].event_date)
+        self.assertEqual(self.changelist(cl.next_url).result_list[0], self.ordered[3])
+
+    def test_estimated_count_is_only_shown_as_approximate(self):
+        with mock.patch.object(CachedCountPaginator, 'estimated_count', return_value=1000):
+            response = self.client.get(self.url)
+            self.assertEqual(response.context['cl'].result_count, 1000)
+            self.assertContains(response, 'حدود')
+
+            response = self.client.get(self.url + '?exact=1')
+            self.assertEqual(response.context['cl'].result_count, 8)
+            self.assertNotContains(response, 'حدود')
+
+            # numbered pages, sorted by a column header, count the rows
+            cl = self.changelist('?o=2')
+            self.assertIsNone(cl.keyset)
+            self.assertEqual((cl.result_count, cl.paginator.num_pages), (8, 3))
+
+
+@override_settings(REFERENCE_DATA_CACHE='default', REFERENCE_DATA_CHECK_INTERVAL=5)
+class ReferenceDataTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        refdata.clear_tables()
+        self.addCleanup(refdata.clear_tables)
+        self.chevrons = [models.Chevron.objects.create(title=title, code=code)
+                         for title, code in [('b', 2), ('d', None), ('a', 1), ('c', None)]]
+
+    def test_invalidated_on_commit(self):
+        table = refdata.reference_table(models.Chevron)
+        version = refdata.current_version(models.Chevron)
+        with transaction.atomic():
+            chevron = models.Chevron.objects.create(title='e')
+            self.assertEqual(refdata.current_version(models.Chevron), version)
+            self.assertIs(refdata.reference_table(models.Chevron), table)
+        self.assertNotEqual(refdata.current_version(models.Chevron), version)
+        self.assertEqual(refdata.reference_object(models.Chevron, chevron.pk), chevron)
+
+        version = refdata.current_version(models.Chevron)
+        with self.assertRaises(ValueError), transaction.atomic():
+            models.Chevron.objects.create(title='f')
+            raise ValueError
+        self.assertEqual(refdata.current_version(models.Chevron), version)
+
+    def test_changes_of_other_processes_are_checked_for_after_the_interval(self):
+        with mock.patch('apps.BasicInformations.refdata.time.monotonic') as monotonic:
+            monotonic.return_value = 100
+            table = refdata.reference_table(models.Chevron)
+            # another process saves a row, its signal bumps the shared version
+            models.Chevron.objects.filter(code=1).update(title='changed')
+            cache.set(refdata.version_key(models.Chevron), 'changed', None)
+
+            monotonic.return_value = 104.9
+            with self.assertNumQueries(0):
+                self.assertIs(refdata.reference_table(models.Chevron), table)
+            monotonic.return_value = 105
+            self.assertEqual(str(refdata.reference_object(models.Chevron, self.chevrons[2].pk)),
+                             'changed')
+            # an unchanged version keeps the rows
+            table = refdata.reference_table(models.Chevron)
+            monotonic.return_value = 200
+            with self.assertNumQueries(0):
+                self.assertIs(refdata.reference_table(models.Chevron), table)
+
+    def test_forward_descriptor(self):
+        self.assertIsInstance(Soldier.chevron, refdata.ReferenceForwardDescriptor)
+        factory = RowFactory()
+        soldier = factory.create(Soldier, chevron=self.chevrons[0])
+        refdata.reference_table(models.Chevron)
+        soldier, again = Soldier.objects.get(pk=soldier.pk), Soldier.objects.get(pk=soldier.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(soldier.chevron, self.chevrons[0])
+            # a copy of its own for each instance
+            self.assertIsNot(soldier.chevron, again.chevron)
+
+        # a row missing from the table, which was not told of it, is queried
+        models.Chevron.objects.bulk_create([models.Chevron(title='e')])
+        chevron = models.Chevron.objects.get(title='e')
+        Soldier.objects.filter(pk=soldier.pk).update(chevron=chevron)
+        soldier = Soldier.objects.get(pk=soldier.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(soldier.chevron, chevron)
+
+    def test_reference_choices(self):
+        def titles(*ordering):
+            return [title for pk, title in refdata.reference_choices(models.Chevron, ordering)]
+
+        # the rows without a code come last either way, in the order of their pk
+        self.assertEqual(titles('code'), ['a', 'b', 'd', 'c'])
+        self.assertEqual(titles('-code'), ['b', 'a', 'd', 'c'])
+        self.assertEqual(titles('-code', 'title'), ['b', 'a', 'c', 'd'])
+        self.assertEqual(titles('-title'), ['d', 'c', 'b', 'a'])
+
+
+class ChangelistQueriesTests(ChangelistQueriesMixin, TestCase):
+    app_labels = ('BasicInformations',)
@@ -1,40 +1,45 @@
 import datetime
+import re
 
 from admin_auto_filters.filters import AutocompleteFilter
-from django.contrib import admin
-from django.contrib.admin import SimpleListFilter
-from django.urls import reverse
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.models import ADDITION
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
 from django.utils.safestring import mark_safe
-from jalali_date import date2jalali, datetime2jalali
 from jalali_date.admin import (ModelAdminJalaliMixin, StackedInlineJalaliMixin,
                                TabularInlineJalaliMixin)
 
+from apps.accounts.audit import audit_log
+from apps.BasicInformations.filters import CreationDateFilter
+from apps.BasicInformations.jalali import DATE_FORMAT, format_jalali
+from apps.BasicInformations.mixins import (ExportAdminMixin, GarrisonScopedAdminMixin,
+                                          IndexedAutocompleteAdminMixin,
+                                          JalaliColumnsAdminMixin, JalaliDateSearchMixin,
+                                          KeysetPaginationAdminMixin,
+                                          QueryPlanAdminMixin, SearchIndexAdminMixin,
+                                          jalali_column)
+
 from . import models
+from .forms import SoldierImportForm
+from .imports import (ImportFileError, error_report_name, import_soldiers,
+                      save_error_report)
 from .models import (EnvironsInformation, Event, Garrison, Location,
                      LocationCategory)
+from .reports import iter_soldier_reports, start_report_job
 
-
-class CreationDateFilter(SimpleListFilter):
-    title = 'تاریخ و زمان درج'
-    parameter_name = 'created'
-
-    def lookups(self, request, model_admin):
-        created_set = set(
-            [obj
-             for obj in model_admin.model.objects.order_by(
-                 'created__date').distinct('created__date')
-             ])
-        return [
-            (obj.id,  date2jalali(obj.created).strftime('%y/%m/%d'))
-            for obj in created_set]
-
-    def queryset(self, request, queryset):
-        if self.value():
-            return [x for x in queryset if datetime2jalali(x.created) == self.value()]
+EQUIPMENT_FORM = re.compile(r'equipment/(add|\d+/change)/')
 
 
 @admin.register(Garrison)
-class GarrisonAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class GarrisonAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, IndexedAutocompleteAdminMixin,
+                    JalaliDateSearchMixin, JalaliColumnsAdminMixin, ModelAdminJalaliMixin,
+                    admin.ModelAdmin):
     list_display = ('name', 'city', 'get_created_jalali', 'get_updated_jalali')
     list_filter = ('city', 'updated', CreationDateFilter)
     search_fields = ('name', 'city__name', 'description',)
@@ -43,65 +48,20 @@ class GarrisonAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     filter_horizontal = ('zonet_hreats',)
     autocomplete_fields = ['city', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            admin_user=request.user).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter Search results"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-
-        if not request.user.is_superuser:
-            '''
-            if ("location/add/" in str(request.META.get('HTTP_REFERER'))) or re.search(
-                    r"location/\d/change/", str(request.META.get('HTTP_REFERER'))):
-            '''
-            queryset = self.model.objects.filter(admin_user=request.user)
-
-        if search_term:
-            try:
-                search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-                search_date = search_term
-            except ValueError:
-                pass
-            else:
-                obj_list = [x.id for x in self.model.objects.all()
-                            if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                            datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                            ]
-                queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @admin.register(LocationCategory)
-class LocationCategoryAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class LocationCategoryAdmin(JalaliDateSearchMixin, JalaliColumnsAdminMixin, ModelAdminJalaliMixin,
+                            admin.ModelAdmin):
     list_display = ('name', 'get_created_jalali', 'get_updated_jalali')
     list_filter = ('updated', CreationDateFilter)
     search_fields = ('name', 'description',)
     ordering = ['created']
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
     # def get_queryset(self, request):
     #     qs = super().get_queryset(request)
@@ -109,28 +69,14 @@ class LocationCategoryAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     #         return qs
     #     return qs.filter(locations__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
 
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
-
 
 @ admin.register(Location)
-class LocationAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class LocationAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, IndexedAutocompleteAdminMixin,
+                    JalaliDateSearchMixin, SearchIndexAdminMixin, JalaliColumnsAdminMixin,
+                    ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('name', 'garrison', 'liable', 'category', 'phone_number',
                     )  # 'get_created_jalali', 'get_updated_jalali'
-    list_filter = ('liable', 'created', 'updated', )  # CreationDateFilter
+    list_filter = ('liable', 'created', 'updated', CreationDateFilter)
     search_fields = ('name', 'garrison__name',
                      'liable', 'phone_number',
                      'description', 'created', 'updated')
@@ -138,90 +84,32 @@ class LocationAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     filter_horizontal = ('zonet_hreats',)
     autocomplete_fields = ['garrison', 'category', ]
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @ admin.register(EnvironsInformation)
-class EnvironsInformationAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class EnvironsInformationAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin,
+                               JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                               ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('title', 'garrison', 'phone_number',
                     'get_created_jalali', 'get_updated_jalali')
-    list_filter = ('garrison', 'created', 'updated', )  # CreationDateFilter
+    list_filter = ('garrison', 'created', 'updated', CreationDateFilter)
     search_fields = ('title', 'garrison__name', 'address', 'phone_number',
                      'description', 'created', 'updated')
     ordering = ['created']
     autocomplete_fields = ['garrison', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @ admin.register(Event)
-class EventAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class EventAdmin(QueryPlanAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     # 'get_created_jalali', 'get_updated_jalali'
     list_display = ('category', 'location', 'date', 'time')
     list_filter = ('category', 'location', 'date', 'time',
-                   'created', 'updated', )  # CreationDateFilter
+                   'created', 'updated', CreationDateFilter)
     search_fields = ('time', 'date',
                      'description', 'created', 'updated', 'personal__first_name',
                      'personal__last_name')
@@ -239,13 +127,31 @@ class AcademicFieldFilter(AutocompleteFilter):
     field_name = 'academic_field'  # name of the foreign key field
 
 
+class DischargeDateFilter(admin.SimpleListFilter):
+    title = 'تاریخ پایان خدمت'
+    parameter_name = 'discharge'
+    days = 30
+
+    def lookups(self, request, model_admin):
+        return (('soon', f'ترخیص در {self.days} روز آینده'),)
+
+    def queryset(self, request, queryset):
+        if self.value() == 'soon':
+            today = timezone.localdate()
+            return queryset.filter(
+                ledger__discharge_date__gte=today,
+                ledger__discharge_date__lte=today + datetime.timedelta(days=self.days))
+
+
 # class CityFilter(AutocompleteFilter):
     #     title = 'شهر'  # display title
     #     field_name = 'city'  # name of the foreign key field
 
 
 @admin.register(models.Personal)
-class PersonalAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class PersonalAdmin(GarrisonScopedAdminMixin, IndexedAutocompleteAdminMixin, JalaliDateSearchMixin,
+                    SearchIndexAdminMixin, JalaliColumnsAdminMixin, ModelAdminJalaliMixin,
+                    admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'jobSubject',
                     'get_created_jalali', 'get_updated_jalali')
     list_filter = ('is_buy_expert', 'is_buyer', 'locations', 'created', 'updated')
@@ -256,53 +162,21 @@ class PersonalAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['locations', 'chevron', 'skill', 'level']
     # prepopulated_fields = {'slug' : ('title',)}
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(locations__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        '''
-        if not request.user.is_superuser:
-            queryset = self.model.objects.filter(garrison=request.user.garrison)
-        '''
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-
-        import re
-        if 'equipment/add/' in str(request.META.get('HTTP_REFERER')) or\
-                re.search(r"equipment/\d/change/", str(request.META.get('HTTP_REFERER'))):
-            queryset = queryset.filter(is_buyer=True)
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+
+    def autocomplete_filters(self, request):
+        filters = {}
+        if EQUIPMENT_FORM.search(request.META.get('HTTP_REFERER', '')):
+            filters['is_buyer'] = True
         if 'is_buy_expert' in request.GET:
-            queryset = queryset.filter(is_buy_expert=True)
-        return queryset, use_distinct
+            filters['is_buy_expert'] = True
+        return filters
 
 
 @admin.register(models.PersonalLearnCourse)
-class PersonalLearnCourseAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class PersonalLearnCourseAdmin(JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                               ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('title', 'point', 'get_created_jalali', 'get_updated_jalali',
                     'get_started_jalali', 'get_ended_jalali')
     list_filter = ('title', 'point', 'created', 'updated')
@@ -310,25 +184,10 @@ class PersonalLearnCourseAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     ordering = ['created']
     autocomplete_fields = ['personal', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_started_jalali(self, obj):
-        return date2jalali(obj.start).strftime('%y/%m/%d')
-    get_started_jalali.admin_order_field = 'start'
-    get_started_jalali.short_description = 'تاریخ شروع'
-
-    def get_ended_jalali(self, obj):
-        return date2jalali(obj.end).strftime('%y/%m/%d')
-    get_ended_jalali.admin_order_field = 'end'
-    get_ended_jalali.short_description = 'تاریخ پایان'
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_started_jalali = jalali_column('start', 'تاریخ شروع', DATE_FORMAT)
+    get_ended_jalali = jalali_column('end', 'تاریخ پایان', DATE_FORMAT)
 
     # def get_queryset(self, request):
     #     qs = super().get_queryset(request)
@@ -337,25 +196,10 @@ class PersonalLearnCourseAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     #     return qs.filter(
     #         personal__locations__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
 
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
-
 
 @admin.register(models.SoldierLearnCourse)
-class SoldierLearnCourseAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class SoldierLearnCourseAdmin(QueryPlanAdminMixin, JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                              ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('soldier', 'title', 'point', 'get_created_jalali',
                     'get_updated_jalali', 'get_started_jalali', 'get_ended_jalali')
     list_filter = ('title', 'point', 'created', 'updated')
@@ -363,25 +207,10 @@ class SoldierLearnCourseAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     ordering = ['created']
     autocomplete_fields = ['soldier', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_started_jalali(self, obj):
-        return date2jalali(obj.start).strftime('%y/%m/%d')
-    get_started_jalali.admin_order_field = 'start'
-    get_started_jalali.short_description = 'تاریخ شروع'
-
-    def get_ended_jalali(self, obj):
-        return date2jalali(obj.end).strftime('%y/%m/%d')
-    get_ended_jalali.admin_order_field = 'end'
-    get_ended_jalali.short_description = 'تاریخ پایان'
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_started_jalali = jalali_column('start', 'تاریخ شروع', DATE_FORMAT)
+    get_ended_jalali = jalali_column('end', 'تاریخ پایان', DATE_FORMAT)
 
     # def get_queryset(self, request):
     #     qs = super().get_queryset(request)
@@ -390,25 +219,10 @@ class SoldierLearnCourseAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     #     return qs.filter(
     #         personal__locations__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
 
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
-
 
 @admin.register(models.Owner)
-class OwnerAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class OwnerAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                 JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('personal', 'owner_code', 'get_created_jalali', 'get_updated_jalali')
     list_filter = ('personal', 'garrison', 'created', 'updated')
     search_fields = ('personal__first_name', 'personal__last_name',
@@ -416,45 +230,19 @@ class OwnerAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     ordering = ['created']
     autocomplete_fields = ['personal', 'garrison', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @admin.register(models.Soldier)
-class SoldierAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
-    list_display = ('first_name', 'last_name', 'location',
+class SoldierAdmin(GarrisonScopedAdminMixin, ExportAdminMixin, KeysetPaginationAdminMixin,
+                   IndexedAutocompleteAdminMixin, JalaliDateSearchMixin, SearchIndexAdminMixin,
+                   JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
+    list_display = ('first_name', 'last_name', 'location', 'get_discharge_jalali',
                     'get_created_jalali', 'get_updated_jalali', 'order_pdf')
-    list_filter = [CityFilter, AcademicFieldFilter,
+    actions = ['print_reports']
+    change_list_template = 'admin/Garrisons/soldier/change_list.html'
+    list_filter = [CityFilter, AcademicFieldFilter, DischargeDateFilter,
                    'is_married',
                    'academic_level', 'chevron', 'bulk_state',
                    'psyche_state', ]
@@ -465,6 +253,9 @@ class SoldierAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
                      ]
     ordering = ['created']
     autocomplete_fields = ['location', 'city', 'chevron', 'skill', ]
+    export_fields = ('national_code', 'first_name', 'last_name', 'father_name', 'chevron',
+                     'skill', 'city', 'location', 'phone_number', 'dispatch_date', 'station',
+                     ('ledger__discharge_date', 'تاریخ پایان خدمت'), 'created')
     # date_hierarchy = 'publication_date'
     # filter_horizontal = ('authors',)
 
@@ -476,42 +267,86 @@ class SoldierAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
         return mark_safe(f'<a href="{url}" target="_blank">ایجاد گزارش</a>')
     order_pdf.short_description = 'عملیات'
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view),
+                 name='%s_%s_import' % info),
+            path('import/errors/<uuid:report_id>',
+                 self.admin_site.admin_view(self.import_errors_view),
+                 name='%s_%s_import_errors' % info),
+            *super().get_urls(),
+        ]
+
+    def import_view(self, request):
+        '''Import the soldiers of an uploaded spreadsheet, see `Garrisons.imports`'''
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = SoldierImportForm(request.POST or None, request.FILES or None)
+        result = report_id = None
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            dry_run = form.cleaned_data['dry_run']
+            try:
+                result = import_soldiers(
+                    upload, upload.name, dry_run=dry_run,
+                    locations=models.Location.objects.for_user(request.user))
+            except ImportFileError as error:
+                self.message_user(request, str(error), messages.ERROR)
+            else:
+                if result.errors:
+                    report_id = save_error_report(request.user, result.errors)
+                if result.created and not dry_run:
+                    audit_log(user=str(request.user), action_flag=ADDITION,
+                              action=f'ورود {result.created} وظیفه از فایل {upload.name}',
+                              object_type=self.model._meta.verbose_name_plural)
+        return TemplateResponse(request, 'admin/Garrisons/soldier/import.html', {
+            **self.admin_site.each_context(request),
+            'title': 'ورود وظیفه ها از فایل',
+            'opts': self.model._meta,
+            'form': form,
+            'result': result,
+            'rejected_rows': result and len({error.row for error in result.errors}),
+            'errors': result and result.errors[:settings.SOLDIER_IMPORT_ERRORS_SHOWN],
+            'report_id': report_id,
+        })
+
+    def import_errors_view(self, request, report_id):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        storage = models.reports_storage()
+        name = error_report_name(request.user, report_id)
+        if not storage.exists(name):
+            raise Http404()
+        return FileResponse(storage.open(name, 'rb'), as_attachment=True,
+                            filename='soldier-import-errors.csv')
+
+    def print_reports(self, request, queryset):
+        soldier_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        if len(soldier_ids) <= settings.SOLDIER_REPORT_STREAM_LIMIT:
+            return StreamingHttpResponse(
+                iter_soldier_reports(soldier_ids, request.user),
+                content_type='text/html; charset=utf-8')
+        job = start_report_job(request.user, soldier_ids)
+        return redirect('people:report_job', job.id)
+    print_reports.short_description = 'چاپ گزارش وظیفه های انتخاب شده'
+
+    def get_discharge_jalali(self, obj):
         try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+            discharge_date = obj.ledger.discharge_date
+        except models.SoldierLedger.DoesNotExist:
+            return '-'
+        return format_jalali(discharge_date, DATE_FORMAT) if discharge_date else '-'
+    get_discharge_jalali.admin_order_field = 'ledger__discharge_date'
+    get_discharge_jalali.short_description = 'تاریخ پایان خدمت'
+
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @admin.register(models.Diminution)
-class DiminutionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class DiminutionAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                      JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('soldier', 'day_count', 'spare',
                     'get_created_jalali', 'get_updated_jalali')
     list_filter = ('spare', 'day_count', 'created', 'updated')
@@ -522,41 +357,13 @@ class DiminutionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     # date_hierarchy = 'publication_date'
     # filter_horizontal = ('authors',)
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @admin.register(models.PersonalCard)
-class PersonalCardAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class PersonalCardAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                        JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = (
         'personal', 'card', 'get_registered_jalali', 'get_expired_jalali', 'number',
         'is_active', 'order_pdf')
@@ -570,53 +377,15 @@ class PersonalCardAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
         return mark_safe(f'<a href="{url}" target="_blank">ایجاد گزارش</a>')
     order_pdf.short_description = 'عملیات'
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_registered_jalali(self, obj):
-        return date2jalali(obj.register_date).strftime('%y/%m/%d')
-    get_registered_jalali.admin_order_field = 'register_date'
-    get_registered_jalali.short_description = 'تاریخ شروع اعتبار'
-
-    def get_expired_jalali(self, obj):
-        return date2jalali(obj.exp_date).strftime('%y/%m/%d')
-    get_expired_jalali.admin_order_field = 'exp_date'
-    get_expired_jalali.short_description = 'تاریخ پایان اعتبار'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            personal__locations__garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_registered_jalali = jalali_column('register_date', 'تاریخ شروع اعتبار', DATE_FORMAT)
+    get_expired_jalali = jalali_column('exp_date', 'تاریخ پایان اعتبار', DATE_FORMAT)
 
 
 @admin.register(models.SoldierCard)
-class SoldierCardAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class SoldierCardAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                       JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = (
         'soldier', 'card', 'get_registered_jalali', 'get_expired_jalali', 'number',
         'is_active', 'order_pdf')
@@ -632,51 +401,15 @@ class SoldierCardAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
         return mark_safe(f'<a href="{url}" target="_blank">ایجاد گزارش</a>')
     order_pdf.short_description = 'عملیات'
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_registered_jalali(self, obj):
-        return date2jalali(obj.register_date).strftime('%y/%m/%d')
-    get_registered_jalali.admin_order_field = 'register_date'
-    get_registered_jalali.short_description = 'تاریخ شروع اعتبار'
-
-    def get_expired_jalali(self, obj):
-        return date2jalali(obj.exp_date).strftime('%y/%m/%d')
-    get_expired_jalali.admin_order_field = 'exp_date'
-    get_expired_jalali.short_description = 'تاریخ پایان اعتبار'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_registered_jalali = jalali_column('register_date', 'تاریخ شروع اعتبار', DATE_FORMAT)
+    get_expired_jalali = jalali_column('exp_date', 'تاریخ پایان اعتبار', DATE_FORMAT)
 
 
 @admin.register(models.Chastise)
-class ChastiseAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class ChastiseAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                    JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('personal', 'reason', 'get_registered_jalali',
                     'sentence', 'get_created_jalali', 'get_updated_jalali')
     list_filter = ('created', 'updated')
@@ -684,46 +417,14 @@ class ChastiseAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['personal', 'doorkeeper', ]
     search_fields = ('personal__first_name', 'personal__last_name', 'description')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_registered_jalali(self, obj):
-        return date2jalali(obj.register_date).strftime('%y/%m/%d')
-    get_registered_jalali.admin_order_field = 'register_date'
-    get_registered_jalali.short_description = 'تاریخ شروع'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(personal__locations__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_registered_jalali = jalali_column('register_date', 'تاریخ شروع', DATE_FORMAT)
 
 
 @admin.register(models.Surplus)
-class SurplusAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class SurplusAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                   JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('soldier', 'personal',
                     'reporter', 'reason', 'get_registered_jalali', 'day_count',
                     'get_created_jalali', 'get_updated_jalali')
@@ -732,46 +433,14 @@ class SurplusAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['soldier', 'personal', ]
     search_fields = ('soldier__first_name', 'soldier__last_name', 'description')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_registered_jalali(self, obj):
-        return date2jalali(obj.register_date).strftime('%y/%m/%d')
-    get_registered_jalali.admin_order_field = 'register_date'
-    get_registered_jalali.short_description = 'تاریخ شروع'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_registered_jalali = jalali_column('register_date', 'تاریخ شروع', DATE_FORMAT)
 
 
 @admin.register(models.MobilePortage)
-class MobilePortageAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class MobilePortageAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                         JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('soldier', 'model', 'doorkeeper', 'get_registered_jalali',
                     'day_count', 'smart', 'get_created_jalali', 'get_updated_jalali')
     list_filter = ('smart', 'day_count', 'location', 'created', 'updated')
@@ -780,46 +449,14 @@ class MobilePortageAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['soldier', 'doorkeeper', 'location']
     search_fields = ('soldier__first_name', 'soldier__last_name', 'description')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_registered_jalali(self, obj):
-        return date2jalali(obj.register_date).strftime('%y/%m/%d')
-    get_registered_jalali.admin_order_field = 'register_date'
-    get_registered_jalali.short_description = 'تاریخ شروع'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_registered_jalali = jalali_column('register_date', 'تاریخ شروع', DATE_FORMAT)
 
 
 @admin.register(models.MobilePortagePersonal)
-class MobilePortagePersonalAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class MobilePortagePersonalAdmin(QueryPlanAdminMixin, JalaliDateSearchMixin,
+                                 JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('personal', 'model', 'doorkeeper', 'get_registered_jalali',
                     'smart', 'get_created_jalali', 'get_updated_jalali')
     list_filter = ('smart', 'location', 'created', 'updated')
@@ -828,20 +465,9 @@ class MobilePortagePersonalAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['personal', 'doorkeeper', 'location']
     search_fields = ('personal__first_name', 'personal__last_name', 'description')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_registered_jalali(self, obj):
-        return date2jalali(obj.register_date).strftime('%y/%m/%d')
-    get_registered_jalali.admin_order_field = 'register_date'
-    get_registered_jalali.short_description = 'تاریخ شروع'
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_registered_jalali = jalali_column('register_date', 'تاریخ شروع', DATE_FORMAT)
 
     # def get_queryset(self, request):
     #     qs = super().get_queryset(request)
@@ -850,25 +476,10 @@ class MobilePortagePersonalAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     #         # check01
     #     return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
 
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
-
 
 @admin.register(models.Volatile)
-class VolatileAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class VolatileAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                    JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('soldier', 'get_started_jalali', 'get_ended_jalali',
                     'get_created_jalali', 'get_updated_jalali')
     list_filter = ('created', 'updated')
@@ -876,51 +487,15 @@ class VolatileAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['soldier', ]
     search_fields = ('soldier__first_name', 'soldier__last_name', 'description')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_started_jalali(self, obj):
-        return date2jalali(obj.start_date).strftime('%y/%m/%d')
-    get_started_jalali.admin_order_field = 'start_date'
-    get_started_jalali.short_description = 'تاریخ شروع فرار'
-
-    def get_ended_jalali(self, obj):
-        return date2jalali(obj.end_date).strftime('%y/%m/%d')
-    get_ended_jalali.admin_order_field = 'end_date'
-    get_ended_jalali.short_description = 'تاریخ پایان فرار'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_started_jalali = jalali_column('start_date', 'تاریخ شروع فرار', DATE_FORMAT)
+    get_ended_jalali = jalali_column('end_date', 'تاریخ پایان فرار', DATE_FORMAT)
 
 
 @admin.register(models.Absence)
-class AbsenceAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class AbsenceAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                   JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('soldier', 'get_started_jalali', 'get_ended_jalali',
                     'get_created_jalali', 'get_updated_jalali')
     list_filter = ('created', 'updated')
@@ -928,51 +503,15 @@ class AbsenceAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['soldier', ]
     search_fields = ('soldier__first_name', 'soldier__last_name', 'description')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_started_jalali(self, obj):
-        return date2jalali(obj.start_date).strftime('%y/%m/%d')
-    get_started_jalali.admin_order_field = 'start_date'
-    get_started_jalali.short_description = 'تاریخ شروع نهست'
-
-    def get_ended_jalali(self, obj):
-        return date2jalali(obj.end_date).strftime('%y/%m/%d')
-    get_ended_jalali.admin_order_field = 'end_date'
-    get_ended_jalali.short_description = 'تاریخ پایان نهست'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_started_jalali = jalali_column('start_date', 'تاریخ شروع نهست', DATE_FORMAT)
+    get_ended_jalali = jalali_column('end_date', 'تاریخ پایان نهست', DATE_FORMAT)
 
 
 @admin.register(models.Prison)
-class PrisonAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class PrisonAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                  JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_filter = ('created', 'updated')
     list_display = (
         'soldier', 'reason', 'day_count', 'receipt', 'precept_number', 'location',
@@ -981,41 +520,13 @@ class PrisonAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['soldier', ]
     search_fields = ('soldier__first_name', 'soldier__last_name', 'description')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @admin.register(models.PrisonPersonal)
-class PrisonPersonalAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class PrisonPersonalAdmin(QueryPlanAdminMixin, JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                          ModelAdminJalaliMixin, admin.ModelAdmin):
     list_filter = ('created', 'updated')
     list_display = (
         'personal', 'reason', 'receipt', 'precept_number', 'location',
@@ -1024,15 +535,8 @@ class PrisonPersonalAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['personal', ]
     search_fields = ('personal__first_name', 'personal__last_name', 'description')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
     # def get_queryset(self, request):
     #     qs = super().get_queryset(request)
@@ -1040,25 +544,10 @@ class PrisonPersonalAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     #         return qs
     #     return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
 
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
-
 
 @admin.register(models.Recess)
-class RecessAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class RecessAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                  JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_filter = ('typerec', 'use', 'created', 'updated')
     list_display = (
         'soldier', 'reason', 'day_count', 'typerec', 'precept_number', 'receipt',
@@ -1067,47 +556,15 @@ class RecessAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['soldier', 'receipt']
     search_fields = ('soldier__first_name', 'soldier__last_name', 'description')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_record_jalali(self, obj):
-        if obj.date:
-            return date2jalali(obj.date).strftime('%y/%m/%d')
-    get_record_jalali.admin_order_field = 'date'
-    get_record_jalali.short_description = 'تاریخ ثبت'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+
+    get_record_jalali = jalali_column('date', 'تاریخ ثبت', DATE_FORMAT)
 
 
 @admin.register(models.GoRecess)
-class GoRecessAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class GoRecessAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin, JalaliDateSearchMixin,
+                    JalaliColumnsAdminMixin, ModelAdminJalaliMixin, admin.ModelAdmin):
     list_filter = ('typerec', 'created', 'updated')
     list_display = (
         'soldier', 'day_count', 'typerec', 'get_started_jalali', 'get_ended_jalali',
@@ -1116,49 +573,12 @@ class GoRecessAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     autocomplete_fields = ['soldier', ]
     search_fields = ('soldier__first_name', 'soldier__last_name', 'description')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_started_jalali(self, obj):
-        return date2jalali(obj.start_date).strftime('%y/%m/%d')
-    get_started_jalali.admin_order_field = 'start_date'
-    get_started_jalali.short_description = 'تاریخ شروع'
-
-    def get_ended_jalali(self, obj):
-        return date2jalali(obj.end_date).strftime('%y/%m/%d')
-    get_ended_jalali.admin_order_field = 'end_date'
-    get_ended_jalali.short_description = 'تاریخ پایان'
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_started_jalali = jalali_column('start_date', 'تاریخ شروع', DATE_FORMAT)
+    get_ended_jalali = jalali_column('end_date', 'تاریخ پایان', DATE_FORMAT)
 
     # def save_model(self, request, obj, form, change):
     # if obj.start_date and obj.day_count:
     #     obj.end_date = obj.start_date + datetime.timedelta(days=obj.day_count)
     # return super().save_model(request, obj, form, change)
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(soldier__location__garrison=request.user.garrison).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
@@ -7,3 +7,6 @@ class GarrisonsConfig(AppConfig):
 
     verbose_name = _('پایگاه ها و امور مرتبط به پرسنل')
     verbose_name_plural = _('پایگاه ها و امور مرتبط به پرسنل')
+
+    def ready(self):
+        import apps.Garrisons.signals
@@ -0,0 +1,8 @@
+from django import forms
+
+
+class SoldierImportForm(forms.Form):
+    file = forms.FileField(
+        label='فایل', help_text='فایل csv یا xlsx، با عنوان ستون ها در سطر اول')
+    dry_run = forms.BooleanField(
+        label='فقط بررسی', required=False, help_text='بدون ثبت وظیفه ها')
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+import csv
+import datetime
+import io
+import os
+import re
+import uuid
+from collections import namedtuple
+
+import jdatetime
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from apps.BasicInformations.jalali import PERSIAN_DIGITS, full_jalali_year
+from apps.BasicInformations.models import AcademicField, Chevron, City, Skill
+from apps.BasicInformations.queryplan import str_query_plan
+from apps.BasicInformations.refdata import reference_table
+from apps.BasicInformations.search import model_content_type, normalize, write_documents
+
+from .models import Location, Soldier, SoldierLedger, reports_storage
+
+# the columns a file may have, named by the field or by its verbose_name
+IMPORT_FIELDS = (
+    'national_code', 'first_name', 'last_name', 'father_name', 'academic_level',
+    'academic_field', 'city', 'street', 'precision_address', 'phone_number',
+    'home_phone_number', 'father_phone_number', 'mother_phone_number', 'dispatch_date',
+    'station', 'chevron', 'skill', 'location', 'bulk_state', 'psyche_state', 'is_married',
+    'child_count', 'description',
+)
+# foreign keys, resolved from a `ReferenceMap` instead of validated by a query each
+REFERENCE_FIELDS = ('academic_field', 'city', 'chevron', 'skill', 'location')
+TRUE_VALUES = {'1', 'true', 'yes', 'بله', 'بلی', 'دارد', 'متاهل'}
+FALSE_VALUES = {'0', 'false', 'no', 'خیر', 'ندارد', 'مجرد'}
+DATE_SEPARATOR = re.compile(r'[/\-.]')
+ERROR_REPORT_HEADER = ('ردیف', 'کد ملی', 'ستون', 'خطا')
+
+RowError = namedtuple('RowError', 'row national_code column message')
+
+
+class ImportFileError(Exception):
+    """The file can not be read as a table of soldiers."""
+
+
+def cell_text(value):
+    """The text of a cell, with Persian digits and the floats of spreadsheets read back."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).translate(PERSIAN_DIGITS).strip()
+
+
+def cell_key(value):
+    """The spelling of a cell a `ReferenceMap` or a header is looked up by."""
+    return ' '.join(normalize(cell_text(value)).split())
+
+
+def national_code_is_valid(code):
+    """The check digit of a ten digit national code, also rejecting a repeated digit."""
+    if len(code) != 10 or not code.isdigit() or len(set(code)) == 1:
+        return False
+    remainder = sum(int(digit) * (10 - i) for i, digit in enumerate(code[:9])) % 11
+    check = remainder if remainder < 2 else 11 - remainder
+    return int(code[9]) == check
+
+
+def parse_date(value):
+    """A date cell: a date of the spreadsheet, or Jalali or Gregorian text."""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        year, month, day = (int(part) for part in DATE_SEPARATOR.split(cell_text(value)))
+        if year < 1700:
+            return jdatetime.date(full_jalali_year(year), month, day).togregorian()
+        return datetime.date(year, month, day)
+    except ValueError:
+        raise ValidationError('تاریخ معتبر نیست، مانند ۱۴۰۲/۰۱/۱۵ وارد کنید.')
+
+
+class ReferenceMap:
+    """The ids of the rows of a model by the texts naming them, loaded once per import.
+
+    A row is found by any of its keys, e.g. its title or its code. A key
+    shared by two rows is ambiguous and finds neither.
+    """
+
+    def __init__(self, rows):
+        self.ids = {}
+        self.ambiguous = set()
+        for pk, keys in rows:
+            for key in {cell_key(key) for key in keys if key not in (None, '')}:
+                if self.ids.setdefault(key, pk) != pk:
+                    self.ambiguous.add(key)
+
+    @classmethod
+    def for_reference_model(cls, model, *key_fields):
+        """Keyed by `key_fields` and `str()`, read from the table of `refdata`."""
+        return cls((obj.pk, [str(obj), *(getattr(obj, name) for name in key_fields)])
+                   for obj in reference_table(model).all())
+
+    def resolve(self, value):
+        key = cell_key(value)
+        if key in self.ambiguous:
+            raise ValidationError(f'«{cell_text(value)}» بیش از یک مورد را نشان می‌دهد.')
+        if key not in self.ids:
+            raise ValidationError(f'«{cell_text(value)}» یافت نشد.')
+        return self.ids[key]
+
+
+class SoldierImport:
+    """Validate the rows of a soldiers file and insert the valid ones, a chunk at a time.
+
+    References are resolved from maps loaded once, see `ReferenceMap`. Each
+    chunk costs one query for the national codes already registered, and a
+    few more for the soldiers, ledgers and search documents of its valid
+    rows, inserted with bulk_create. `errors` lists the rejected rows.
+    """
+
+    def __init__(self, locations=None, chunk_size=None, dry_run=False):
+        if locations is None:
+            locations = Location.objects.all()
+        self.chunk_size = chunk_size or settings.SOLDIER_IMPORT_CHUNK_SIZE
+        self.dry_run = dry_run
+        self.references = {
+            'academic_field': ReferenceMap.for_reference_model(AcademicField, 'name'),
+            'city': ReferenceMap.for_reference_model(City, 'name'),
+            'chevron': ReferenceMap.for_reference_model(Chevron, 'title', 'code'),
+            'skill': ReferenceMap.for_reference_model(Skill, 'title', 'code'),
+            'location': ReferenceMap(
+                (obj.pk, [str(obj), obj.name])
+                for obj in str_query_plan(Location).apply(locations)),
+        }
+        self.choices = {
+            field.name: {cell_key(key): code for code, label in field.flatchoices
+                         for key in (code, label)}
+            for field in Soldier._meta.concrete_fields if field.choices}
+        self.seen = {}
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+        self.ignored_columns = []
+
+    def run(self, rows):
+        """Import `rows`, the lists of cells of a file, the header first."""
+        rows = iter(rows)
+        columns = self.read_header(next(rows, None) or ())
+        chunk = []
+        for number, cells in enumerate(rows, start=2):
+            if all(cell_text(cell) == '' for cell in cells):
+                continue
+            chunk.append((number, {name: cells[index] for index, name in columns
+                                   if index < len(cells)}))
+            if len(chunk) == self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        return self
+
+    def read_header(self, header):
+        names = {}
+        for name in IMPORT_FIELDS:
+            field = Soldier._meta.get_field(name)
+            names[cell_key(name)] = names[cell_key(field.verbose_name)] = name
+        columns = []
+        for index, title in enumerate(header):
+            name = names.get(cell_key(title))
+            if name is None:
+                if cell_text(title):
+                    self.ignored_columns.append(cell_text(title))
+            else:
+                columns.append((index, name))
+        found = {name for index, name in columns}
+        missing = [str(field.verbose_name)
+                   for field in map(Soldier._meta.get_field, IMPORT_FIELDS)
+                   if not (field.blank or field.has_default()) and field.name not in found]
+        if missing:
+            raise ImportFileError('ستون های لازم در سطر اول فایل نیست: ' + '، '.join(missing))
+        return columns
+
+    def parse(self, field, value):
+        text = cell_text(value)
+        if text == '':
+            if field.has_default():
+                return field.get_default()
+            if not field.blank:
+                raise ValidationError(field.error_messages['blank'])
+            return None if field.null else ''
+        if field.name in self.references:
+            return self.references[field.name].resolve(text)
+        if field.choices:
+            code = self.choices[field.name].get(cell_key(text))
+            if code is None:
+                raise ValidationError(field.error_messages['invalid_choice'] % {'value': text})
+            return code
+        if field.get_internal_type() == 'DateField':
+            return parse_date(value)
+        if field.get_internal_type() == 'BooleanField':
+            if cell_key(text) in TRUE_VALUES:
+                return True
+            if cell_key(text) in FALSE_VALUES:
+                return False
+            raise ValidationError('بله یا خیر وارد کنید.')
+        if field.name == 'national_code':
+            # spreadsheets drop the leading zeros of a number
+            if text.isdigit() and 8 <= len(text) < 10:
+                text = text.zfill(10)
+            if len(text) == 10 and text.isdigit() and not national_code_is_valid(text):
+                raise ValidationError('رقم کنترل کد ملی درست نیست.')
+        return field.to_python(text)
+
+    def build(self, values):
+        """The unsaved soldier of a row, with the messages of its invalid columns."""
+        soldier = Soldier()
+        errors = {}
+        for name in IMPORT_FIELDS:
+            field = Soldier._meta.get_field(name)
+            try:
+                setattr(soldier, field.attname, self.parse(field, values.get(name)))
+            except ValidationError as error:
+                errors[name] = error.messages
+        try:
+            soldier.clean_fields(exclude=[*errors, *REFERENCE_FIELDS])
+        except ValidationError as error:
+            errors.update(error.message_dict)
+        return soldier, errors
+
+    def add_errors(self, number, national_code, errors):
+        for name, messages in errors.items():
+            column = str(Soldier._meta.get_field(name).verbose_name)
+            self.errors.extend(RowError(number, national_code, column, message)
+                               for message in messages)
+
+    def import_chunk(self, chunk):
+        self.rows += len(chunk)
+        soldiers = {}
+        for number, values in chunk:
+            soldier, errors = self.build(values)
+            if 'national_code' not in errors:
+                first = self.seen.setdefault(soldier.national_code, number)
+                if first != number:
+                    errors['national_code'] = [f'تکراری، مانند ردیف {first} همین فایل.']
+            if errors:
+                self.add_errors(number, cell_text(values.get('national_code')), errors)
+            else:
+                soldiers[number] = soldier
+        if not soldiers:
+            return
+        # once more if another import registered one of the codes meanwhile
+        for retry in (True, False):
+            try:
+                with transaction.atomic():
+                    existing = set(Soldier._base_manager.filter(
+                        national_code__in=[soldier.national_code for soldier in soldiers.values()]
+                    ).values_list('national_code', flat=True))
+                    valid = [soldier for soldier in soldiers.values()
+                             if soldier.national_code not in existing]
+                    if valid and not self.dry_run:
+                        self.insert(valid)
+                break
+            except IntegrityError:
+                if not retry:
+                    raise
+        for number, soldier in soldiers.items():
+            if soldier.national_code in existing:
+                self.add_errors(number, soldier.national_code,
+                                {'national_code': ['پیش از این ثبت شده است.']})
+        self.created += len(valid)
+
+    def insert(self, soldiers):
+        """bulk_create skips the signals: add the ledgers and search documents here."""
+        Soldier.objects.bulk_create(soldiers)
+        if soldiers[0].pk is None:
+            ids = dict(Soldier._base_manager.filter(
+                national_code__in=[soldier.national_code for soldier in soldiers]
+            ).values_list('national_code', 'pk'))
+            for soldier in soldiers:
+                soldier.pk = ids[soldier.national_code]
+        SoldierLedger.objects.bulk_create([
+            SoldierLedger(soldier_id=soldier.pk,
+                          discharge_date=SoldierLedger.project_discharge_date(
+                              soldier.dispatch_date, {}))
+            for soldier in soldiers])
+        write_documents(model_content_type(Soldier), soldiers)
+
+
+def read_rows(file, name):
+    """Yield the rows of the .csv or .xlsx `file`, a binary file, as lists of cells."""
+    extension = os.path.splitext(name)[1].lower()
+    if extension == '.csv':
+        try:
+            yield from csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        except UnicodeDecodeError:
+            raise ImportFileError('فایل csv باید با کدگذاری UTF-8 ذخیره شده باشد.')
+    elif extension == '.xlsx':
+        try:
+            import openpyxl
+        except ImportError:
+            raise ImportFileError('برای خواندن فایل xlsx بسته openpyxl نصب نیست.')
+        # read_only streams the rows instead of loading the whole sheet
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        raise ImportFileError('فقط فایل های csv و xlsx پذیرفته می‌شوند.')
+
+
+def import_soldiers(file, name, **kwargs):
+    """Import the soldiers of a file; returns its `SoldierImport`."""
+    return SoldierImport(**kwargs).run(read_rows(file, name))
+
+
+def write_error_report(errors, output):
+    """Write `errors`, a list of `RowError`, as CSV to the text file `output`."""
+    writer = csv.writer(output)
+    writer.writerow(ERROR_REPORT_HEADER)
+    writer.writerows(errors)
+
+
+def save_error_report(user, errors):
+    """Keep the error report of an import of `user`; returns its id."""
+    report_id = uuid.uuid4()
+    output = io.StringIO()
+    write_error_report(errors, output)
+    # with a BOM, so that Excel reads the Persian text
+    content = io.BytesIO(('\ufeff' + output.getvalue()).encode())
+    reports_storage().save(error_report_name(user, report_id), content)
+    return report_id
+
+
+def error_report_name(user, report_id):
+    return f'imports/{user.pk}/{report_id}.csv'
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.Garrisons.imports import ImportFileError, import_soldiers, write_error_report
+from apps.Garrisons.models import Location
+
+
+class Command(BaseCommand):
+    help = 'Import soldiers from a .csv or .xlsx file, the column titles in its first row.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The .csv or .xlsx file')
+        parser.add_argument('--garrison', type=int,
+                            help='Only accept the locations of this garrison id')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Rows validated and inserted together '
+                                 '(default: SOLDIER_IMPORT_CHUNK_SIZE)')
+        parser.add_argument('--errors', help='Write the rejected rows to this CSV file')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate the file without inserting anything')
+
+    def handle(self, *args, **options):
+        locations = Location.objects.all()
+        if options['garrison']:
+            locations = locations.for_garrison(options['garrison'])
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_soldiers(file, options['path'], locations=locations,
+                                         chunk_size=options['chunk_size'],
+                                         dry_run=options['dry_run'])
+        except (OSError, ImportFileError) as error:
+            raise CommandError(error)
+
+        if result.ignored_columns:
+            self.stdout.write(self.style.WARNING(
+                'Ignored columns: ' + ', '.join(result.ignored_columns)))
+        if result.errors:
+            if options['errors']:
+                with open(options['errors'], 'w', encoding='utf-8-sig', newline='') as output:
+                    write_error_report(result.errors, output)
+            else:
+                write_error_report(result.errors, self.stderr)
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        rejected = len({error.row for error in result.errors})
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result.created} of {result.rows} soldiers, {rejected} rows rejected.'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from apps.Garrisons.models import Soldier, SoldierLedger
+
+
+class Command(BaseCommand):
+    help = 'Recompute the service ledger and discharge date of soldiers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('soldier_ids', nargs='*', type=int,
+                            help='Only rebuild these soldiers (default: all)')
+        parser.add_argument('--garrison', type=int,
+                            help='Only rebuild the soldiers of this garrison id')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        soldiers = Soldier.objects.all()
+        if options['garrison']:
+            soldiers = soldiers.for_garrison(options['garrison'])
+        if options['soldier_ids']:
+            soldiers = soldiers.filter(pk__in=options['soldier_ids'])
+        soldier_ids = list(soldiers.order_by('pk').values_list('pk', flat=True))
+
+        chunk_size = options['chunk_size']
+        rebuilt = 0
+        for start in range(0, len(soldier_ids), chunk_size):
+            chunk = soldier_ids[start:start + chunk_size]
+            rebuilt += len(SoldierLedger.objects.rebuild(
+                Soldier.objects.filter(pk__gte=chunk[0], pk__lte=chunk[-1]).filter(
+                    pk__in=soldiers.values('pk'))))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} soldier ledgers.'))
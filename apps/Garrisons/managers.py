@@ -0,0 +1,148 @@
+import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import (Count, DurationField, Exists, ExpressionWrapper, F,
+                              OuterRef, Sum)
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import timezone
+
+
+def is_multivalued(model, path):
+    """Whether `path` crosses a many-to-many or reverse foreign key relation."""
+    for name in path.split(LOOKUP_SEP):
+        if name == 'pk':
+            return False
+        field = model._meta.get_field(name)
+        if field.many_to_many or field.one_to_many:
+            return True
+        model = field.related_model
+        if model is None:
+            return False
+    return False
+
+
+class GarrisonScopedQuerySet(models.QuerySet):
+    """Filter the rows of a model down to one garrison.
+
+    The model declares `garrison_path`, the lookup leading from it to
+    `Garrisons.Garrison`, e.g. 'soldier__location__garrison'.
+    """
+
+    def for_garrison(self, garrison):
+        path = self.model.garrison_path
+        if not is_multivalued(self.model, path):
+            return self.filter(**{path: garrison})
+        # EXISTS keeps one row per object, without a DISTINCT over the join
+        return self.filter(Exists(self.model._base_manager.filter(
+            pk=OuterRef('pk'), **{path: garrison})))
+
+    def for_user(self, user):
+        if user.is_superuser:
+            return self
+        garrison_id = getattr(user, 'garrison_id', None)
+        if garrison_id is None:
+            return self.none()
+        return self.for_garrison(garrison_id)
+
+
+class ReportJobQuerySet(models.QuerySet):
+
+    def fail_stale(self):
+        """Mark failed the queued and running jobs without progress for a while.
+
+        Their worker thread died with its process, e.g. on a restart, and
+        would leave them queued or running forever. Each step of a worker
+        touches `updated`, see `Garrisons.reports`. Returns the row count.
+        """
+        now = timezone.now()
+        deadline = now - datetime.timedelta(seconds=settings.SOLDIER_REPORT_JOB_TIMEOUT)
+        return self.filter(status__in=('P', 'R'), updated__lt=deadline).update(
+            status='F', updated=now)
+
+
+class SoldierLedgerManager(models.Manager):
+    """Build and update `SoldierLedger` rows from the entries listed in `SOURCES`.
+
+    Saving or deleting an entry posts its difference to one ledger row, see
+    `Garrisons.signals`. Bulk changes bypass the signals and need a rebuild.
+    """
+
+    def sources(self):
+        return [(apps.get_model(label), prefix)
+                for label, prefix in self.model.SOURCES.items()]
+
+    def soldiers(self):
+        return self.model._meta.get_field('soldier').related_model._base_manager.all()
+
+    @staticmethod
+    def days_expression(model):
+        if callable(model.day_count):
+            return ExpressionWrapper(F('end_date') - F('start_date'),
+                                     output_field=DurationField())
+        return F('day_count')
+
+    def for_soldier(self, soldier):
+        # read the row, `soldier.ledger` may be cached from before a post
+        ledger = self.filter(soldier=soldier).first()
+        if ledger is None:
+            ledger = self.rebuild(self.soldiers().filter(pk=soldier.pk))[0]
+        ledger.soldier = soldier
+        return ledger
+
+    def post(self, soldier_id, prefix, count, days):
+        if not (count or days):
+            return
+        with transaction.atomic():
+            ledger = self.select_for_update().select_related('soldier').filter(
+                soldier_id=soldier_id).first()
+            if ledger is None:
+                # the rebuild reads the entry as it is now in the database
+                self.rebuild(self.soldiers().filter(pk=soldier_id))
+                return
+            ledger.post(prefix, count, days)
+            ledger.save()
+
+    def compute(self, soldiers):
+        """Map the ids of `soldiers`, a Soldier queryset, to their ledger values.
+
+        Each source is totalled by one aggregate grouped by soldier_id, so the
+        cost does not grow with a query per soldier.
+        """
+        soldiers = soldiers.order_by()
+        dispatch_dates = dict(soldiers.values_list('pk', 'dispatch_date'))
+        values = {pk: {} for pk in dispatch_dates}
+        days = {pk: {} for pk in dispatch_dates}
+        for model, prefix in self.sources():
+            totals = model._base_manager.filter(
+                soldier__in=soldiers.values('pk')).order_by().values(
+                    'soldier_id').annotate(
+                        count=Count('pk'), days=Sum(self.days_expression(model))
+                    ).values_list('soldier_id', 'count', 'days')
+            for soldier_id, count, total in totals:
+                if soldier_id not in values:
+                    continue
+                if isinstance(total, datetime.timedelta):
+                    total = total.days
+                values[soldier_id][f'{prefix}_count'] = count
+                values[soldier_id][f'{prefix}_days'] = days[soldier_id][prefix] = total or 0
+        for pk, dispatch_date in dispatch_dates.items():
+            values[pk]['discharge_date'] = self.model.project_discharge_date(
+                dispatch_date, days[pk])
+        return values
+
+    def discharge_dates(self, soldiers):
+        """Map the ids of `soldiers` to their projected discharge dates."""
+        return {pk: values['discharge_date']
+                for pk, values in self.compute(soldiers).items()}
+
+    def rebuild(self, soldiers=None):
+        """Recompute and store the ledgers of `soldiers`, by default every soldier."""
+        if soldiers is None:
+            soldiers = self.soldiers()
+        ledgers = [self.model(soldier_id=pk, **values)
+                   for pk, values in self.compute(soldiers).items()]
+        with transaction.atomic():
+            self.filter(soldier__in=soldiers.values('pk')).delete()
+            return self.bulk_create(ledgers, batch_size=500)
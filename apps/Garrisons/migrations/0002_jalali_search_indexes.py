@@ -0,0 +1,84 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:56
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Garrisons', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='personal',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='تاریخ و زمان درج'),
+        ),
+        migrations.AlterField(
+            model_name='personal',
+            name='mobile_phone_number',
+            field=models.CharField(max_length=11, validators=[django.core.validators.RegexValidator('^[0-9]*$', 'فقط عدد وارد کنید.')], verbose_name='شماره تلفن همراه'),
+        ),
+        migrations.AlterField(
+            model_name='personal',
+            name='nationalCode',
+            field=models.CharField(max_length=10, null=True, unique=True, validators=[django.core.validators.RegexValidator('^[0-9]*$', 'فقط عدد وارد کنید.'), django.core.validators.RegexValidator('^.{10}$', 'کد ملی بایستی ده رقم باشد')], verbose_name='کد ملی'),
+        ),
+        migrations.AlterField(
+            model_name='personal',
+            name='office_phone_number',
+            field=models.CharField(max_length=11, validators=[django.core.validators.RegexValidator('^[0-9]*$', 'فقط عدد وارد کنید.')], verbose_name='شماره تلفن اداری'),
+        ),
+        migrations.AlterField(
+            model_name='personal',
+            name='personalCode',
+            field=models.CharField(max_length=10, unique=True, validators=[django.core.validators.RegexValidator('^[0-9]*$', 'فقط عدد وارد کنید.')], verbose_name='کد پایوری'),
+        ),
+        migrations.AlterField(
+            model_name='personal',
+            name='phoneNumber',
+            field=models.CharField(max_length=11, null=True, validators=[django.core.validators.RegexValidator('^[0-9]*$', 'فقط عدد وارد کنید.')], verbose_name='شماره تلفن منزل'),
+        ),
+        migrations.AlterField(
+            model_name='personal',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True, verbose_name='تاریخ و زمان بروز رسانی'),
+        ),
+        migrations.AlterField(
+            model_name='soldier',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='تاریخ و زمان درج'),
+        ),
+        migrations.AlterField(
+            model_name='soldier',
+            name='father_phone_number',
+            field=models.CharField(blank=True, max_length=11, null=True, validators=[django.core.validators.RegexValidator('^[0-9]*$', 'فقط عدد وارد کنید.'), django.core.validators.RegexValidator('^.{11}$', 'تعداد ارقام کافی نیست')], verbose_name='شماره تلفن همراه پدر'),
+        ),
+        migrations.AlterField(
+            model_name='soldier',
+            name='home_phone_number',
+            field=models.CharField(blank=True, max_length=11, null=True, validators=[django.core.validators.RegexValidator('^[0-9]*$', 'فقط عدد وارد کنید.')], verbose_name='شماره تلفن منزل'),
+        ),
+        migrations.AlterField(
+            model_name='soldier',
+            name='mother_phone_number',
+            field=models.CharField(blank=True, max_length=11, null=True, validators=[django.core.validators.RegexValidator('^[0-9]*$', 'فقط عدد وارد کنید.'), django.core.validators.RegexValidator('^.{11}$', 'تعداد ارقام کافی نیست')], verbose_name='شماره تلفن همراه مادر'),
+        ),
+        migrations.AlterField(
+            model_name='soldier',
+            name='national_code',
+            field=models.CharField(max_length=10, unique=True, validators=[django.core.validators.RegexValidator('^[0-9]*$', 'فقط عدد وارد کنید.'), django.core.validators.RegexValidator('^.{10}$', 'کد ملی بایستی ده رقم باشد')], verbose_name='کد ملی'),
+        ),
+        migrations.AlterField(
+            model_name='soldier',
+            name='phone_number',
+            field=models.CharField(blank=True, max_length=11, null=True, validators=[django.core.validators.RegexValidator('^[0-9]*$', 'فقط عدد وارد کنید.'), django.core.validators.RegexValidator('^.{11}$', 'تعداد ارقام کافی نیست')], verbose_name='شماره تلفن همراه'),
+        ),
+        migrations.AlterField(
+            model_name='soldier',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True, verbose_name='تاریخ و زمان بروز رسانی'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.1.14 on 2026-10-18 18:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Garrisons', '0002_jalali_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SoldierLedger',
+            fields=[
+                ('soldier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger', serialize=False, to='Garrisons.soldier', verbose_name='وظیفه')),
+                ('recess_count', models.PositiveIntegerField(default=0, verbose_name='تعداد مرخصی ها')),
+                ('recess_days', models.PositiveIntegerField(default=0, verbose_name='روزهای مرخصی')),
+                ('gone_recess_count', models.PositiveIntegerField(default=0, verbose_name='تعداد مرخصی های رفته')),
+                ('gone_recess_days', models.PositiveIntegerField(default=0, verbose_name='روزهای مرخصی رفته')),
+                ('surplus_count', models.PositiveIntegerField(default=0, verbose_name='تعداد اضافه خدمت ها')),
+                ('surplus_days', models.PositiveIntegerField(default=0, verbose_name='روزهای اضافه خدمت')),
+                ('prison_count', models.PositiveIntegerField(default=0, verbose_name='تعداد بازداشت ها')),
+                ('prison_days', models.PositiveIntegerField(default=0, verbose_name='روزهای بازداشت')),
+                ('mobile_portage_count', models.PositiveIntegerField(default=0, verbose_name='تعداد حمل اشیا غیرمجاز')),
+                ('mobile_portage_days', models.PositiveIntegerField(default=0, verbose_name='روزهای اضافه خدمت حمل اشیا غیرمجاز')),
+                ('diminution_count', models.PositiveIntegerField(default=0, verbose_name='تعداد کسری ها')),
+                ('diminution_days', models.PositiveIntegerField(default=0, verbose_name='روزهای کسری خدمت')),
+                ('absence_count', models.PositiveIntegerField(default=0, verbose_name='تعداد نهست ها')),
+                ('absence_days', models.PositiveIntegerField(default=0, verbose_name='روزهای نهست')),
+                ('volatile_count', models.PositiveIntegerField(default=0, verbose_name='تعداد فرارها')),
+                ('volatile_days', models.PositiveIntegerField(default=0, verbose_name='روزهای فرار')),
+                ('discharge_date', models.DateField(blank=True, db_index=True, null=True, verbose_name='تاریخ پایان خدمت')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='تاریخ و زمان بروز رسانی')),
+            ],
+            options={
+                'verbose_name': 'کارنامه خدمتی وظیفه',
+                'verbose_name_plural': 'کارنامه های خدمتی وظیفه ها',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.1.14 on 2026-10-18 18:06
+
+import apps.Garrisons.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Garrisons', '0003_soldier_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=128, verbose_name='عنوان')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='تعداد کل')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='تعداد انجام شده')),
+                ('status', models.CharField(choices=[('P', 'در صف'), ('R', 'در حال تهیه'), ('D', 'آماده'), ('F', 'ناموفق')], default='P', max_length=1, verbose_name='وضعیت')),
+                ('file', models.FileField(blank=True, null=True, storage=apps.Garrisons.models.reports_storage, upload_to='soldiers', verbose_name='فایل')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='تاریخ و زمان بروز رسانی')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'گزارش در حال تهیه',
+                'verbose_name_plural': 'گزارش های در حال تهیه',
+            },
+        ),
+    ]
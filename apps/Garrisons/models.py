@@ -3,10 +3,15 @@ import datetime
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
+from apps.BasicInformations.jalali import add_jalali_months
+
+from .managers import GarrisonScopedQuerySet, ReportJobQuerySet, SoldierLedgerManager
+
 
 class Garrison(models.Model):
     name = models.CharField(max_length=60, null=False, blank=False,
@@ -36,6 +41,12 @@ class Garrison(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, blank=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    # a user sees the garrison of its `garrison` field, `admin_user` the other way round
+    garrison_path = 'pk'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('name',)
+    search_document_fields = ('name',)
+
     class Meta:
         verbose_name = 'پایگاه'
         verbose_name_plural = 'پایگاه ها'
@@ -55,6 +66,8 @@ class LocationCategory(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, blank=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    str_fields = ('name',)
+
     class Meta:
         verbose_name = 'دسته بندی'
         verbose_name_plural = 'دسته بندی های مکان ها'
@@ -94,6 +107,11 @@ class Location(models.Model):
         auto_now=True, null=True, blank=True, verbose_name='تاریخ و زمان بروز رسانی')
     pass
 
+    garrison_path = 'garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('name', 'garrison')
+    search_document_fields = ('name', 'liable', 'phone_number', 'description')
+
     class Meta:
         verbose_name = 'مکان'
         verbose_name_plural = 'مکان ها'
@@ -121,6 +139,10 @@ class EnvironsInformation(models.Model):
         auto_now=True, null=True, blank=True, verbose_name='تاریخ و زمان بروز رسانی')
     pass
 
+    garrison_path = 'garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('title', 'garrison')
+
     class Meta:
         verbose_name = 'اطلاعات حومه'
         verbose_name_plural = 'اطلاعات حومه'
@@ -155,6 +177,8 @@ class Event(models.Model):
         auto_now=True, null=True, blank=True, verbose_name='تاریخ و زمان بروز رسانی')
     pass
 
+    str_fields = ('category',)
+
     class Meta:
         verbose_name = 'رویداد فیزیکی'
         verbose_name_plural = 'رویداد های فیزیکی'
@@ -213,9 +237,17 @@ class Personal(models.Model):
         null=True, blank=True, verbose_name='تصویر',
         upload_to='UploadFiles\Images\Personals')
     description = models.TextField(null=True, blank=True, verbose_name='توضیحات تکمیلی')
-    created = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')
+    created = models.DateTimeField(auto_now_add=True, db_index=True,
+                                   verbose_name='تاریخ و زمان درج')
     updated = models.DateTimeField(
-        auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
+        auto_now=True, null=True, db_index=True, verbose_name='تاریخ و زمان بروز رسانی')
+
+    garrison_path = 'locations__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('chevron', 'first_name', 'last_name', 'personalCode')
+    search_document_fields = ('first_name', 'last_name', 'personalCode', 'nationalCode',
+                              'jobSubject', 'actionJob', 'phoneNumber', 'mobile_phone_number',
+                              'office_phone_number', 'description')
 
     class Meta:
         verbose_name = 'پایور'
@@ -324,9 +356,17 @@ class Soldier(models.Model):
         null=True, blank=True, verbose_name='تصویر',
         upload_to='UploadFiles\Images\Soldiers')
     description = models.TextField(null=True, blank=True, verbose_name='توضیحات تکمیلی')
-    created = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')
+    created = models.DateTimeField(auto_now_add=True, db_index=True,
+                                   verbose_name='تاریخ و زمان درج')
     updated = models.DateTimeField(
-        auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
+        auto_now=True, null=True, db_index=True, verbose_name='تاریخ و زمان بروز رسانی')
+
+    garrison_path = 'location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('chevron', 'first_name', 'last_name', 'national_code')
+    search_document_fields = ('first_name', 'last_name', 'national_code', 'father_name',
+                              'phone_number', 'home_phone_number', 'father_phone_number',
+                              'mother_phone_number', 'description')
 
     class Meta:
         verbose_name = 'وظیفه'
@@ -353,6 +393,8 @@ class PersonalLearnCourse(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و ز مان بروز رسانی')
 
+    str_fields = ('title',)
+
     class Meta:
         verbose_name = 'دوره طی شده پایور'
         verbose_name_plural = 'دوره های طی شده پایوران'
@@ -382,6 +424,8 @@ class SoldierLearnCourse(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و ز مان بروز رسانی')
 
+    str_fields = ('title',)
+
     class Meta:
         verbose_name = 'دوره طی شده وظیفه'
         verbose_name_plural = 'دوره های طی شده وظیفه ها'
@@ -429,6 +473,10 @@ class Owner(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('personal',)
+
     class Meta:
         verbose_name = 'ذی حساب'
         verbose_name_plural = 'ذی حساب ها'
@@ -460,6 +508,10 @@ class Diminution(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'soldier__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('soldier',)
+
     class Meta:
         verbose_name = 'کسری خدمت وظیفه'
         verbose_name_plural = 'کسری خدمت وظیفه ها'
@@ -487,6 +539,10 @@ class PersonalCard(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'personal__locations__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('card', 'personal')
+
     class Meta:
         verbose_name = 'کارت پایور'
         verbose_name_plural = 'کارت های پایوران'
@@ -522,6 +578,10 @@ class SoldierCard(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'soldier__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('card', 'soldier')
+
     class Meta:
         verbose_name = 'کارت وظیفه'
         verbose_name_plural = 'کارت های وظیفه'
@@ -554,6 +614,10 @@ class Chastise(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'personal__locations__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('personal',)
+
     class Meta:
         verbose_name = 'تنبیه پایور'
         verbose_name_plural = 'تنبیهات پایور'
@@ -581,6 +645,10 @@ class Surplus(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'soldier__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('soldier',)
+
     class Meta:
         verbose_name = 'اضافه خدمت وظیفه'
         verbose_name_plural = 'اضافات خدمت وظیفه ها'
@@ -608,6 +676,8 @@ class MobilePortagePersonal(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    str_fields = ('personal',)
+
     class Meta:
         verbose_name = 'حمل غیرمجاز شی توسط پایور'
         verbose_name_plural = 'حمل غیرمجاز اشیا توسط پایوران'
@@ -637,6 +707,10 @@ class MobilePortage(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'soldier__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('soldier',)
+
     class Meta:
         verbose_name = 'حمل غیرمجاز شی توسط وظیفه'
         verbose_name_plural = 'حمل غیرمجاز اشیا توسط وظیفه ها'
@@ -658,6 +732,10 @@ class Volatile(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'soldier__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('soldier',)
+
     class Meta:
         verbose_name = 'فرار وظیفه'
         verbose_name_plural = 'فرار وظیفه ها'
@@ -689,6 +767,10 @@ class Absence(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'soldier__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('soldier',)
+
     class Meta:
         verbose_name = 'نهست'
         verbose_name_plural = 'نهست ها'
@@ -727,6 +809,10 @@ class Prison(models.Model):
     updated = models.DateTimeField(verbose_name='تاریخ و زمان بروز رسانی',
                                    auto_now=True, null=True, )
 
+    garrison_path = 'soldier__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('soldier',)
+
     class Meta:
         verbose_name = 'بازداشت وظیفه'
         verbose_name_plural = 'بازداشت وظیفه ها'
@@ -753,6 +839,8 @@ class PrisonPersonal(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    str_fields = ('personal',)
+
     class Meta:
         verbose_name = 'بازداشت پایور'
         verbose_name_plural = 'بازداشت پایوران'
@@ -788,6 +876,10 @@ class Recess(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'soldier__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('soldier',)
+
     class Meta:
         verbose_name = 'مرخصی'
         verbose_name_plural = 'مرخصی ها'
@@ -819,6 +911,10 @@ class GoRecess(models.Model):
     updated = models.DateTimeField(verbose_name='تاریخ و زمان بروز رسانی',
                                    auto_now=True, null=True, )
 
+    garrison_path = 'soldier__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('soldier',)
+
     class Meta:
         verbose_name = 'مرخصی رفته'
         verbose_name_plural = 'مرخصی های رفته'
@@ -837,16 +933,146 @@ class GoRecess(models.Model):
             raise ValidationError(
                 "تاریخ پایان با توجه به تعداد روز درست نمی‌باشد.")
 
-        total_available_recesses = sum([x.day_count for x in self.soldier.recesses.all()])
-        total_gone_recesses = sum([x.day_count for x in self.soldier.gone_recesses.all()])
-
+        if self.soldier is None:
+            return
+        ledger = SoldierLedger.objects.for_soldier(self.soldier)
+        total_gone_recesses = ledger.gone_recess_days
         if self.id:
-            total_gone_recesses = sum([x.day_count
-                                       for x in self.soldier.gone_recesses.exclude(
-                                           id=self.id)])
+            total_gone_recesses -= GoRecess.objects.filter(
+                id=self.id, soldier=self.soldier).values_list(
+                    'day_count', flat=True).first() or 0
 
-        total_leftover = total_available_recesses - total_gone_recesses
+        total_leftover = ledger.recess_days - total_gone_recesses
 
         if self.day_count > total_leftover:
             raise ValidationError(
                 "تعداد روزهای مرخصی رفته از مجموع مرخصی‌های باقی‌مانده وظیفه بیشتر خواهد شد.")
+
+
+class SoldierLedger(models.Model):
+    '''Running totals of a soldier's service, kept in step by signals'''
+    SOURCES = {
+        'Garrisons.Recess': 'recess',
+        'Garrisons.GoRecess': 'gone_recess',
+        'Garrisons.Surplus': 'surplus',
+        'Garrisons.Prison': 'prison',
+        'Garrisons.MobilePortage': 'mobile_portage',
+        'Garrisons.Diminution': 'diminution',
+        'Garrisons.Absence': 'absence',
+        'Garrisons.Volatile': 'volatile',
+    }
+
+    soldier = models.OneToOneField(
+        'Soldier', on_delete=models.CASCADE, primary_key=True,
+        related_name='ledger', verbose_name='وظیفه')
+    recess_count = models.PositiveIntegerField(default=0, verbose_name='تعداد مرخصی ها')
+    recess_days = models.PositiveIntegerField(default=0, verbose_name='روزهای مرخصی')
+    gone_recess_count = models.PositiveIntegerField(
+        default=0, verbose_name='تعداد مرخصی های رفته')
+    gone_recess_days = models.PositiveIntegerField(
+        default=0, verbose_name='روزهای مرخصی رفته')
+    surplus_count = models.PositiveIntegerField(default=0, verbose_name='تعداد اضافه خدمت ها')
+    surplus_days = models.PositiveIntegerField(default=0, verbose_name='روزهای اضافه خدمت')
+    prison_count = models.PositiveIntegerField(default=0, verbose_name='تعداد بازداشت ها')
+    prison_days = models.PositiveIntegerField(default=0, verbose_name='روزهای بازداشت')
+    mobile_portage_count = models.PositiveIntegerField(
+        default=0, verbose_name='تعداد حمل اشیا غیرمجاز')
+    mobile_portage_days = models.PositiveIntegerField(
+        default=0, verbose_name='روزهای اضافه خدمت حمل اشیا غیرمجاز')
+    diminution_count = models.PositiveIntegerField(default=0, verbose_name='تعداد کسری ها')
+    diminution_days = models.PositiveIntegerField(default=0, verbose_name='روزهای کسری خدمت')
+    absence_count = models.PositiveIntegerField(default=0, verbose_name='تعداد نهست ها')
+    absence_days = models.PositiveIntegerField(default=0, verbose_name='روزهای نهست')
+    volatile_count = models.PositiveIntegerField(default=0, verbose_name='تعداد فرارها')
+    volatile_days = models.PositiveIntegerField(default=0, verbose_name='روزهای فرار')
+    discharge_date = models.DateField(null=True, blank=True, db_index=True,
+                                      verbose_name='تاریخ پایان خدمت')
+    updated = models.DateTimeField(auto_now=True, verbose_name='تاریخ و زمان بروز رسانی')
+
+    objects = SoldierLedgerManager()
+    str_fields = ('soldier',)
+
+    class Meta:
+        verbose_name = 'کارنامه خدمتی وظیفه'
+        verbose_name_plural = 'کارنامه های خدمتی وظیفه ها'
+
+    def __str__(self):
+        return 'کارنامه خدمتی وظیفه {0}'.format(self.soldier)
+
+    @property
+    def total_surplus_days(self):
+        return self.surplus_days + self.prison_days + self.mobile_portage_days
+
+    @property
+    def left_recess_days(self):
+        return self.recess_days - self.gone_recess_days
+
+    @staticmethod
+    def entry_days(entry):
+        days = entry.day_count
+        return days() if callable(days) else days
+
+    def post(self, prefix, count, days):
+        '''Add `count` entries lasting `days` in total to the totals of `prefix`'''
+        setattr(self, f'{prefix}_count', getattr(self, f'{prefix}_count') + count)
+        setattr(self, f'{prefix}_days', getattr(self, f'{prefix}_days') + days)
+        self.discharge_date = self.get_discharge_date()
+
+    def get_discharge_date(self):
+        return self.project_discharge_date(
+            self.soldier.dispatch_date,
+            {prefix: getattr(self, f'{prefix}_days') for prefix in self.SOURCES.values()})
+
+    @staticmethod
+    def project_discharge_date(dispatch_date, days):
+        '''`days` maps the prefixes of `SOURCES` to their total days'''
+        if not dispatch_date:
+            return None
+        extension = sum(days.get(prefix, 0) for prefix in (
+            'surplus', 'prison', 'mobile_portage', 'absence', 'volatile'))
+        extension -= days.get('diminution', 0)
+        return add_jalali_months(dispatch_date, settings.SOLDIER_SERVICE_MONTHS) +\
+            datetime.timedelta(days=extension)
+
+
+def reports_storage():
+    return FileSystemStorage(location=settings.REPORTS_ROOT)
+
+
+class ReportJob(models.Model):
+    '''A printable report rendered in the background'''
+    STATUS_CHOICES = (
+        ('P', 'در صف'),
+        ('R', 'در حال تهیه'),
+        ('D', 'آماده'),
+        ('F', 'ناموفق'),
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='report_jobs', verbose_name='کاربر')
+    title = models.CharField(max_length=128, verbose_name='عنوان')
+    total = models.PositiveIntegerField(default=0, verbose_name='تعداد کل')
+    done = models.PositiveIntegerField(default=0, verbose_name='تعداد انجام شده')
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default='P',
+                              verbose_name='وضعیت')
+    file = models.FileField(storage=reports_storage, upload_to='soldiers',
+                            null=True, blank=True, verbose_name='فایل')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')
+    updated = models.DateTimeField(auto_now=True, verbose_name='تاریخ و زمان بروز رسانی')
+
+    objects = ReportJobQuerySet.as_manager()
+    str_fields = ('title',)
+
+    class Meta:
+        verbose_name = 'گزارش در حال تهیه'
+        verbose_name_plural = 'گزارش های در حال تهیه'
+
+    def __str__(self):
+        return self.title
+
+    @property
+    def is_finished(self):
+        return self.status in ('D', 'F')
+
+    @property
+    def progress(self):
+        return 100 * self.done // self.total if self.total else 100
@@ -0,0 +1,86 @@
+import tempfile
+import threading
+
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+
+from .models import ReportJob, Soldier, SoldierCard, SoldierLedger
+
+REPORT_PAGES = '<!-- soldier reports -->'
+
+
+def soldier_report_queryset(soldiers):
+    '''Everything a soldier report page shows, loaded per chunk instead of per soldier'''
+    return soldiers.select_related(
+        'ledger', 'location__garrison', 'chevron', 'skill', 'city',
+    ).prefetch_related(
+        'learned_courses',
+        Prefetch('cards', queryset=SoldierCard.objects.select_related('card')),
+    ).order_by('pk')
+
+
+def iter_soldier_reports(soldier_ids, user, chunk_size=50, progress=None):
+    '''Yield one printable document of the soldiers of `soldier_ids`, page by page.
+
+    `progress` is called with the number of pages rendered after each chunk.
+    '''
+    missing = Soldier.objects.filter(pk__in=soldier_ids, ledger__isnull=True)
+    if missing.exists():
+        SoldierLedger.objects.rebuild(missing)
+    head, tail = render_to_string(
+        'reports/soldiers-to-pdf.html', {'user': user}).split(REPORT_PAGES)
+    page = get_template('reports/includes/soldier-report.html')
+
+    yield head
+    for start in range(0, len(soldier_ids), chunk_size):
+        chunk = soldier_ids[start:start + chunk_size]
+        for soldier in soldier_report_queryset(Soldier.objects.filter(pk__in=chunk)):
+            yield page.render({'soldier': soldier, 'ledger': soldier.ledger,
+                               'user': user})
+        if progress is not None:
+            progress(start + len(chunk))
+    yield tail
+
+
+def update_job(job_id, **values):
+    # `updated` tells a running job from one whose worker died, see `fail_stale`
+    ReportJob.objects.filter(pk=job_id).update(updated=timezone.now(), **values)
+
+
+def run_report_job(job_id, soldier_ids):
+    '''Render the reports of a job to its file: queued, running, then done or failed'''
+    job = ReportJob.objects.select_related('user').get(pk=job_id)
+    update_job(job_id, status='R')
+    try:
+        with tempfile.TemporaryFile() as output:
+            for part in iter_soldier_reports(
+                    soldier_ids, job.user,
+                    progress=lambda done: update_job(job_id, done=done)):
+                output.write(part.encode())
+            output.seek(0)
+            job.file.save(f'soldiers-{job_id}.html', File(output), save=False)
+        update_job(job_id, status='D', file=job.file.name)
+    except Exception:
+        update_job(job_id, status='F')
+        raise
+
+
+def report_worker(job_id, soldier_ids):
+    try:
+        run_report_job(job_id, soldier_ids)
+    finally:
+        connection.close()
+
+
+def start_report_job(user, soldier_ids):
+    '''Render the reports of `soldier_ids` in a worker thread and return its job'''
+    ReportJob.objects.filter(user=user).fail_stale()
+    job = ReportJob.objects.create(
+        user=user, total=len(soldier_ids),
+        title=f'گزارش {len(soldier_ids)} وظیفه')
+    transaction.on_commit(lambda: threading.Thread(
+        target=report_worker, args=(job.pk, soldier_ids), daemon=True).start())
+    return job
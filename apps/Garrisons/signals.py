@@ -0,0 +1,61 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Soldier, SoldierLedger
+
+
+@receiver(post_save, sender=Soldier)
+def _update_discharge_date(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        ledger = SoldierLedger(soldier=instance)
+    else:
+        ledger = SoldierLedger.objects.filter(soldier=instance).first()
+        if ledger is None:
+            SoldierLedger.objects.rebuild(Soldier.objects.filter(pk=instance.pk))
+            return
+        ledger.soldier = instance
+    discharge_date = ledger.get_discharge_date()
+    if created or discharge_date != ledger.discharge_date:
+        ledger.discharge_date = discharge_date
+        ledger.save()
+
+
+def _remember_ledger_entry(sender, instance, raw, **kwargs):
+    instance._ledger_previous = None
+    if instance.pk and not raw:
+        instance._ledger_previous = sender._base_manager.filter(pk=instance.pk).first()
+
+
+def _post_ledger_entry(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    prefix = SoldierLedger.SOURCES[sender._meta.label]
+    previous = instance._ledger_previous
+    days = SoldierLedger.entry_days(instance)
+    if previous is not None and previous.soldier_id == instance.soldier_id:
+        if instance.soldier_id:
+            SoldierLedger.objects.post(instance.soldier_id, prefix, 0,
+                                       days - SoldierLedger.entry_days(previous))
+        return
+    if previous is not None and previous.soldier_id:
+        SoldierLedger.objects.post(previous.soldier_id, prefix, -1,
+                                   -SoldierLedger.entry_days(previous))
+    if instance.soldier_id:
+        SoldierLedger.objects.post(instance.soldier_id, prefix, 1, days)
+
+
+def _unpost_ledger_entry(sender, instance, **kwargs):
+    if instance.soldier_id:
+        prefix = SoldierLedger.SOURCES[sender._meta.label]
+        SoldierLedger.objects.post(instance.soldier_id, prefix, -1,
+                                   -SoldierLedger.entry_days(instance))
+
+
+for label in SoldierLedger.SOURCES:
+    model = apps.get_model(label)
+    pre_save.connect(_remember_ledger_entry, sender=model)
+    post_save.connect(_post_ledger_entry, sender=model)
+    post_delete.connect(_unpost_ledger_entry, sender=model)
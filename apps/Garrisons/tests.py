@@ -1,3 +1,397 @@
-from django.test import TestCase
+import csv
+import datetime
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.BasicInformations.jalali import add_jalali_months
+from apps.BasicInformations.models import Chevron, City, Skill
+from apps.BasicInformations.refdata import clear_tables
+from apps.BasicInformations.testing import ChangelistQueriesMixin, RowFactory
+
+from . import models
+from .admin import SoldierAdmin
+from .imports import SoldierImport, national_code_is_valid
+from .reports import REPORT_PAGES, iter_soldier_reports, run_report_job, start_report_job
+
+
+class NationalCodeTests(SimpleTestCase):
+
+    def test_valid(self):
+        for code in ('0012345679', '1234567891', '9876543210'):
+            self.assertTrue(national_code_is_valid(code), code)
+
+    def test_invalid(self):
+        for code in ('0012345678', '1111111111', '012345679', '00123456790', '001234567x'):
+            self.assertFalse(national_code_is_valid(code), code)
+
+
+class SoldierLedgerTests(TestCase):
+
+    def setUp(self):
+        self.factory = RowFactory()
+        dispatch_date = datetime.date(2021, 3, 21)
+        self.soldier = self.factory.create(models.Soldier, dispatch_date=dispatch_date)
+        self.service_end = add_jalali_months(dispatch_date, settings.SOLDIER_SERVICE_MONTHS)
+
+    def ledger(self):
+        return models.SoldierLedger.objects.get(soldier=self.soldier)
+
+    def test_posted_with_the_entries(self):
+        surplus = self.factory.create(models.Surplus, soldier=self.soldier, day_count=10)
+        self.factory.create(models.Diminution, soldier=self.soldier, day_count=3)
+        ledger = self.ledger()
+        self.assertEqual((ledger.surplus_count, ledger.surplus_days), (1, 10))
+        self.assertEqual((ledger.diminution_count, ledger.diminution_days), (1, 3))
+        self.assertEqual(ledger.discharge_date, self.service_end + datetime.timedelta(days=7))
+
+        surplus.day_count = 4
+        surplus.save()
+        self.assertEqual(self.ledger().surplus_days, 4)
+
+        surplus.delete()
+        ledger = self.ledger()
+        self.assertEqual((ledger.surplus_count, ledger.surplus_days), (0, 0))
+        self.assertEqual(ledger.discharge_date, self.service_end - datetime.timedelta(days=3))
+
+    def test_moved_to_another_soldier(self):
+        other = self.factory.create(models.Soldier)
+        absence = self.factory.create(
+            models.Absence, soldier=self.soldier, start_date=datetime.date(2021, 5, 1),
+            end_date=datetime.date(2021, 5, 6))
+        self.assertEqual(self.ledger().absence_days, 5)
+        absence.soldier = other
+        absence.save()
+        self.assertEqual(self.ledger().absence_count, 0)
+        self.assertEqual(models.SoldierLedger.objects.get(soldier=other).absence_days, 5)
+
+    def test_rebuild(self):
+        self.factory.create(models.Surplus, soldier=self.soldier, day_count=10)
+        self.factory.create(models.Prison, soldier=self.soldier)
+        posted = self.ledger()
+        models.SoldierLedger.objects.all().delete()
+        models.SoldierLedger.objects.rebuild()
+        rebuilt = self.ledger()
+        for prefix in models.SoldierLedger.SOURCES.values():
+            for name in (f'{prefix}_count', f'{prefix}_days'):
+                self.assertEqual(getattr(rebuilt, name), getattr(posted, name), name)
+        self.assertEqual(rebuilt.discharge_date, posted.discharge_date)
+
+
+class SoldierImportTests(TestCase):
+
+    def setUp(self):
+        factory = RowFactory()
+        factory.create(models.Soldier, national_code='9876543210')
+        self.location = factory.create(models.Location, name='North gate')
+        Chevron.objects.create(title='Private', code=31)
+        Skill.objects.create(title='Guard', code=32)
+        City.objects.create(name='Tabriz')
+        clear_tables()
+
+    def run_import(self, *rows, **kwargs):
+        header = ['national_code', 'first_name', 'last_name', 'father_name', 'city',
+                  'dispatch_date', 'station', 'chevron', 'skill', 'location', 'is_married']
+        return SoldierImport(**kwargs).run([header, *rows])
+
+    def row(self, national_code, **values):
+        values = {'national_code': national_code, 'first_name': 'Ali', 'last_name': 'Rezaei',
+                  'father_name': 'Hasan', 'city': 'tabriz', 'dispatch_date': '۱۴۰۰/۰۱/۰۱',
+                  'station': '1', 'chevron': 'Private', 'skill': '32',
+                  'location': 'North gate', 'is_married': 'خیر', **values}
+        return list(values.values())
+
+    def test_valid_rows(self):
+        result = self.run_import(self.row('0012345679'), self.row('1234567891'))
+        self.assertEqual((result.rows, result.created, result.errors), (2, 2, []))
+        soldier = models.Soldier.objects.get(national_code='0012345679')
+        self.assertEqual(soldier.dispatch_date, datetime.date(2021, 3, 21))
+        self.assertEqual(soldier.location, self.location)
+        self.assertIsNotNone(soldier.ledger.discharge_date)
+
+    def test_invalid_rows(self):
+        result = self.run_import(
+            self.row('0012345679'),
+            self.row('0012345678'),  # check digit
+            self.row('12345679'),  # a spreadsheet dropped its leading zeros
+            self.row('9876543210'),  # registered already
+            self.row('1234567891', chevron='General', is_married='maybe'),
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual([(error.row, error.national_code) for error in result.errors],
+                         [(3, '0012345678'), (4, '12345679'), (6, '1234567891'),
+                          (6, '1234567891'), (5, '9876543210')])
+
+    def test_dry_run(self):
+        result = self.run_import(self.row('0012345679'), dry_run=True)
+        self.assertEqual(result.created, 1)
+        self.assertFalse(models.Soldier.objects.filter(national_code='0012345679').exists())
+
+
+class GarrisonScopeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        factory = RowFactory()
+        cls.garrison, cls.other_garrison = factory.create_rows(models.Garrison, 2)
+        cls.gate, cls.tower = factory.create_rows(models.Location, 2, garrison=cls.garrison)
+        cls.other_gate = factory.create(models.Location, garrison=cls.other_garrison)
+        # in two locations of the garrison, listed once
+        cls.personal = factory.create(models.Personal, locations=[cls.gate, cls.tower])
+        cls.both = factory.create(models.Personal, locations=[cls.tower, cls.other_gate])
+        cls.other = factory.create(models.Personal, locations=[cls.other_gate])
+        cls.superuser = User.objects.create_superuser('admin', has_valid_password=True)
+        cls.user = User.objects.create_user('user', garrison=cls.garrison, is_staff=True,
+                                            has_valid_password=True)
+        cls.homeless = User.objects.create_user('homeless', is_staff=True)
+
+    def test_superuser(self):
+        self.assertCountEqual(models.Personal.objects.for_user(self.superuser),
+                              [self.personal, self.both, self.other])
+
+    def test_user_without_a_garrison(self):
+        queryset = models.Personal.objects.for_user(self.homeless)
+        self.assertTrue(queryset.query.is_empty())
+        with self.assertNumQueries(0):
+            self.assertEqual(list(queryset), [])
+
+    def test_single_valued_path(self):
+        self.assertCountEqual(models.Location.objects.for_user(self.user),
+                              [self.gate, self.tower])
+        self.assertCountEqual(models.Location.objects.for_garrison(self.other_garrison),
+                              [self.other_gate])
+
+    def test_multivalued_path(self):
+        queryset = models.Personal.objects.for_user(self.user)
+        sql = str(queryset.query)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertEqual(sorted(queryset.values_list('pk', flat=True)),
+                         sorted([self.personal.pk, self.both.pk]))
+        self.assertEqual(queryset.count(), 2)
+        self.assertCountEqual(models.Personal.objects.for_garrison(self.other_garrison),
+                              [self.both, self.other])
+
+    def test_garrison_admin(self):
+        # the rows the former `admin_user=request.user` filter showed
+        self.user.user_permissions.add(Permission.objects.get(codename='view_garrison'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:Garrisons_garrison_changelist'))
+        self.assertEqual(list(response.context['cl'].result_list),
+                         list(models.Garrison.objects.filter(admin_user=self.user)))
+        self.assertEqual(list(response.context['cl'].result_list), [self.garrison])
+        response = self.client.get(reverse('admin:Garrisons_garrison_change',
+                                           args=[self.other_garrison.pk]))
+        self.assertEqual(response.status_code, 302)
+
+
+class SoldierExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        factory = RowFactory()
+        cls.garrison, other_garrison = factory.create_rows(models.Garrison, 2)
+        location = factory.create(models.Location, garrison=cls.garrison)
+        other_location = factory.create(models.Location, garrison=other_garrison)
+        cls.soldiers = [factory.create(models.Soldier, location=location,
+                                       dispatch_date=datetime.date(2021, 3, 21))
+                        for _ in range(5)]
+        cls.other = factory.create(models.Soldier, location=other_location)
+        cls.user = User.objects.create_user('user', garrison=cls.garrison, is_staff=True,
+                                            has_valid_password=True)
+        cls.user.user_permissions.add(Permission.objects.get(codename='view_soldier'))
+        cls.url = reverse('admin:Garrisons_soldier_export', args=['csv'])
+
+    def setUp(self):
+        clear_tables()
+        self.client.force_login(self.user)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'],
+                         r'^attachment; filename="soldier-\d{8}-\d{4}\.csv"$')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        return list(csv.reader(content[1:].splitlines()))
+
+    def test_header(self):
+        header, *rows = self.read(self.client.get(self.url))
+        titles = [str(models.Soldier._meta.get_field(name).verbose_name) for name in (
+            'national_code', 'first_name', 'last_name', 'father_name', 'chevron')]
+        self.assertEqual(header[:5], titles)
+        self.assertEqual(header[-2], 'تاریخ پایان خدمت')
+        self.assertEqual(len(header), len(SoldierAdmin.export_fields))
+        soldier = self.soldiers[0]
+        row = rows[[row[0] for row in rows].index(soldier.national_code)]
+        self.assertEqual(row[4], str(soldier.chevron))
+        dispatch_date = models.Soldier._meta.get_field('dispatch_date').verbose_name
+        self.assertEqual(row[header.index(dispatch_date)], '00/01/01')
+
+    def test_garrison_scoped_rows(self):
+        header, *rows = self.read(self.client.get(self.url))
+        self.assertCountEqual([row[0] for row in rows],
+                              [soldier.national_code for soldier in self.soldiers])
+
+        # the filters of the changelist are kept
+        query = f'?q={self.soldiers[0].national_code}'
+        header, *rows = self.read(self.client.get(self.url + query))
+        self.assertEqual([row[0] for row in rows], [self.soldiers[0].national_code])
+
+    def test_selected_rows(self):
+        response = self.client.post(reverse('admin:Garrisons_soldier_changelist'), {
+            'action': 'export_csv',
+            '_selected_action': [self.soldiers[0].pk, self.other.pk]})
+        header, *rows = self.read(response)
+        self.assertEqual([row[0] for row in rows], [self.soldiers[0].national_code])
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_streamed_by_chunks(self):
+        response = self.client.get(self.url)
+        # the header, then the five rows by two
+        self.assertEqual(len(list(response.streaming_content)), 4)
+
+    def test_unknown_format_and_permission(self):
+        url = reverse('admin:Garrisons_soldier_export', args=['pdf'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.user.user_permissions.clear()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class SoldierReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', has_valid_password=True)
+        cls.soldiers = RowFactory().create_rows(models.Soldier, 5)
+        cls.soldier_ids = [soldier.pk for soldier in cls.soldiers]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage = FileSystemStorage(location=directory.name)
+        patcher = mock.patch.object(models.ReportJob._meta.get_field('file'), 'storage', storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pages(self):
+        progress = []
+        parts = list(iter_soldier_reports(self.soldier_ids, self.user, chunk_size=2,
+                                          progress=progress.append))
+        self.assertEqual(len(parts), 2 + len(self.soldiers))
+        self.assertNotIn(REPORT_PAGES, ''.join(parts))
+        for soldier, page in zip(self.soldiers, parts[1:-1]):
+            self.assertIn(soldier.last_name, page)
+        self.assertEqual(progress, [2, 4, 5])
+
+    def test_queries_do_not_grow_with_the_soldiers(self):
+        list(iter_soldier_reports(self.soldier_ids[:1], self.user))
+        with CaptureQueriesContext(connection) as queries:
+            list(iter_soldier_reports(self.soldier_ids[:1], self.user))
+        with self.assertNumQueries(len(queries)):
+            list(iter_soldier_reports(self.soldier_ids, self.user))
+
+    def job(self, **values):
+        return models.ReportJob.objects.create(user=self.user, title='report',
+                                               total=len(self.soldier_ids), **values)
+
+    def test_done(self):
+        job = self.job()
+        self.assertEqual(job.status, 'P')
+        statuses = []
+
+        def rendering(*args, **kwargs):
+            statuses.append(models.ReportJob.objects.get(pk=job.pk).status)
+            return iter_soldier_reports(*args, **kwargs)
+
+        with mock.patch('apps.Garrisons.reports.iter_soldier_reports', side_effect=rendering):
+            run_report_job(job.pk, self.soldier_ids)
+        job.refresh_from_db()
+        self.assertEqual(statuses, ['R'])
+        self.assertEqual((job.status, job.done, job.progress), ('D', 5, 100))
+        self.assertTrue(job.is_finished)
+        with job.file.open('rb') as file:
+            self.assertIn(self.soldiers[-1].last_name, file.read().decode())
+
+    def test_failed(self):
+        job = self.job()
+        with mock.patch('apps.Garrisons.reports.iter_soldier_reports',
+                        side_effect=RuntimeError('template')):
+            with self.assertRaises(RuntimeError):
+                run_report_job(job.pk, self.soldier_ids)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'F')
+        self.assertFalse(job.file)
+
+    def test_stale_jobs_fail(self):
+        moment = timezone.now() - datetime.timedelta(
+            seconds=settings.SOLDIER_REPORT_JOB_TIMEOUT + 1)
+        stale_running, stale_queued, running, done = [self.job() for _ in range(4)]
+        models.ReportJob.objects.filter(pk__in=[stale_running.pk, stale_queued.pk, done.pk]
+                                        ).update(updated=moment)
+        models.ReportJob.objects.filter(pk__in=[stale_running.pk, running.pk]).update(status='R')
+        models.ReportJob.objects.filter(pk=done.pk).update(status='D')
+
+        self.assertEqual(models.ReportJob.objects.fail_stale(), 2)
+        self.assertEqual(
+            dict(models.ReportJob.objects.values_list('pk', 'status')),
+            {stale_running.pk: 'F', stale_queued.pk: 'F', running.pk: 'R', done.pk: 'D'})
+
+    def test_status_page_fails_a_stale_job(self):
+        job = self.job(status='R')
+        models.ReportJob.objects.filter(pk=job.pk).update(
+            updated=timezone.now() - datetime.timedelta(days=1))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('people:report_job', args=[job.pk]))
+        self.assertEqual(response.context['job'].status, 'F')
+
+    def test_start(self):
+        with mock.patch('apps.Garrisons.reports.threading.Thread') as thread:
+            job = start_report_job(self.user, self.soldier_ids)
+        self.assertEqual((job.status, job.total), ('P', 5))
+        # started once the transaction commits, never in a TestCase
+        thread.assert_not_called()
+
+
+class AutocompleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', password='password',
+                                                 has_valid_password=True)
+        city = City.objects.create(name='Tabriz')
+        cls.garrison = models.Garrison.objects.create(
+            name='Shahid Fakouri', city=city, mp=1, mf=1, md=1, mbv=1)
+        cls.location = models.Location.objects.create(
+            name='North gate', garrison=cls.garrison, liable='liable')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def choices(self, model_name, term):
+        response = self.client.get(reverse(f'admin:Garrisons_{model_name}_autocomplete'),
+                                   {'term': term})
+        return [result['id'] for result in response.json()['results']]
+
+    def test_indexed_fields(self):
+        self.assertEqual(self.choices('location', 'nort'), [str(self.location.pk)])
+
+    def test_related_search_fields(self):
+        self.assertEqual(self.choices('location', 'fakouri gate'), [str(self.location.pk)])
+        self.assertEqual(self.choices('garrison', 'tabr'), [str(self.garrison.pk)])
+        self.assertEqual(self.choices('garrison', 'shiraz'), [])
+
+
+class ChangelistQueriesTests(ChangelistQueriesMixin, TestCase):
+    app_labels = ('Garrisons',)
@@ -14,5 +14,7 @@ urlpatterns = [
     path('generate-pdf/personal-card/<int:card_id>',
          views.personal_card, name='personal_card'),
     path('generate-pdf/soldier-card/<int:card_id>',
-         views.soldier_card, name='soldier_card')
+         views.soldier_card, name='soldier_card'),
+    path('reports/<int:job_id>', views.report_job, name='report_job'),
+    path('reports/<int:job_id>/file', views.report_job_file, name='report_job_file'),
 ]
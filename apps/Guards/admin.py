@@ -1,17 +1,27 @@
 import datetime
 from itertools import chain
 
-from django.contrib import admin
-from django.contrib.admin import DateFieldListFilter
+from django.contrib import admin, messages
+from django.contrib.admin import DateFieldListFilter, helpers
 from django.db import models as db_model
 from django.forms import Select, Textarea
+from django.db.models import Exists, Max, Min, OuterRef
+from django.forms.models import BaseInlineFormSet
+from django.template.response import TemplateResponse
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from jalali_date import date2jalali, datetime2jalali
 from jalali_date.admin import (ModelAdminJalaliMixin, StackedInlineJalaliMixin,
                                TabularInlineJalaliMixin)
 
+from apps.BasicInformations.jalali import DATE_FORMAT, local_midnight
+from apps.BasicInformations.mixins import (GarrisonScopedAdminMixin,
+                                          JalaliColumnsAdminMixin, JalaliDateSearchMixin,
+                                          QueryPlanAdminMixin, jalali_column)
+
 from . import models
+from .roster import build_rosters, save_roster
+from .shifts import (Shift, describe_range, find_conflicts, guard_shifts,
+                     overlapping_shifts, shift_range)
 
 HOURS = [(datetime.time(hour=x), '{:02d}:00'.format(x)) for x in range(0, 24)]
 HOURS_WITH_HALF = [(datetime.time(hour=x, minute=30),
@@ -19,10 +29,51 @@ HOURS_WITH_HALF = [(datetime.time(hour=x, minute=30),
 HOUR_CHOICES = list(chain(*zip(HOURS, HOURS_WITH_HALF)))
 
 
+class ShiftOverlapInlineFormSet(BaseInlineFormSet):
+    '''Reject shifts of one person that overlap on this tablet or the ones around it'''
+
+    def clean(self, *args, **kwargs):
+        super().clean()
+        apply_date = self.instance.apply_date
+        if apply_date is None:
+            return
+        person_field = self.model.PERSON_FIELD
+        shifts = []
+        for form in self.forms:
+            if not form.is_valid() or self._should_delete_form(form):
+                continue
+            data = form.cleaned_data
+            if not data.get(person_field) or not data.get('shift_start') \
+                    or not data.get('shift_end'):
+                continue
+            shifts.append(Shift(data[person_field].pk, *shift_range(
+                apply_date, data['shift_start'], data['shift_end'],
+                data.get('shift_ends_next_day', False)), form))
+        if not shifts:
+            return
+
+        others = self.model.objects.filter(
+            **{f'{person_field}__in': {shift.person_id for shift in shifts}},
+            starts_at__lt=max(shift.ends_at for shift in shifts),
+            ends_at__gt=min(shift.starts_at for shift in shifts))
+        if self.instance.pk:
+            others = others.exclude(guard_tablet=self.instance)
+        shifts += guard_shifts(others.select_related('guard_tablet'), person_field)
+
+        forms = set(self.forms)
+        for first, second in overlapping_shifts(shifts):
+            for shift, other in ((first, second), (second, first)):
+                if shift.guard in forms:
+                    shift.guard.add_error(
+                        None, 'این شیفت با شیفت {0} همین فرد تداخل دارد.'.format(
+                            describe_range(other.starts_at, other.ends_at)))
+
+
 class PersonalGuardInline(TabularInlineJalaliMixin, admin.TabularInline):
     '''Tabular Inline View for PersonalGuard'''
 
     model = models.PersonalGuard
+    formset = ShiftOverlapInlineFormSet
     extra = 1
     formfield_overrides = {
         db_model.TextField: {'widget': Textarea(
@@ -40,6 +91,7 @@ class SoldierGuardInline(TabularInlineJalaliMixin, admin.TabularInline):
     '''Tabular Inline View for SoldierGuard'''
 
     model = models.SoldierGuard
+    formset = ShiftOverlapInlineFormSet
     extra = 1
     formfield_overrides = {
         db_model.TextField: {'widget': Textarea(
@@ -54,7 +106,8 @@ class SoldierGuardInline(TabularInlineJalaliMixin, admin.TabularInline):
 
 
 @admin.register(models.Position)
-class PositionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class PositionAdmin(GarrisonScopedAdminMixin, JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                    ModelAdminJalaliMixin, admin.ModelAdmin):
     '''Admin View for Position'''
 
     list_display = ('title', 'get_created_jalali', 'get_updated_jalali')
@@ -63,44 +116,14 @@ class PositionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     ordering = ['created']
     autocomplete_fields = ['location', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            location__garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request,
-                                                            queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except Exception:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @admin.register(models.PersonalMilitaryPolice)
-class PersonalMilitaryPoliceAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class PersonalMilitaryPoliceAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin,
+                                  JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                                  ModelAdminJalaliMixin, admin.ModelAdmin):
     '''Admin View for PersonalMilitaryPolice'''
 
     list_display = ('personal', 'get_created_jalali', 'get_updated_jalali',)
@@ -108,44 +131,14 @@ class PersonalMilitaryPoliceAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     search_fields = ('personal__first_name', 'personal__last_name')
     autocomplete_fields = ['personal', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            personal__locations__garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request,
-                                                            queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except Exception:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @admin.register(models.SoldierMilitaryPolice)
-class SoldierMilitaryPoliceAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class SoldierMilitaryPoliceAdmin(GarrisonScopedAdminMixin, QueryPlanAdminMixin,
+                                 JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                                 ModelAdminJalaliMixin, admin.ModelAdmin):
     '''Admin View for SoldierMilitaryPolice'''
 
     list_display = ('soldier', 'get_created_jalali', 'get_updated_jalali',)
@@ -153,51 +146,22 @@ class SoldierMilitaryPoliceAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     search_fields = ('soldier__first_name', 'soldier__last_name')
     autocomplete_fields = ['soldier', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            soldier__location__garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request,
-                                                            queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except Exception:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @admin.register(models.GuardTablet)
-class GuardTabletAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class GuardTabletAdmin(GarrisonScopedAdminMixin, JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                       ModelAdminJalaliMixin, admin.ModelAdmin):
     '''Admin View for GuardTablet'''
 
     list_display = ('get_apply_date_jalali', 'get_created_jalali',
                     'get_updated_jalali', 'order_pdf')
     list_filter = ('apply_date', 'created', 'updated')
     search_fields = ('created', 'updated')
+    jalali_search_fields = ('apply_date', 'created', 'updated')
     inlines = (PersonalGuardInline, SoldierGuardInline, )
+    actions = ['find_shift_conflicts', 'generate_roster']
 
     exclude = ('garrison', )
 
@@ -206,54 +170,69 @@ class GuardTabletAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
         return mark_safe(f'<a href="{url}" target="_blank">ایجاد گزارش</a>')
     order_pdf.short_description = 'عملیات'
 
+    def find_shift_conflicts(self, request, queryset):
+        dates = queryset.aggregate(first=Min('apply_date'), last=Max('apply_date'))
+        # the last tablet's shifts may run into the next day
+        starts_at = local_midnight(dates['first'])
+        ends_at = local_midnight(dates['last'] + datetime.timedelta(days=2))
+        found = 0
+        for model in (models.PersonalGuard, models.SoldierGuard):
+            for first, second in find_conflicts(
+                    model, starts_at, ends_at, model.objects.for_user(request.user)):
+                found += 1
+                self.message_user(request, '{0}: {1} در {2} با {3} در {4}'.format(
+                    getattr(first.guard, model.PERSON_FIELD),
+                    describe_range(first.starts_at, first.ends_at),
+                    first.guard.position or 'بدون پست',
+                    describe_range(second.starts_at, second.ends_at),
+                    second.guard.position or 'بدون پست',
+                ), messages.WARNING)
+        if not found:
+            self.message_user(request, 'تداخلی در شیفت‌های لوحه‌های انتخاب شده نیست.')
+    find_shift_conflicts.short_description = 'بررسی تداخل شیفت‌ها'
+
+    def generate_roster(self, request, queryset):
+        '''Fill the selected empty tablets, after previewing the generated shifts'''
+        filled = queryset.filter(
+            Exists(models.PersonalGuard.objects.filter(guard_tablet=OuterRef('pk')))
+            | Exists(models.SoldierGuard.objects.filter(guard_tablet=OuterRef('pk'))))
+        for tablet in filled:
+            self.message_user(request, f'{tablet} از قبل شیفت دارد و تغییر نکرد.',
+                              messages.WARNING)
+        tablets = queryset.exclude(pk__in=filled).filter(garrison__isnull=False)
+        rosters = build_rosters(tablets.select_related('garrison'))
+        if not rosters:
+            return None
+
+        if request.POST.get('post'):
+            for tablet, roster in rosters:
+                save_roster(tablet, roster)
+                self.message_user(request, f'{len(roster.rows)} شیفت برای {tablet} ثبت شد.')
+            return None
+
+        return TemplateResponse(request, 'admin/Guards/guardtablet/roster_preview.html', {
+            **self.admin_site.each_context(request),
+            'title': 'پیش نمایش لوحه نگهبانی',
+            'opts': self.model._meta,
+            'rosters': rosters,
+            'queryset': queryset,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+    generate_roster.short_description = 'چیدن خودکار لوحه های انتخاب شده'
+
     def save_model(self, request, obj, form, change):
         if not request.user.is_superuser:
             obj.garrison = request.user.garrison
         return super().save_model(request, obj, form, change)
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_apply_date_jalali(self, obj):
-        return date2jalali(obj.apply_date).strftime('%y/%m/%d')
-    get_apply_date_jalali.admin_order_field = 'apply_date'
-    get_apply_date_jalali.short_description = 'تاریخ'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request,
-                                                            queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except Exception:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_apply_date_jalali = jalali_column('apply_date', 'تاریخ', DATE_FORMAT)
 
 
 # @admin.register(models.PersonalGuard)
-class PersonalGuardAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class PersonalGuardAdmin(GarrisonScopedAdminMixin, JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                         ModelAdminJalaliMixin, admin.ModelAdmin):
     '''Admin View for PersonalGuard'''
 
     list_display = ('get_created_jalali', 'get_updated_jalali',)
@@ -261,40 +240,8 @@ class PersonalGuardAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     search_fields = ('personal__first_name', 'personal__last_name')
     autocomplete_fields = ['personal', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            equipments__location__garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request,
-                                                            queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except Exception:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
     def save_model(self, request, obj, form, change):
         if obj.shift_start >= obj.shift_end:
@@ -303,7 +250,8 @@ class PersonalGuardAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
 
 
 # @admin.register(models.SoldierGuard)
-class SoldierGuardAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class SoldierGuardAdmin(GarrisonScopedAdminMixin, JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                        ModelAdminJalaliMixin, admin.ModelAdmin):
     '''Admin View for SolierGuard'''
 
     list_display = ('get_created_jalali', 'get_updated_jalali',)
@@ -311,40 +259,8 @@ class SoldierGuardAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     search_fields = ('soldier__first_name', 'soldier__last_name')
     autocomplete_fields = ['soldier', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            equipments__location__garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request,
-                                                            queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except Exception:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
     def save_model(self, request, obj, form, change):
         if obj.shift_start >= obj.shift_end:
@@ -0,0 +1,67 @@
+# Generated by Django 3.1.14 on 2026-10-18 18:09
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def shift_range(apply_date, shift_start, shift_end, shift_ends_next_day):
+    # frozen copy of apps.Guards.shifts.shift_range as of this migration
+    starts_at = datetime.datetime.combine(apply_date, shift_start)
+    ends_at = datetime.datetime.combine(apply_date, shift_end)
+    if shift_ends_next_day or ends_at <= starts_at:
+        ends_at += datetime.timedelta(days=1)
+    return (timezone.make_aware(starts_at, is_dst=False),
+            timezone.make_aware(ends_at, is_dst=False))
+
+
+def fill_shift_ranges(apps, schema_editor):
+    for model_name in ('PersonalGuard', 'SoldierGuard'):
+        model = apps.get_model('Guards', model_name)
+        guards = list(model.objects.filter(guard_tablet__isnull=False)
+                      .select_related('guard_tablet'))
+        for guard in guards:
+            guard.starts_at, guard.ends_at = shift_range(
+                guard.guard_tablet.apply_date, guard.shift_start, guard.shift_end,
+                guard.shift_ends_next_day)
+        model.objects.bulk_update(guards, ['starts_at', 'ends_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Guards', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='personalguard',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='personalguard',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='soldierguard',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='soldierguard',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='personalguard',
+            index=models.Index(fields=['personal', 'starts_at', 'ends_at'], name='Guards_pers_persona_c6cd38_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='soldierguard',
+            index=models.Index(fields=['soldier', 'starts_at', 'ends_at'], name='Guards_sold_soldier_a25584_idx'),
+        ),
+        migrations.RunPython(fill_shift_ranges, migrations.RunPython.noop),
+    ]
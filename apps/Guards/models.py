@@ -4,8 +4,11 @@ from itertools import chain
 from django.core.exceptions import ValidationError
 from django.db import models
 
+from apps.Garrisons.managers import GarrisonScopedQuerySet
 from apps.Garrisons.models import Garrison, Location, Personal, Soldier
 
+from .shifts import shift_range
+
 HOURS = [(datetime.time(hour=x, minute=0), '{:02d}:00'.format(x)) for x in range(0, 24)]
 HOURS_WITH_HALF = [(datetime.time(hour=x, minute=30),
                     '{:02d}:30'.format(x)) for x in range(0, 24)]
@@ -37,6 +40,10 @@ class Position(models.Model):
     updated = models.DateTimeField(verbose_name='تاریخ و زمان بروز رسانی',
                                    auto_now=True)
 
+    garrison_path = 'location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('title', 'location')
+
     class Meta:
         verbose_name = 'پست نگهبانی'
         verbose_name_plural = 'پست های نگهبانی'
@@ -55,6 +62,10 @@ class PersonalMilitaryPolice(models.Model):
     updated = models.DateTimeField(verbose_name='تاریخ و زمان بروز رسانی',
                                    auto_now=True, null=True)
 
+    garrison_path = 'personal__locations__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('personal',)
+
     class Meta:
         verbose_name = 'پایور پلیس هوایی'
         verbose_name_plural = 'پایوران پلیس هوایی'
@@ -70,6 +81,10 @@ class SoldierMilitaryPolice(models.Model):
     created = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')
     updated = models.DateTimeField(auto_now=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'soldier__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('soldier',)
+
     class Meta:
         verbose_name = 'وظیفه پلیس هوایی'
         verbose_name_plural = 'وظیفه های پلیس هوایی'
@@ -91,6 +106,10 @@ class GuardTablet(models.Model):
     created = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')
     updated = models.DateTimeField(auto_now=True, verbose_name='تاریخ و زمان بروز رسانی')
 
+    garrison_path = 'garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('apply_date',)
+
     class Meta:
         verbose_name = 'لوحه نگهبانی'
         verbose_name_plural = 'لوحه های نگهبانی'
@@ -98,6 +117,22 @@ class GuardTablet(models.Model):
     def __str__(self):
         return 'لوحه نگهبانی {0}'.format(self.apply_date)
 
+    def save(self, *args, **kwargs):
+        previous = GuardTablet.objects.filter(pk=self.pk).values_list(
+            'apply_date', flat=True).first() if self.pk else None
+        super().save(*args, **kwargs)
+        if previous is not None and previous != self.apply_date:
+            self.update_shift_ranges()
+
+    def update_shift_ranges(self):
+        '''Move the shift ranges of the guards along with `apply_date`'''
+        for related in (self.personals_on_guard, self.soldiers_on_guard):
+            guards = list(related.all())
+            for guard in guards:
+                guard.guard_tablet = self
+                guard.set_shift_range()
+            related.model.objects.bulk_update(guards, ['starts_at', 'ends_at'])
+
 
 class PersonalGuard(models.Model):
     guard_tablet = models.ForeignKey(GuardTablet,
@@ -120,18 +155,38 @@ class PersonalGuard(models.Model):
     shift_ends_next_day = models.BooleanField(verbose_name="روز بعد",
                                               default=False, choices=[
                                                   (True, 'بله'), (False, 'خیر')])
+    starts_at = models.DateTimeField(null=True, editable=False)
+    ends_at = models.DateTimeField(null=True, editable=False)
     description = models.TextField(null=True, blank=True, verbose_name='توضیحات تکمیلی')
     created = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')
     updated = models.DateTimeField(verbose_name='تاریخ و زمان بروز رسانی',
                                    auto_now=True, null=True)
 
+    garrison_path = 'guard_tablet__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    PERSON_FIELD = 'personal'
+    str_fields = ('personal', 'position')
+
     class Meta:
         verbose_name = 'پایور پلیس هوایی'
         verbose_name_plural = 'پایوران پلیس هوایی'
+        indexes = [models.Index(fields=['personal', 'starts_at', 'ends_at'])]
 
     def __str__(self):
         return 'پلیس هوایی {0}، پایور در {1}'.format(self.personal, self.position)
 
+    def save(self, *args, **kwargs):
+        self.set_shift_range()
+        super().save(*args, **kwargs)
+
+    def set_shift_range(self):
+        if self.guard_tablet_id is None:
+            self.starts_at = self.ends_at = None
+            return
+        self.starts_at, self.ends_at = shift_range(
+            self.guard_tablet.apply_date, self.shift_start, self.shift_end,
+            self.shift_ends_next_day)
+
 
 class SoldierGuard(models.Model):
     guard_tablet = models.ForeignKey(GuardTablet,
@@ -155,18 +210,38 @@ class SoldierGuard(models.Model):
     shift_ends_next_day = models.BooleanField(verbose_name="روز بعد", default=False,
                                               # choices=[(True, 'بله'), (False, 'خیر')]
                                               )
+    starts_at = models.DateTimeField(null=True, editable=False)
+    ends_at = models.DateTimeField(null=True, editable=False)
     description = models.TextField(null=True, blank=True, verbose_name='توضیحات تکمیلی')
     created = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')
     updated = models.DateTimeField(verbose_name='تاریخ و زمان بروز رسانی',
                                    auto_now=True, null=True)
 
+    garrison_path = 'guard_tablet__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    PERSON_FIELD = 'soldier'
+    str_fields = ('soldier', 'position')
+
     class Meta:
         verbose_name = 'وظیفه پلیس هوایی'
         verbose_name_plural = 'وظیفه های پلیس هوایی'
+        indexes = [models.Index(fields=['soldier', 'starts_at', 'ends_at'])]
 
     def __str__(self):
         return '{0}، پلیس هوایی در {1}'.format(self.soldier, self.position)
 
+    def save(self, *args, **kwargs):
+        self.set_shift_range()
+        super().save(*args, **kwargs)
+
+    def set_shift_range(self):
+        if self.guard_tablet_id is None:
+            self.starts_at = self.ends_at = None
+            return
+        self.starts_at, self.ends_at = shift_range(
+            self.guard_tablet.apply_date, self.shift_start, self.shift_end,
+            self.shift_ends_next_day)
+
     def clean(self):
         '''Ensure that dates are regular'''
         super().clean()
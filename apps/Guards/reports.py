@@ -0,0 +1,56 @@
+from collections import namedtuple
+
+GuardRow = namedtuple('GuardRow', [
+    'chevron', 'full_name', 'weapon', 'armed', 'location', 'position',
+    'shift_start', 'shift_end', 'shift_ends_next_day', 'notes'])
+
+# firearms are the weapons listed with their rounds, e.g. 'ژ 3 - 20 تیر'
+ARMED_MARK = 'تیر'
+
+
+def guard_row(guard, person, full_name, notes):
+    position = guard.position
+    weapon = position.weapon if position else ''
+    return GuardRow(
+        chevron=person.chevron if person else None,
+        full_name=full_name,
+        weapon=weapon,
+        armed=ARMED_MARK in weapon,
+        location=position.location if position else None,
+        position=position.title if position else '',
+        shift_start=guard.shift_start,
+        shift_end=guard.shift_end,
+        shift_ends_next_day=guard.shift_ends_next_day,
+        notes=[note for note in notes if note],
+    )
+
+
+def guard_tablet_rows(guard_tablet):
+    '''Flat rows of the personals and soldiers on a tablet, in two queries
+
+    Everything a row shows is joined in with `select_related`, so the number
+    of queries does not grow with the number of shifts.
+    '''
+    personal_rows = []
+    for guard in guard_tablet.personals_on_guard.select_related(
+            'personal__personal__chevron',
+            'position__location__garrison').order_by('pk'):
+        police = guard.personal
+        person = police.personal if police else None
+        personal_rows.append(guard_row(
+            guard, person, person.get_full_name() if person else '',
+            [guard.position and guard.position.description,
+             police and police.description, guard.description]))
+
+    soldier_rows = []
+    for guard in guard_tablet.soldiers_on_guard.select_related(
+            'soldier__soldier__chevron',
+            'position__location__garrison').order_by('pk'):
+        police = guard.soldier
+        person = police.soldier if police else None
+        soldier_rows.append(guard_row(
+            guard, person, person.get_ful_name() if person else '',
+            [guard.position and guard.position.description,
+             guard.description, police and police.description]))
+
+    return personal_rows, soldier_rows
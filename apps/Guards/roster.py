@@ -0,0 +1,196 @@
+import datetime
+from collections import namedtuple
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.BasicInformations.jalali import local_midnight
+from apps.Garrisons.models import Absence, GoRecess, Prison, Volatile
+
+from .models import (PersonalGuard, PersonalMilitaryPolice, Position, SoldierGuard,
+                     SoldierMilitaryPolice)
+from .shifts import shift_range
+
+# shifts starting in these hours count as night shifts, which are rotated
+NIGHT_HOURS = {22, 23, 0, 1, 2, 3, 4, 5}
+
+RosterRow = namedtuple('RosterRow', [
+    'police', 'position', 'shift_start', 'shift_end', 'shift_ends_next_day',
+    'starts_at', 'ends_at', 'short_rest'])
+Roster = namedtuple('Roster', ['rows', 'unfilled', 'candidates'])
+
+NIGHT_FAIRNESS = attrgetter('nights', 'minutes', 'police.pk')
+DAY_FAIRNESS = attrgetter('minutes', 'nights', 'police.pk')
+
+
+class Candidate:
+    '''A military police on the roster and the counts its fairness is judged by'''
+    __slots__ = ('police', 'free_at', 'last_end', 'minutes', 'nights', 'booked')
+
+    def __init__(self, police):
+        self.police = police
+        self.free_at = self.last_end = None
+        self.minutes = self.nights = 0
+        self.booked = []
+
+    def count_shift(self, starts_at, ends_at):
+        self.minutes += (ends_at - starts_at).total_seconds() // 60
+        if timezone.localtime(starts_at).hour in NIGHT_HOURS:
+            self.nights += 1
+
+    def add_shift(self, starts_at, ends_at, rest):
+        if self.last_end is None or ends_at > self.last_end:
+            self.last_end = ends_at
+            self.free_at = ends_at + rest
+        self.count_shift(starts_at, ends_at)
+
+    def book(self, starts_at, ends_at):
+        '''A shift set already on the day being filled or after it'''
+        self.booked.append((starts_at, ends_at))
+        self.count_shift(starts_at, ends_at)
+
+    def overlaps_booked(self, starts_at, ends_at, rest=datetime.timedelta()):
+        return any(starts_at < booked_end + rest and booked_start < ends_at + rest
+                   for booked_start, booked_end in self.booked)
+
+    def is_rested(self, starts_at, ends_at, rest):
+        return ((self.free_at is None or self.free_at <= starts_at)
+                and not self.overlaps_booked(starts_at, ends_at, rest))
+
+    def is_free(self, starts_at, ends_at):
+        return ((self.last_end is None or self.last_end <= starts_at)
+                and not self.overlaps_booked(starts_at, ends_at))
+
+
+def unavailable_soldier_ids(day):
+    '''Soldiers on recess, absent, volatile or in prison on `day`'''
+    soldier_ids = set()
+    for model in (GoRecess, Absence, Volatile):
+        soldier_ids.update(model.objects.filter(
+            soldier__isnull=False, start_date__lte=day, end_date__gt=day,
+        ).values_list('soldier_id', flat=True))
+    # a prison only records its length, counted from when it was registered
+    for soldier_id, created, day_count in Prison.objects.filter(
+            soldier__isnull=False, created__date__lte=day,
+    ).values_list('soldier_id', 'created', 'day_count'):
+        if timezone.localtime(created).date() + datetime.timedelta(days=day_count) > day:
+            soldier_ids.add(soldier_id)
+    return soldier_ids
+
+
+def available_police(garrison, day):
+    yield from PersonalMilitaryPolice.objects.for_garrison(garrison).filter(
+        personal__isnull=False).select_related('personal').order_by('pk')
+    yield from SoldierMilitaryPolice.objects.for_garrison(garrison).filter(
+        soldier__isnull=False).exclude(
+        soldier__in=unavailable_soldier_ids(day)).select_related('soldier').order_by('pk')
+
+
+def roster_candidates(garrison, day, rest, generated=()):
+    '''The police who may guard on `day`, with the shifts around it
+
+    The recent shifts decide who already had the nights and who still rests.
+    The shifts set on the day and the next one, saved or in `generated`,
+    the rows of the rosters built before this one, are kept clear of.
+    '''
+    candidates = [Candidate(police) for police in available_police(garrison, day)]
+    by_police = {(type(c.police), c.police.pk): c for c in candidates}
+    since = local_midnight(day - datetime.timedelta(days=settings.GUARD_ROSTER_HISTORY_DAYS))
+    until = local_midnight(day)
+    horizon = local_midnight(day + datetime.timedelta(days=2))
+
+    def add(candidate, starts_at, ends_at):
+        if starts_at < until:
+            candidate.add_shift(starts_at, ends_at, rest)
+        else:
+            candidate.book(starts_at, ends_at)
+
+    for model, police_model in ((PersonalGuard, PersonalMilitaryPolice),
+                                (SoldierGuard, SoldierMilitaryPolice)):
+        person_field = model.PERSON_FIELD
+        for police_id, starts_at, ends_at in model.objects.filter(
+                **{f'{person_field}__in': [c.police.pk for c in candidates
+                                           if type(c.police) is police_model]},
+                starts_at__gte=since, starts_at__lt=horizon,
+        ).values_list(person_field, 'starts_at', 'ends_at'):
+            add(by_police[police_model, police_id], starts_at, ends_at)
+    for row in generated:
+        candidate = by_police.get((type(row.police), row.police.pk))
+        if candidate is not None and since <= row.starts_at < horizon:
+            add(candidate, row.starts_at, row.ends_at)
+    return candidates
+
+
+def day_slots(day, shift_hours):
+    for hour in range(0, 24, shift_hours):
+        end_hour = hour + shift_hours
+        shift_start = datetime.time(hour)
+        shift_end = datetime.time(end_hour % 24)
+        yield ((shift_start, shift_end, end_hour >= 24)
+               + shift_range(day, shift_start, shift_end, end_hour >= 24))
+
+
+def build_roster(guard_tablet, generated=()):
+    '''Cover every position of the tablet's garrison for the whole day
+
+    Slots are filled in time order. Each goes to the rested police with the
+    fewest night shifts (for night slots) or the fewest minutes on guard,
+    counted over the last `GUARD_ROSTER_HISTORY_DAYS`. When too few are
+    rested, the ones off duty longest are put on with a short rest, and only
+    then is a slot left unfilled. `generated` are the unsaved rows of the
+    rosters built before, see `build_rosters`. Nothing is saved, see `save_roster`.
+    '''
+    day = guard_tablet.apply_date
+    shift_hours = settings.GUARD_SHIFT_HOURS
+    rest = datetime.timedelta(hours=settings.GUARD_REST_HOURS)
+    positions = list(Position.objects.for_garrison(guard_tablet.garrison_id)
+                     .select_related('location').order_by('pk'))
+    candidates = roster_candidates(guard_tablet.garrison_id, day, rest, generated)
+
+    rows, unfilled = [], []
+    for shift_start, shift_end, next_day, starts_at, ends_at in day_slots(day, shift_hours):
+        fairness = NIGHT_FAIRNESS if shift_start.hour in NIGHT_HOURS else DAY_FAIRNESS
+        rested = sorted((c for c in candidates if c.is_rested(starts_at, ends_at, rest)),
+                        key=fairness)
+        tired = sorted((c for c in candidates if not c.is_rested(starts_at, ends_at, rest)
+                        and c.is_free(starts_at, ends_at)),
+                       key=lambda c: c.last_end or starts_at)
+        picks = [(c, False) for c in rested] + [(c, True) for c in tired]
+
+        for position, pick in zip(positions, picks + [None] * len(positions)):
+            if pick is None:
+                unfilled.append((position, shift_start, shift_end))
+                continue
+            candidate, short_rest = pick
+            candidate.add_shift(starts_at, ends_at, rest)
+            rows.append(RosterRow(candidate.police, position, shift_start, shift_end,
+                                  next_day, starts_at, ends_at, short_rest))
+    return Roster(rows, unfilled, len(candidates))
+
+
+def build_rosters(tablets):
+    '''The (tablet, roster) of `tablets` by date, each built around the ones before'''
+    rosters, generated = [], []
+    for tablet in sorted(tablets, key=attrgetter('apply_date', 'pk')):
+        roster = build_roster(tablet, generated)
+        generated.extend(roster.rows)
+        rosters.append((tablet, roster))
+    return rosters
+
+
+def save_roster(guard_tablet, roster):
+    guards = {PersonalGuard: [], SoldierGuard: []}
+    for row in roster.rows:
+        model = (PersonalGuard if isinstance(row.police, PersonalMilitaryPolice)
+                 else SoldierGuard)
+        guards[model].append(model(
+            guard_tablet=guard_tablet, position=row.position,
+            shift_start=row.shift_start, shift_end=row.shift_end,
+            shift_ends_next_day=row.shift_ends_next_day,
+            starts_at=row.starts_at, ends_at=row.ends_at,
+            **{model.PERSON_FIELD: row.police}))
+    with transaction.atomic():
+        for model, objs in guards.items():
+            model.objects.bulk_create(objs, batch_size=500)
@@ -0,0 +1,72 @@
+import datetime
+import heapq
+from collections import namedtuple
+from operator import attrgetter
+
+from django.utils import timezone
+from jalali_date import date2jalali
+
+Shift = namedtuple('Shift', ['person_id', 'starts_at', 'ends_at', 'guard'])
+
+
+def shift_range(apply_date, shift_start, shift_end, shift_ends_next_day):
+    '''Absolute (starts_at, ends_at) of a shift on the tablet of `apply_date`
+
+    A shift ending at or before its start hour runs into the next day, even
+    if `shift_ends_next_day` was not ticked.
+    '''
+    starts_at = datetime.datetime.combine(apply_date, shift_start)
+    ends_at = datetime.datetime.combine(apply_date, shift_end)
+    if shift_ends_next_day or ends_at <= starts_at:
+        ends_at += datetime.timedelta(days=1)
+    return (timezone.make_aware(starts_at, is_dst=False),
+            timezone.make_aware(ends_at, is_dst=False))
+
+
+def overlapping_shifts(shifts):
+    '''Pairs of shifts of one person whose ranges intersect
+
+    Shifts are sorted once per person and swept with a heap of the ones still
+    running, so this is O(n log n) plus the number of pairs found. Touching
+    ranges (one ends when the next starts) do not overlap.
+    '''
+    shifts = sorted(shifts, key=attrgetter('person_id', 'starts_at'))
+    running = []
+    person_id = None
+    for index, shift in enumerate(shifts):
+        if shift.person_id != person_id:
+            person_id, running = shift.person_id, []
+        while running and running[0][0] <= shift.starts_at:
+            heapq.heappop(running)
+        for _, other in running:
+            yield shifts[other], shift
+        heapq.heappush(running, (shift.ends_at, index))
+
+
+def guard_shifts(guards, person_field):
+    return [Shift(getattr(guard, f'{person_field}_id'),
+                  guard.starts_at, guard.ends_at, guard)
+            for guard in guards if guard.starts_at is not None]
+
+
+def find_conflicts(model, starts_at, ends_at, guards=None):
+    '''Overlapping shifts of `model` running between `starts_at` and `ends_at`
+
+    `guards` narrows the rows looked at, e.g. to one garrison.
+    '''
+    person_field = model.PERSON_FIELD
+    if guards is None:
+        guards = model.objects.all()
+    guards = guards.filter(
+        **{f'{person_field}__isnull': False},
+        starts_at__lt=ends_at, ends_at__gt=starts_at,
+    ).select_related(f'{person_field}__{person_field}', 'position',
+                     'guard_tablet')
+    return list(overlapping_shifts(guard_shifts(guards, person_field)))
+
+
+def describe_range(starts_at, ends_at):
+    starts_at, ends_at = timezone.localtime(starts_at), timezone.localtime(ends_at)
+    return '{0} ساعت {1} تا {2}'.format(
+        date2jalali(starts_at.date()).strftime('%y/%m/%d'),
+        starts_at.strftime('%H:%M'), ends_at.strftime('%H:%M'))
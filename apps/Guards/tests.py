@@ -1,3 +1,353 @@
-from django.test import TestCase
+import datetime
+import time
+from itertools import groupby
+from operator import attrgetter
 
-# Create your tests here.
+from django.contrib.messages import get_messages
+from django.db import connection
+from django.forms import inlineformset_factory
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.BasicInformations.models import Chevron
+from apps.BasicInformations.testing import ChangelistQueriesMixin, RowFactory
+from apps.Garrisons.models import GoRecess, Garrison, Location, Personal, Soldier
+
+from .admin import ShiftOverlapInlineFormSet
+from .models import (GuardTablet, PersonalGuard, PersonalMilitaryPolice, Position,
+                     SoldierGuard, SoldierMilitaryPolice)
+from .roster import NIGHT_HOURS, build_roster, build_rosters
+from .shifts import Shift, overlapping_shifts, shift_range
+
+
+def at(hour):
+    return datetime.datetime(2021, 3, 21) + datetime.timedelta(hours=hour)
+
+
+class ShiftTests(SimpleTestCase):
+
+    def shift(self, person_id, start, end):
+        return Shift(person_id, at(start), at(end), f'{person_id}: {start}-{end}')
+
+    def pairs(self, *shifts):
+        return {(first.guard, second.guard) for first, second in overlapping_shifts(shifts)}
+
+    def test_overlapping(self):
+        self.assertEqual(
+            self.pairs(self.shift(1, 8, 12), self.shift(1, 0, 24), self.shift(1, 10, 14)),
+            {('1: 0-24', '1: 8-12'), ('1: 0-24', '1: 10-14'), ('1: 8-12', '1: 10-14')})
+
+    def test_touching_shifts_do_not_overlap(self):
+        self.assertEqual(self.pairs(self.shift(1, 8, 10), self.shift(1, 10, 12),
+                                    self.shift(1, 12, 14)), set())
+
+    def test_other_persons(self):
+        self.assertEqual(self.pairs(self.shift(1, 8, 12), self.shift(2, 8, 12),
+                                    self.shift(2, 11, 13)), {('2: 8-12', '2: 11-13')})
+
+    def test_shift_range(self):
+        day = datetime.date(2021, 5, 1)
+        starts_at, ends_at = shift_range(day, datetime.time(8), datetime.time(10), False)
+        self.assertEqual(ends_at - starts_at, datetime.timedelta(hours=2))
+        # ending at or before its start runs into the next day
+        starts_at, ends_at = shift_range(day, datetime.time(22), datetime.time(2), False)
+        self.assertEqual(ends_at - starts_at, datetime.timedelta(hours=4))
+        starts_at, ends_at = shift_range(day, datetime.time(8), datetime.time(10), True)
+        self.assertEqual(ends_at - starts_at, datetime.timedelta(hours=26))
+
+
+class ShiftConflictTests(TestCase):
+    SoldierGuardFormSet = inlineformset_factory(
+        GuardTablet, SoldierGuard, formset=ShiftOverlapInlineFormSet, extra=0,
+        fields=('soldier', 'position', 'shift_start', 'shift_end', 'shift_ends_next_day'))
+
+    @classmethod
+    def setUpTestData(cls):
+        factory = RowFactory()
+        cls.garrison = factory.create(Garrison)
+        cls.position = factory.create(Position)
+        cls.first, cls.second = factory.create_rows(SoldierMilitaryPolice, 2)
+        # the clocks moved forward at the start of 2021-03-22
+        cls.yesterday = factory.create(GuardTablet, garrison=cls.garrison,
+                                       apply_date=datetime.date(2021, 3, 22))
+        cls.today = factory.create(GuardTablet, garrison=cls.garrison,
+                                   apply_date=datetime.date(2021, 3, 23))
+        cls.user = User.objects.create_superuser('admin', has_valid_password=True)
+
+    def guard(self, tablet, soldier, start, end, next_day=False):
+        return SoldierGuard.objects.create(
+            guard_tablet=tablet, soldier=soldier, position=self.position,
+            shift_start=datetime.time(start), shift_end=datetime.time(end),
+            shift_ends_next_day=next_day)
+
+    def formset(self, tablet, *rows):
+        prefix = SoldierGuard._meta.get_field('guard_tablet').remote_field.related_name
+        initial = list(tablet.soldiers_on_guard.order_by('pk'))
+        data = {f'{prefix}-TOTAL_FORMS': str(len(rows)),
+                f'{prefix}-INITIAL_FORMS': str(len(initial))}
+        for index, (soldier, start, end) in enumerate(rows):
+            if index < len(initial):
+                data[f'{prefix}-{index}-id'] = str(initial[index].pk)
+            data.update({f'{prefix}-{index}-soldier': str(soldier.pk),
+                         f'{prefix}-{index}-position': str(self.position.pk),
+                         f'{prefix}-{index}-shift_start': f'{start:02d}:00:00',
+                         f'{prefix}-{index}-shift_end': f'{end:02d}:00:00'})
+        return self.SoldierGuardFormSet(data, instance=tablet, prefix=prefix)
+
+    def errors(self, formset):
+        self.assertEqual(formset.is_valid(), not any(formset.errors))
+        return [bool(errors) for errors in formset.errors]
+
+    def test_rows_of_the_tablet(self):
+        self.assertEqual(self.errors(self.formset(
+            self.today, (self.first, 8, 12), (self.first, 10, 14), (self.second, 10, 14))),
+            [True, True, False])
+        self.assertEqual(self.errors(self.formset(
+            self.today, (self.first, 8, 10), (self.first, 10, 12))), [False, False])
+
+    def test_shifts_of_the_tablets_around(self):
+        self.guard(self.yesterday, self.first, 22, 2)
+        formset = self.formset(self.today, (self.first, 1, 3), (self.second, 1, 3))
+        self.assertEqual(self.errors(formset), [True, False])
+        self.assertIn('22:00', str(formset.forms[0].non_field_errors()))
+
+    def test_saved_rows_of_the_tablet_are_replaced(self):
+        self.guard(self.today, self.first, 8, 12)
+        # the form moves the saved shift, it does not conflict with itself
+        self.assertEqual(self.errors(self.formset(self.today, (self.first, 10, 14))),
+                         [False])
+        self.assertEqual(self.errors(self.formset(
+            self.today, (self.first, 10, 14), (self.first, 13, 15))), [True, True])
+
+    def run_action(self, *tablets):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('admin:Guards_guardtablet_changelist'), {
+            'action': 'find_shift_conflicts',
+            '_selected_action': [tablet.pk for tablet in tablets]})
+        self.assertEqual(response.status_code, 302)
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_find_shift_conflicts(self):
+        self.guard(self.yesterday, self.first, 22, 2)
+        self.guard(self.today, self.first, 1, 3)
+        self.guard(self.today, self.second, 1, 3)
+        self.guard(self.today, self.second, 3, 5)
+        [message] = self.run_action(self.yesterday, self.today)
+        self.assertIn(str(self.first), message)
+        self.assertIn('22:00 تا 02:00', message)
+        self.assertIn('01:00 تا 03:00', message)
+
+    def test_no_conflicts(self):
+        self.guard(self.yesterday, self.first, 22, 2)
+        self.guard(self.today, self.first, 2, 4)
+        [message] = self.run_action(self.yesterday, self.today)
+        self.assertEqual(message, 'تداخلی در شیفت‌های لوحه‌های انتخاب شده نیست.')
+
+
+@override_settings(GUARD_SHIFT_HOURS=2, GUARD_REST_HOURS=4, GUARD_ROSTER_HISTORY_DAYS=7)
+class RosterTests(TestCase):
+    rest = datetime.timedelta(hours=4)
+
+    def setUp(self):
+        self.factory = RowFactory()
+        self.garrison = self.factory.create(Garrison)
+        self.location = self.factory.create(Location, garrison=self.garrison)
+
+    def police(self, count):
+        return [self.factory.create(SoldierMilitaryPolice, soldier=self.factory.create(
+            Soldier, location=self.location)) for _ in range(count)]
+
+    def tablet(self, day, positions):
+        self.factory.create_rows(Position, positions - Position.objects.count(),
+                                 location=self.location)
+        return self.factory.create(GuardTablet, garrison=self.garrison, apply_date=day)
+
+    def assertRested(self, rows):
+        '''Every shift of a police not marked short starts `rest` after its last one'''
+        for police, shifts in groupby(sorted(rows, key=lambda row: (row.police.pk,
+                                                                     row.starts_at)),
+                                      key=attrgetter('police')):
+            shifts = list(shifts)
+            for last, shift in zip(shifts, shifts[1:]):
+                if not shift.short_rest:
+                    self.assertGreaterEqual(shift.starts_at - last.ends_at, self.rest,
+                                            (police, last, shift))
+
+    def test_greedy_assignment(self):
+        police = self.police(12)
+        roster = build_roster(self.tablet(datetime.date(2021, 5, 1), 2))
+        self.assertEqual(roster.candidates, 12)
+        self.assertEqual(roster.unfilled, [])
+        self.assertEqual(len(roster.rows), 2 * 12)
+        self.assertFalse(any(row.short_rest for row in roster.rows))
+        self.assertRested(roster.rows)
+        # everyone is on guard, and the 8 night shifts go to 8 police
+        nights = {p: 0 for p in police}
+        for row in roster.rows:
+            nights[row.police] += timezone.localtime(row.starts_at).hour in NIGHT_HOURS
+        self.assertEqual(sorted(nights.values()), [0] * 4 + [1] * 8)
+        self.assertEqual({row.police for row in roster.rows}, set(police))
+
+    def test_rest_time(self):
+        self.police(3)
+        roster = build_roster(self.tablet(datetime.date(2021, 5, 1), 1))
+        self.assertEqual((len(roster.rows), roster.unfilled), (12, []))
+        self.assertFalse(any(row.short_rest for row in roster.rows))
+        self.assertRested(roster.rows)
+
+        # too few to rest: the ones off duty longest are put on, and flagged
+        self.police(1)
+        roster = build_roster(self.tablet(datetime.date(2021, 5, 2), 2))
+        self.assertEqual((len(roster.rows), roster.unfilled), (24, []))
+        self.assertEqual([row.short_rest for row in roster.rows], [False] * 4 + [True] * 20)
+        self.assertRested(roster.rows)
+        for last, row in zip(roster.rows, roster.rows[4:]):
+            self.assertEqual(row.police, last.police)
+
+    def test_unfilled(self):
+        self.police(1)
+        roster = build_roster(self.tablet(datetime.date(2021, 5, 1), 2))
+        self.assertEqual(len(roster.rows), 12)
+        self.assertEqual(len(roster.unfilled), 12)
+        self.assertEqual(roster.unfilled[0], (Position.objects.order_by('pk')[1],
+                                              datetime.time(0), datetime.time(2)))
+
+    def test_unavailable_soldiers(self):
+        present, away = self.police(2)
+        self.factory.create(GoRecess, soldier=away.soldier,
+                            start_date=datetime.date(2021, 4, 30),
+                            end_date=datetime.date(2021, 5, 2))
+        roster = build_roster(self.tablet(datetime.date(2021, 5, 1), 1))
+        self.assertEqual(roster.candidates, 1)
+        self.assertEqual({row.police for row in roster.rows}, {present})
+
+    def test_no_police(self):
+        roster = build_roster(self.tablet(datetime.date(2021, 5, 1), 2))
+        self.assertEqual((roster.rows, len(roster.unfilled)), ([], 24))
+
+    def test_saved_neighbouring_shifts(self):
+        late, early, *others = self.police(4)
+        yesterday = self.tablet(datetime.date(2021, 4, 30), 1)
+        tomorrow = self.tablet(datetime.date(2021, 5, 2), 1)
+        position = Position.objects.get()
+        # runs two hours into the day, and starts two hours before its end
+        SoldierGuard.objects.create(
+            guard_tablet=yesterday, soldier=late, position=position,
+            shift_start=datetime.time(22), shift_end=datetime.time(2))
+        SoldierGuard.objects.create(
+            guard_tablet=tomorrow, soldier=early, position=position,
+            shift_start=datetime.time(0), shift_end=datetime.time(2))
+        roster = build_roster(self.tablet(datetime.date(2021, 5, 1), 1))
+
+        self.assertEqual(roster.unfilled, [])
+        self.assertFalse(any(row.short_rest for row in roster.rows))
+        starts = {police: [] for police in (late, early)}
+        for row in roster.rows:
+            starts.get(row.police, []).append(timezone.localtime(row.starts_at).hour)
+        self.assertGreaterEqual(min(starts[late]), 6)
+        self.assertLessEqual(max(starts[early]), 18)
+
+    def test_chained_rosters(self):
+        self.police(4)
+        # the clocks move forward at the start of the second day
+        tablets = [self.tablet(datetime.date(2021, 3, 22 - days), 1) for days in range(2)]
+        rosters = build_rosters(tablets)
+        self.assertEqual([tablet for tablet, roster in rosters], tablets[::-1])
+        rows = [row for tablet, roster in rosters for row in roster.rows]
+        self.assertEqual(len(rows), 24)
+        self.assertFalse(any(row.short_rest for row in rows))
+        self.assertRested(rows)
+
+    def test_performance_target(self):
+        police = self.police(200)
+        tablet = self.tablet(datetime.date(2021, 5, 1), 60)
+        build_roster(self.tablet(datetime.date(2021, 5, 2), 60))
+
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            roster = build_roster(tablet)
+        self.assertLess(time.perf_counter() - started, 3)
+        self.assertEqual((len(roster.rows), roster.unfilled), (60 * 12, []))
+        self.assertFalse(any(row.short_rest for row in roster.rows))
+        self.assertEqual({row.police for row in roster.rows}, set(police))
+        # the queries do not grow with the police or the positions
+        self.assertLessEqual(len(queries), 10)
+
+    def test_generate_roster_action(self):
+        self.police(3)
+        tablet = self.tablet(datetime.date(2021, 5, 1), 1)
+        url = reverse('admin:Guards_guardtablet_changelist')
+        data = {'action': 'generate_roster', '_selected_action': [tablet.pk]}
+        self.client.force_login(User.objects.create_superuser(
+            'admin', has_valid_password=True))
+
+        response = self.client.post(url, data)
+        self.assertTemplateUsed(response, 'admin/Guards/guardtablet/roster_preview.html')
+        self.assertFalse(SoldierGuard.objects.exists())
+
+        response = self.client.post(url, {**data, 'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(tablet.soldiers_on_guard.count(), 12)
+        self.assertFalse(tablet.soldiers_on_guard.filter(starts_at__isnull=True).exists())
+
+        # a filled tablet is left as it is
+        response = self.client.post(url, {**data, 'post': 'yes'}, follow=True)
+        self.assertEqual(tablet.soldiers_on_guard.count(), 12)
+        self.assertContains(response, 'از قبل شیفت دارد')
+
+
+class GuardTabletPdfTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.garrison = Garrison.objects.create(name='garrison', mp=1, mf=1, md=1, mbv=1)
+        cls.location = Location.objects.create(name='gate', garrison=cls.garrison,
+                                               liable='liable')
+        cls.chevron = Chevron.objects.create(title='chevron')
+        cls.position = Position.objects.create(title='gate', location=cls.location,
+                                               weapon='ژ 3 - 20 تیر')
+        cls.user = User.objects.create_superuser('admin', password='password',
+                                                 has_valid_password=True)
+
+    def tablet(self, day, shifts):
+        tablet = GuardTablet.objects.create(garrison=self.garrison, apply_date=day)
+        for number in range(shifts):
+            personal = Personal.objects.create(
+                personalCode=f'{day:%m%d}{number:04d}', chevron=self.chevron,
+                first_name='first', last_name=f'last {number}')
+            soldier = Soldier.objects.create(
+                national_code=f'{day:%m%d}{number:06d}', chevron=self.chevron,
+                first_name='first', last_name=f'last {number}', father_name='father',
+                location=self.location, dispatch_date=day, station=1, is_married=False)
+            shift = {'guard_tablet': tablet, 'position': self.position,
+                     'shift_start': datetime.time(number % 24),
+                     'shift_end': datetime.time((number + 1) % 24)}
+            PersonalGuard.objects.create(
+                personal=PersonalMilitaryPolice.objects.create(personal=personal), **shift)
+            SoldierGuard.objects.create(
+                soldier=SoldierMilitaryPolice.objects.create(soldier=soldier), **shift)
+        return reverse('guard:guardtablet_to_pdf', args=[tablet.pk])
+
+    def test_queries_do_not_grow_with_the_shifts(self):
+        one = self.tablet(datetime.date(2021, 3, 21), 1)
+        many = self.tablet(datetime.date(2021, 3, 22), 20)
+        self.client.force_login(self.user)
+        self.client.get(one)  # the session and the reference tables are loaded once
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(one)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['soldier_rows']), 1)
+
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(many)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['personal_rows']), 20)
+        self.assertEqual(len(response.context['soldier_rows']), 20)
+
+
+class ChangelistQueriesTests(ChangelistQueriesMixin, TestCase):
+    app_labels = ('Guards',)
@@ -2,9 +2,16 @@ from django.shortcuts import get_object_or_404, render
 
 
 from . import models
+from .reports import guard_tablet_rows
 
 
 def guardtablet_to_pdf(request, guardtablet_id):
+    guardtablet = get_object_or_404(
+        models.GuardTablet.objects.for_user(request.user).select_related('garrison'),
+        id=guardtablet_id)
+    personal_rows, soldier_rows = guard_tablet_rows(guardtablet)
     return render(
         request, 'reports/guardtablet-to-pdf.html',
-        {'guardtablet': get_object_or_404(models.GuardTablet, id=guardtablet_id)})
+        {'guardtablet': guardtablet,
+         'personal_rows': personal_rows,
+         'soldier_rows': soldier_rows})
@@ -1,17 +1,33 @@
 import datetime
-from itertools import chain
+from itertools import chain, groupby
 
-from django.contrib import admin
-from django.core.exceptions import ValidationError
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.db import models as db_model
 from django.forms.models import BaseInlineFormSet
 from django.forms.widgets import NumberInput
-from django.urls import reverse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
 from django.utils.safestring import mark_safe
-from jalali_date import date2jalali, datetime2jalali
 from jalali_date.admin import ModelAdminJalaliMixin, TabularInlineJalaliMixin
 
+from apps.BasicInformations.export import EXPORT_FORMATS, table_response
+from apps.BasicInformations.jalali import DATE_FORMAT
+from apps.BasicInformations.mixins import (ExportAdminMixin, GarrisonScopedAdminMixin,
+                                          JalaliColumnsAdminMixin, JalaliDateSearchMixin,
+                                          KeysetPaginationAdminMixin,
+                                          QueryPlanAdminMixin, SearchIndexAdminMixin,
+                                          jalali_column)
+from apps.Garrisons.models import Garrison
+
 from . import models
+from .budget import budget_by_garrison_year
+from .forms import EquipmentForm, InventoryForm
+from .inventory import INVENTORY_TITLES, garrison_counts, inventory_rows, labels
+from .network import ip_text, network_range
 
 HOURS = [(datetime.time(hour=x), '{:02d}:00'.format(x)) for x in range(0, 24)]
 HOURS_WITH_HALF = [(datetime.time(hour=x, minute=30),
@@ -41,18 +57,48 @@ class EquipmentHistoryInline(TabularInlineJalaliMixin, admin.TabularInline):
     autocomplete_fields = ['status', 'location']
 
 
+class StatusChangedFilter(admin.SimpleListFilter):
+    title = 'تغییر وضعیت'
+    parameter_name = 'changed'
+    days = 7
+
+    def lookups(self, request, model_admin):
+        return (('recent', f'تغییر وضعیت در {self.days} روز گذشته'),)
+
+    def queryset(self, request, queryset):
+        if self.value() == 'recent':
+            return queryset.filter(
+                last_event_date__gte=timezone.now() - datetime.timedelta(days=self.days))
+
+
+class AddressConflictFilter(admin.SimpleListFilter):
+    title = 'آدرس IP'
+    parameter_name = 'ip_conflict'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'IP و پورت تکراری در پایگاه'),)
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.in_address_conflict()
+
+
 @admin.register(models.Equipment)
-class EquipmentAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class EquipmentAdmin(GarrisonScopedAdminMixin, ExportAdminMixin, KeysetPaginationAdminMixin,
+                     JalaliDateSearchMixin, SearchIndexAdminMixin, JalaliColumnsAdminMixin,
+                     ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('name', 'location', 'category', 'brand', 'model', 'status',
-                    'get_buy_date_jalali', 'order_pdf',
+                    'ip_address', 'port_number',
+                    'get_last_event_date_jalali', 'get_buy_date_jalali', 'order_pdf',
                     'get_created_jalali', 'get_updated_jalali')
-    list_filter = ('location', 'category', 'brand', 'buy_date', 'shop',
-                   'status', 'level_info', 'created', 'updated')
+    list_filter = ('location', 'category', 'brand', 'buy_date', 'shop', 'status',
+                   StatusChangedFilter, AddressConflictFilter, 'level_info', 'created', 'updated')
     search_fields = (
         'deploy_location', 'name', 'description_equipment', 'brand', 'model',
         'serial_number', 'buy_date', 'sis_number', 'charges__amount', 'shop__name',
         'amount', 'imperialistic', 'imperialistic_date', 'ip_address', 'port_number',
         'location__name', 'level_info', 'description', 'created', 'updated')
+    jalali_search_fields = ('buy_date', 'created', 'updated')
     ordering = ['created']
     # filter_horizontal = ('charges',)
     autocomplete_fields = ['buyer', 'owner', 'shop',
@@ -65,108 +111,166 @@ class EquipmentAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
             attrs={'style': 'width: 20em;'})},
     }
 
+    form = EquipmentForm
+    change_list_template = 'admin/Stores/equipment/change_list.html'
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('inventory/', self.admin_site.admin_view(self.inventory_view),
+                 name='%s_%s_inventory' % info),
+            path('network/conflicts/', self.admin_site.admin_view(self.address_conflicts_view),
+                 name='%s_%s_address_conflicts' % info),
+            *super().get_urls(),
+        ]
+
+    def inventory_view(self, request):
+        '''The equipment of a past day by garrison, see `EquipmentQuerySet.state_on`'''
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        form = InventoryForm(request.user, request.GET if 'date' in request.GET else None)
+        totals = groups = None
+        shown = settings.INVENTORY_ROWS_SHOWN
+        if form.is_valid():
+            queryset = form.queryset()
+            format = request.GET.get('format')
+            if format in EXPORT_FORMATS:
+                try:
+                    return table_response(INVENTORY_TITLES, inventory_rows(queryset),
+                                          'inventory', format)
+                except ImportError:
+                    self.message_user(request, 'برای خروجی xlsx بسته openpyxl نصب نیست.',
+                                      messages.ERROR)
+            totals = garrison_counts(queryset)
+            rows = next(inventory_rows(queryset[:shown], shown), [])
+            groups = [(garrison, list(rows)) for garrison, rows in groupby(
+                rows, key=lambda row: row[0])]
+        query = request.GET.copy()
+        query.pop('format', None)
+        return TemplateResponse(request, 'admin/Stores/equipment/inventory.html', {
+            **self.admin_site.each_context(request),
+            'title': 'موجودی تجهیزات در یک روز',
+            'opts': self.model._meta,
+            'form': form,
+            'titles': INVENTORY_TITLES[1:],
+            'totals': totals,
+            'total': totals and sum(count for _, count in totals),
+            'groups': groups,
+            'shown': shown,
+            'export_formats': EXPORT_FORMATS,
+            'query': query.urlencode(),
+        })
+
+    def address_conflicts_view(self, request):
+        '''The IP:port pairs used by more than one equipment of a garrison'''
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        conflicts = list(self.get_queryset(request).address_conflicts())
+        garrisons = labels(Garrison, {row['address_garrison'] for row in conflicts})
+        for row in conflicts:
+            row['garrison'] = garrisons.get(row['address_garrison'], '')
+            row['ip_address'] = ip_text(row['ip_integer'])
+        return TemplateResponse(request, 'admin/Stores/equipment/address_conflicts.html', {
+            **self.admin_site.each_context(request),
+            'title': 'آدرس های IP تکراری',
+            'opts': self.model._meta,
+            'conflicts': conflicts,
+            'filter': AddressConflictFilter.parameter_name,
+        })
+
+    def get_search_results(self, request, queryset, search_term):
+        network = network_range(search_term)
+        if network is not None:
+            # e.g. '10.2.0.0/16', an indexed range instead of a scan of the text
+            return queryset.filter(ip_integer__range=network), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly_fields = super().get_readonly_fields(request, obj)
+        if obj is not None and obj.last_event_date is not None:
+            # set by the latest history event, see `Stores.signals`
+            readonly_fields = (*readonly_fields, 'status', 'location', 'depot')
+        return readonly_fields
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except ValidationError as error:
+            # a charge spent by another save since the form was checked
+            for message in error.messages:
+                self.message_user(request, message, messages.ERROR)
+            return redirect(request.get_full_path())
+
+    def save_model(self, request, obj, form, change):
+        # the price is posted once, with the charges saved by save_related
+        with models.ChargeAllocation.objects.deferred():
+            super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        with models.ChargeAllocation.objects.deferred():
+            super().save_related(request, form, formsets, change)
+        models.ChargeAllocation.objects.post(form.instance.pk)
+
     def order_pdf(self, obj):
         url = reverse('store:equipment_to_pdf', args=[obj.id])
         return mark_safe(f'<a href="{url}" target="_blank">ایجاد گزارش</a>')
     order_pdf.short_description = 'عملیات'
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_buy_date_jalali(self, obj):
-        return date2jalali(obj.buy_date).strftime('%y/%m/%d')
-    get_buy_date_jalali.admin_order_field = 'buy_date'
-    get_buy_date_jalali.short_description = 'تاریخ خرید'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            location__garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_buy_date_jalali = jalali_column('buy_date', 'تاریخ خرید', DATE_FORMAT)
+    get_last_event_date_jalali = jalali_column('last_event_date', 'تاریخ آخرین رویداد')
 
 
 @admin.register(models.Charge)
-class ChargeAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
-    list_display = ('name', 'amount', 'get_receive_date_jalali',
+class ChargeAdmin(GarrisonScopedAdminMixin, JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                  ModelAdminJalaliMixin, admin.ModelAdmin):
+    list_display = ('name', 'amount', 'spent', 'get_remaining', 'get_receive_date_jalali',
                     'get_created_jalali', 'get_updated_jalali')
     list_filter = ('amount', 'receive_date', 'created', 'updated')
     search_fields = ('name', 'amount', 'description',
                      'receive_date', 'created', 'updated')
+    jalali_search_fields = ('receive_date', 'created', 'updated')
     ordering = ['receive_date']
     autocomplete_fields = ['garrison', ]
+    readonly_fields = ('spent',)
 
     formfield_overrides = {
         db_model.IntegerField: {'widget': NumberInput(
             attrs={'style': 'width: 20em;'})},
     }
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_receive_date_jalali(self, obj):
-        return date2jalali(obj.receive_date).strftime('%y/%m/%d')
-    get_receive_date_jalali.admin_order_field = 'receive_date'
-    get_receive_date_jalali.short_description = 'تاریخ دریافت اعتبار'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_receive_date_jalali = jalali_column('receive_date', 'تاریخ دریافت اعتبار', DATE_FORMAT)
+
+    def get_remaining(self, obj):
+        return obj.remaining
+    get_remaining.short_description = 'مانده به ریال'
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('budget/', self.admin_site.admin_view(self.budget_view),
+                 name='%s_%s_budget' % info),
+            *super().get_urls(),
+        ]
+
+    def budget_view(self, request):
+        '''The charges of each garrison and Jalali year, spent and remaining'''
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        return TemplateResponse(request, 'admin/Stores/charge/budget.html', {
+            **self.admin_site.each_context(request),
+            'title': 'بودجه پایگاه ها به تفکیک سال',
+            'opts': self.model._meta,
+            'rows': budget_by_garrison_year(self.get_queryset(request)),
+        })
 
 
 @admin.register(models.Shop)
-class ShopAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class ShopAdmin(QueryPlanAdminMixin, JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('name', 'city', 'phone_number',
                     'get_created_jalali', 'get_updated_jalali')
     list_filter = ('city', 'created', 'updated')
@@ -177,15 +281,8 @@ class ShopAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     ordering = ['created']
     autocomplete_fields = ['city', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
     '''
         اگر لازم بود فروشگاه هم برحسب پایگاه یوزری که داره کار میکنه فیلتر بشه
@@ -201,25 +298,10 @@ class ShopAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
         ).distinct() if qs.count() >= 1 else qs
     '''
 
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
-
 
 @admin.register(models.Depot)
-class DepotAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class DepotAdmin(GarrisonScopedAdminMixin, JalaliDateSearchMixin, JalaliColumnsAdminMixin,
+                 ModelAdminJalaliMixin, admin.ModelAdmin):
     list_display = ('name', 'get_created_jalali', 'get_updated_jalali')
     list_filter = ('created', 'updated')
     search_fields = ('name', 'created', 'updated')
@@ -227,85 +309,24 @@ class DepotAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     filter_horizontal = ('zonet_hreats',)
     autocomplete_fields = ['garrison', ]
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
 
 
 @admin.register(models.History)
-class HistoryAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class HistoryAdmin(GarrisonScopedAdminMixin, ExportAdminMixin, KeysetPaginationAdminMixin,
+                   JalaliDateSearchMixin, JalaliColumnsAdminMixin, ModelAdminJalaliMixin,
+                   admin.ModelAdmin):
     list_display = ('get_event_date_time_jalali', 'status',
                     'get_created_jalali', 'get_updated_jalali')
     list_filter = ('event_date_time', 'status', 'created', 'updated')
     search_fields = ('event_date_time', 'precept_number', 'created', 'updated')
+    jalali_search_fields = ('event_date_time', 'created', 'updated')
     ordering = ['event_date_time']
     autocomplete_fields = ['equipment', 'status', 'location']
+    export_fields = ('event_date_time', 'precept_number', 'equipment', 'status', 'location',
+                     'created', 'updated')
 
-    def get_created_jalali(self, obj):
-        return datetime2jalali(obj.created).strftime('%y/%m/%d - %H:%M:%S')
-    get_created_jalali.admin_order_field = 'created'
-    get_created_jalali.short_description = 'تاریخ و زمان درج'
-
-    def get_updated_jalali(self, obj):
-        return datetime2jalali(obj.updated).strftime('%y/%m/%d - %H:%M:%S')
-    get_updated_jalali.admin_order_field = 'updated'
-    get_updated_jalali.short_description = 'تاریخ و زمان بروز رسانی'
-
-    def get_event_date_time_jalali(self, obj):
-        return datetime2jalali(obj.event_date_time).strftime('%y/%m/%d - %H:%M:%S')
-    get_event_date_time_jalali.admin_order_field = 'event_date_time'
-    get_event_date_time_jalali.short_description = 'تاریخ و زمان بروز رویداد'
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(
-            equipment__location__garrison=request.user.garrison
-        ).distinct() if qs.count() >= 1 else qs
-
-    def get_search_results(self, request, queryset, search_term):
-        """To filter with regard of JalaliDate"""
-        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
-        try:
-            search_date = datetime.datetime.strptime(search_term, '%y/%m/%d')
-            search_date = search_term
-        except ValueError as er:
-            pass
-        else:
-            obj_list = [x.id for x in self.model.objects.all()
-                        if datetime2jalali(x.created).strftime('%y/%m/%d') == search_date or
-                        datetime2jalali(x.updated).strftime('%y/%m/%d') == search_date
-                        ]
-            queryset |= self.model.objects.filter(id__in=obj_list)
-        return queryset, use_distinct
+    get_created_jalali = jalali_column('created', 'تاریخ و زمان درج')
+    get_updated_jalali = jalali_column('updated', 'تاریخ و زمان بروز رسانی')
+    get_event_date_time_jalali = jalali_column('event_date_time', 'تاریخ و زمان بروز رویداد')
@@ -7,3 +7,6 @@ class StoresConfig(AppConfig):
 
     verbose_name = 'تجهیزات'
     verbose_name_plural = 'تجهیزات'
+
+    def ready(self):
+        import apps.Stores.signals
@@ -0,0 +1,26 @@
+from django.db.models import BigIntegerField, Count, F, Max, Min, Q, Sum
+
+from apps.BasicInformations.jalali import jalali_year_case
+
+
+def budget_by_garrison_year(charges):
+    """The budget, spent and remaining of `charges` by garrison and Jalali year.
+
+    One aggregate grouped by the garrison and the Jalali year of
+    `receive_date`, over the totals cached in `Charge.spent`.
+    """
+    bounds = charges.aggregate(first=Min('receive_date'), last=Max('receive_date'))
+    if bounds['first'] is None:
+        return []
+    rows = charges.order_by().annotate(
+        year=jalali_year_case('receive_date', bounds['first'], bounds['last']),
+    ).values('garrison', 'garrison__name', 'year').annotate(
+        count=Count('pk'),
+        overspent=Count('pk', filter=Q(spent__gt=F('amount'))),
+        budget=Sum('amount', output_field=BigIntegerField()),
+        spent=Sum('spent'),
+    ).annotate(remaining=F('budget') - F('spent')).order_by('garrison__name', '-year')
+    rows = list(rows)
+    for row in rows:
+        row['used_percent'] = round(100 * row['spent'] / row['budget']) if row['budget'] else 0
+    return rows
@@ -0,0 +1,53 @@
+from django import forms
+
+from apps.BasicInformations.jalali import parse_jalali_day
+from apps.BasicInformations.models import StatusEquipment
+from apps.BasicInformations.queryplan import str_query_plan
+from apps.Garrisons.models import Location
+
+from .managers import shortfall_messages
+from .models import ChargeAllocation, Depot, Equipment
+
+
+class EquipmentForm(forms.ModelForm):
+    class Meta:
+        model = Equipment
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        amount, charges = cleaned_data.get('amount'), cleaned_data.get('charges')
+        if amount and charges:
+            shortfalls = ChargeAllocation.objects.shortfalls(self.instance, amount, charges)
+            if shortfalls:
+                self.add_error('charges', shortfall_messages(shortfalls))
+        return cleaned_data
+
+
+class InventoryForm(forms.Form):
+    date = forms.CharField(label='تاریخ', help_text='روز شمسی، مانند ۱۴۰۲/۰۱/۱۵')
+    location = forms.ModelChoiceField(Location.objects.none(), required=False, label='مکان')
+    depot = forms.ModelChoiceField(Depot.objects.none(), required=False, label='انبار')
+    status = forms.ModelChoiceField(StatusEquipment.objects.all(), required=False,
+                                    label='وضعیت')
+
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        for name, model in (('location', Location), ('depot', Depot)):
+            self.fields[name].queryset = str_query_plan(model).apply(
+                model.objects.for_user(user))
+
+    def clean_date(self):
+        date = parse_jalali_day(self.cleaned_data['date'])
+        if date is None:
+            raise forms.ValidationError('تاریخ معتبر نیست، مانند ۱۴۰۲/۰۱/۱۵ وارد کنید.')
+        return date
+
+    def queryset(self):
+        """The equipment of the chosen day, in the chosen location, depot and status then."""
+        queryset = Equipment.objects.state_on_for_user(self.cleaned_data['date'], self.user)
+        for name in ('location', 'depot', 'status'):
+            if self.cleaned_data[name] is not None:
+                queryset = queryset.filter(**{f'{name}_on': self.cleaned_data[name].pk})
+        return queryset.order_by('garrison_on', 'name', 'pk')
@@ -0,0 +1,60 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count
+
+from apps.BasicInformations.models import StatusEquipment, ToolsCategory
+from apps.BasicInformations.queryplan import str_query_plan
+from apps.BasicInformations.refdata import is_reference_model, reference_table
+from apps.Garrisons.models import Garrison, Location
+
+from .models import Depot
+
+# the values of a `state_on` row listed, and the models naming them
+INVENTORY_COLUMNS = (
+    ('garrison_on', 'پایگاه', Garrison),
+    ('name', 'نام', None),
+    ('sis_number', 'شماره SIS', None),
+    ('serial_number', 'شماره سریال', None),
+    ('category', 'دسته بندی', ToolsCategory),
+    ('status_on', 'وضعیت', StatusEquipment),
+    ('location_on', 'مکان', Location),
+    ('depot_on', 'انبار', Depot),
+)
+INVENTORY_TITLES = [title for _, title, _ in INVENTORY_COLUMNS]
+
+
+def labels(model, ids):
+    """str() of the rows `ids` of `model`, by id."""
+    if is_reference_model(model):
+        return {obj.pk: str(obj) for obj in reference_table(model).all() if obj.pk in ids}
+    return {obj.pk: str(obj)
+            for obj in str_query_plan(model).apply(model._base_manager.filter(pk__in=ids))}
+
+
+def inventory_rows(queryset, chunk_size=None):
+    """Yield the rows of a `state_on` queryset as lists of texts, a chunk of rows at a time.
+
+    The garrisons, locations and depots of a chunk are named in one query
+    each, the categories and statuses from their reference tables.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = queryset.values_list(*(name for name, _, _ in INVENTORY_COLUMNS)).iterator(chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        columns = []
+        for values, (_, _, model) in zip(zip(*chunk), INVENTORY_COLUMNS):
+            names = labels(model, set(values) - {None}) if model else {}
+            columns.append(['' if value is None else names.get(value, value)
+                            for value in values])
+        yield [list(row) for row in zip(*columns)]
+
+
+def garrison_counts(queryset):
+    """The (garrison, number of rows) of a `state_on` queryset, by garrison."""
+    counts = queryset.order_by().values_list('garrison_on').annotate(count=Count('pk'))
+    counts = dict(counts.order_by('garrison_on'))
+    names = labels(Garrison, set(counts) - {None})
+    return [(names.get(pk, ''), count) for pk, count in counts.items()]
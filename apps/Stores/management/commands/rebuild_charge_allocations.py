@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.Stores.models import ChargeAllocation
+
+
+class Command(BaseCommand):
+    help = 'Split the price of every equipment over its charges again, and total each charge.'
+
+    def handle(self, *args, **options):
+        allocations = ChargeAllocation.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {allocations} charge allocations.'))
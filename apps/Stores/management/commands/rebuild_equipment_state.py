@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.Stores.models import Equipment
+
+
+class Command(BaseCommand):
+    help = 'Copy the status and location of the latest history event of each equipment.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('equipment_ids', nargs='*', type=int,
+                            help='Only rebuild these equipments (default: all)')
+
+    def handle(self, *args, **options):
+        equipments = Equipment.objects.all()
+        if options['equipment_ids']:
+            equipments = equipments.filter(pk__in=options['equipment_ids'])
+        tracked = equipments.refresh_current_state()
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {tracked} equipments from their latest history event.'))
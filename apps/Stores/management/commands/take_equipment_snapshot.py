@@ -0,0 +1,25 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.BasicInformations.jalali import parse_jalali_day
+from apps.Stores.models import EquipmentSnapshot
+
+
+class Command(BaseCommand):
+    help = ('Store the status, location and depot of every equipment at the end of a day, '
+            'for the inventory report of later days to start from.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='The Jalali day, e.g. 1402/01/15 (default: yesterday)')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            date = parse_jalali_day(options['date'])
+            if date is None:
+                raise CommandError(f'Not a Jalali day: {options["date"]}')
+        else:
+            date = timezone.localdate() - datetime.timedelta(days=1)
+        count = EquipmentSnapshot.objects.take(date)
+        self.stdout.write(self.style.SUCCESS(f'Stored the state of {count} equipments on {date}.'))
@@ -0,0 +1,317 @@
+import datetime
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import (Case, Count, Exists, F, IntegerField, Max, OuterRef, Q, Subquery,
+                              Sum, When)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.BasicInformations.jalali import local_midnight
+from apps.Garrisons.managers import GarrisonScopedQuerySet
+
+# the fields of an equipment which its `History` events change
+STATE_FIELDS = ('status', 'location', 'depot')
+
+# set while the posts of the signals are left to the caller, see `ChargeAllocationManager`
+posts_deferred = ContextVar('posts_deferred', default=False)
+
+
+def related_model(model, name):
+    return model._meta.get_field(name).related_model
+
+
+def has_field(model, name):
+    return any(field.name == name for field in model._meta.concrete_fields)
+
+
+def latest_first(events):
+    return events.order_by('-event_date_time', '-pk')
+
+
+def address_keys():
+    """The garrison and port an IP address is unique in; a missing port counts as one."""
+    return {'address_garrison': Coalesce('location__garrison', 'depot__garrison'),
+            'address_port': Coalesce('port_number', 0)}
+
+
+def split_amount(amount, charge_ids):
+    """Split `amount` evenly over `charge_ids`, the remainder on the first of them.
+
+    Returns {charge_id: amount}.
+    """
+    if not charge_ids:
+        return {}
+    share, remainder = divmod(amount or 0, len(charge_ids))
+    shares = dict.fromkeys(charge_ids, share)
+    shares[charge_ids[0]] += remainder
+    return shares
+
+
+def shortfall_messages(shortfalls):
+    return [f'سهم {charge} از قیمت خرید بیش از {available} ریال مانده آن است.'
+            for charge, available in shortfalls]
+
+
+class EquipmentQuerySet(GarrisonScopedQuerySet):
+    """Equipment rows, whose current state follows their `History`, see `Stores.signals`."""
+
+    def refresh_current_state(self):
+        """Copy the status, location and date of the latest event of each row.
+
+        The latest event is read through the index on (equipment,
+        event_date_time), for all the rows in one UPDATE. A location leaves
+        the depot. Rows without events keep the status and location entered
+        by hand, which the first event moves to the `initial_` fields and
+        deleting the last one puts back. Returns the number of rows with events.
+        """
+        history = related_model(self.model, 'history')
+        latest = latest_first(history._base_manager.filter(equipment=OuterRef('pk')))
+        with transaction.atomic(using=self.db):
+            self.filter(Exists(latest), last_event_date__isnull=True).update(
+                initial_status=F('status'), initial_location=F('location'),
+                initial_depot=F('depot'))
+            tracked = self.filter(Exists(latest)).update(
+                status=Subquery(latest.values('status')[:1]),
+                location=Subquery(latest.values('location')[:1]),
+                depot=None,
+                last_event_date=Subquery(latest.values('event_date_time')[:1]))
+            untracked = self.filter(~Exists(latest), last_event_date__isnull=False)
+            untracked.filter(
+                Q(initial_location__isnull=False) | Q(initial_depot__isnull=False)).update(
+                status=F('initial_status'), location=F('initial_location'),
+                depot=F('initial_depot'))
+            untracked.update(last_event_date=None)
+        return tracked
+
+    def state_on(self, date):
+        """The rows which existed at the end of `date`, with their state then.
+
+        Annotates `status_on`, `location_on`, `depot_on` and `garrison_on`,
+        the garrison of the location or of the depot. They come from the
+        latest event up to `date`, read through the index on (equipment,
+        event_date_time); else from the latest `EquipmentSnapshot` taken by
+        then, which holds the events before it; else from the state entered
+        by hand. A row exists from its `buy_date`, or its first event.
+        """
+        end = local_midnight(date + datetime.timedelta(days=1))
+        history = related_model(self.model, 'history')
+        snapshot_model = related_model(self.model, 'snapshots')
+        events = history._base_manager.filter(
+            equipment=OuterRef('pk'), event_date_time__lt=end)
+        sources = [latest_first(events)]
+        snapshot_date = snapshot_model.objects.latest_date(date)
+        if snapshot_date is not None:
+            # the snapshot holds the events up to its end
+            after = local_midnight(snapshot_date + datetime.timedelta(days=1))
+            sources = [latest_first(events.filter(event_date_time__gte=after)),
+                       snapshot_model._base_manager.filter(
+                           equipment=OuterRef('pk'), date=snapshot_date)]
+
+        def state(name):
+            # an event, which has no depot, leaves the depot
+            whens = [When(Exists(source), then=Subquery(source.values(name)[:1])
+                          if has_field(source.model, name) else None)
+                     for source in sources]
+            whens.append(When(last_event_date__isnull=True, then=F(name)))
+            return Case(*whens, default=F(f'initial_{name}'), output_field=IntegerField())
+
+        queryset = self.annotate(existed=Exists(events)).filter(
+            Q(buy_date__lte=date) | Q(buy_date__isnull=True, created__lt=end)
+            | Q(existed=True))
+        queryset = queryset.annotate(**{f'{name}_on': state(name) for name in STATE_FIELDS})
+        locations = related_model(self.model, 'location')._base_manager.filter(
+            pk=OuterRef('location_on'))
+        depots = related_model(self.model, 'depot')._base_manager.filter(
+            pk=OuterRef('depot_on'))
+        return queryset.annotate(garrison_on=Coalesce(
+            Subquery(locations.values('garrison')[:1]),
+            Subquery(depots.values('garrison')[:1]), output_field=IntegerField()))
+
+    def state_on_for_user(self, date, user):
+        """`state_on`, down to the rows which were in the garrison of `user` then."""
+        queryset = self.state_on(date)
+        if user.is_superuser:
+            return queryset
+        garrison_id = getattr(user, 'garrison_id', None)
+        if garrison_id is None:
+            return queryset.none()
+        return queryset.filter(garrison_on=garrison_id)
+
+    def address_conflicts(self):
+        """The (garrison, ip_integer, port, count) of the IP:port pairs used more than once.
+
+        One aggregate grouped by the pair and the garrison.
+        """
+        return self.filter(ip_integer__isnull=False).annotate(**address_keys()).values(
+            'address_garrison', 'ip_integer', 'address_port').annotate(
+                count=Count('pk')).filter(count__gt=1).order_by(
+                    'address_garrison', 'ip_integer', 'address_port')
+
+    def in_address_conflict(self):
+        """The rows sharing their IP:port with another row of their garrison.
+
+        Each row looks the others up through the index on (ip_integer, port_number).
+        """
+        keys = address_keys()
+        others = self.model._base_manager.annotate(**keys).filter(
+            ip_integer=OuterRef('ip_integer'), address_port=OuterRef('address_port'),
+            address_garrison=OuterRef('address_garrison')).exclude(pk=OuterRef('pk'))
+        return self.filter(ip_integer__isnull=False).annotate(**keys).filter(Exists(others))
+
+
+class EquipmentSnapshotManager(models.Manager):
+    """The state of every equipment at the end of some days, for `state_on` to start from.
+
+    Taken by the take_equipment_snapshot command, e.g. every night. Saving or
+    deleting an event discards the snapshots from its day on, see
+    `Stores.signals`.
+    """
+
+    def latest_date(self, date):
+        return self.filter(date__lte=date).aggregate(latest=Max('date'))['latest']
+
+    def take(self, date, chunk_size=2000):
+        """Store the state of every equipment at the end of `date`. Returns the row count."""
+        equipment = related_model(self.model, 'equipment')
+        count = 0
+        with transaction.atomic(using=self.db):
+            self.filter(date=date).delete()
+            states = equipment.objects.state_on(date).values_list(
+                'pk', 'status_on', 'location_on', 'depot_on').iterator(chunk_size)
+            while True:
+                chunk = list(islice(states, chunk_size))
+                if not chunk:
+                    return count
+                self.bulk_create([
+                    self.model(date=date, equipment_id=pk, status_id=status_id,
+                               location_id=location_id, depot_id=depot_id)
+                    for pk, status_id, location_id, depot_id in chunk])
+                count += len(chunk)
+
+    def discard_from(self, *moments):
+        """Delete the snapshots which an event at any of `moments` made stale."""
+        moments = [moment for moment in moments if moment is not None]
+        if moments:
+            self.filter(date__gte=timezone.localdate(min(moments))).delete()
+
+
+class ChargeAllocationManager(models.Manager):
+    """Split the price of each equipment over its charges, and total the parts per charge.
+
+    Saving an equipment or changing its charges allocates its price again and
+    posts the differences to `Charge.spent`, see `Stores.signals`. Bulk
+    changes bypass the signals and need a rebuild.
+    """
+
+    def charge_model(self):
+        return related_model(self.model, 'charge')
+
+    def charge_ids(self, equipment_ids=None):
+        """Map each equipment to its charge ids, in the order `split_amount` takes them."""
+        through = related_model(self.model, 'equipment').charges.through
+        rows = through.objects.order_by('equipment_id', 'charge_id')
+        if equipment_ids is not None:
+            rows = rows.filter(equipment_id__in=equipment_ids)
+        charge_ids = {}
+        for equipment_id, charge_id in rows.values_list('equipment_id', 'charge_id'):
+            charge_ids.setdefault(equipment_id, []).append(charge_id)
+        return charge_ids
+
+    def current(self, equipment_id):
+        return dict(self.filter(equipment_id=equipment_id).values_list('charge_id', 'amount'))
+
+    def post_spent(self, differences):
+        # in the order of the ids, so that two posts do not wait for each other
+        for charge_id, difference in sorted(differences.items()):
+            if difference:
+                self.charge_model()._base_manager.filter(pk=charge_id).update(
+                    spent=F('spent') + difference)
+
+    @contextmanager
+    def deferred(self):
+        """Skip the posts of the signals, e.g. while a form saves the amount then the charges.
+
+        The caller posts the equipment once its charges are all saved.
+        """
+        token = posts_deferred.set(True)
+        try:
+            yield
+        finally:
+            posts_deferred.reset(token)
+
+    def is_deferred(self):
+        return posts_deferred.get()
+
+    def post(self, equipment_id):
+        """Allocate the price of an equipment again and post the differences.
+
+        The charges whose share grows are locked first, and a ValidationError
+        is raised if one of them can not pay it: `shortfalls` only checks the
+        form, before a concurrent save or a bulk change may have spent them.
+        """
+        equipment = related_model(self.model, 'equipment')
+        with transaction.atomic(using=self.db):
+            amount = equipment._base_manager.filter(pk=equipment_id).values_list(
+                'amount', flat=True).first()
+            shares = split_amount(amount, self.charge_ids([equipment_id]).get(equipment_id, []))
+            current = self.current(equipment_id)
+            if shares == current:
+                return
+            grown = [charge_id for charge_id, share in shares.items()
+                     if share > current.get(charge_id, 0)]
+            charges = self.charge_model()._base_manager.select_for_update().filter(
+                pk__in=grown).order_by('pk')
+            shortfalls = [(charge, charge.remaining + current.get(charge.pk, 0))
+                          for charge in charges
+                          if shares[charge.pk] > charge.remaining + current.get(charge.pk, 0)]
+            if shortfalls:
+                raise ValidationError(shortfall_messages(shortfalls))
+            self.filter(equipment_id=equipment_id).exclude(charge_id__in=shares).delete()
+            for charge_id, share in shares.items():
+                if current.get(charge_id) != share:
+                    self.update_or_create(charge_id=charge_id, equipment_id=equipment_id,
+                                          defaults={'amount': share})
+            self.post_spent({charge_id: shares.get(charge_id, 0) - current.get(charge_id, 0)
+                             for charge_id in {*shares, *current}})
+
+    def unpost(self, equipment_id):
+        """Take back the allocations of an equipment about to be deleted."""
+        with transaction.atomic(using=self.db):
+            current = self.current(equipment_id)
+            self.filter(equipment_id=equipment_id).delete()
+            self.post_spent({charge_id: -amount for charge_id, amount in current.items()})
+
+    def shortfalls(self, equipment, amount, charges):
+        """The (charge, available amount) of the `charges` which can not pay their share.
+
+        Checked against the cached `Charge.spent`, less what `equipment` takes
+        from each charge already, before its new `amount` and `charges` are saved.
+        """
+        charges = sorted(charges, key=lambda charge: charge.pk)
+        shares = split_amount(amount, [charge.pk for charge in charges])
+        current = self.current(equipment.pk) if equipment.pk else {}
+        return [(charge, charge.remaining + current.get(charge.pk, 0)) for charge in charges
+                if shares[charge.pk] > charge.remaining + current.get(charge.pk, 0)]
+
+    def rebuild(self):
+        """Allocate the price of every equipment again, and total `Charge.spent`.
+
+        The totals are written by one UPDATE from an aggregate grouped by charge.
+        """
+        equipment = related_model(self.model, 'equipment')
+        amounts = dict(equipment._base_manager.values_list('pk', 'amount'))
+        allocations = [
+            self.model(equipment_id=equipment_id, charge_id=charge_id, amount=share)
+            for equipment_id, charge_ids in self.charge_ids().items()
+            for charge_id, share in split_amount(amounts[equipment_id], charge_ids).items()]
+        totals = self.filter(charge=OuterRef('pk')).order_by().values('charge').annotate(
+            total=Sum('amount')).values('total')
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            self.bulk_create(allocations, batch_size=1000)
+            self.charge_model()._base_manager.update(spent=Coalesce(Subquery(totals), 0))
+        return len(allocations)
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipment',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='تاریخ و زمان درج'),
+        ),
+        migrations.AlterField(
+            model_name='equipment',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True, verbose_name='تاریخ و ز مان بروز رسانی'),
+        ),
+        migrations.AlterField(
+            model_name='history',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='تاریخ و زمان درج'),
+        ),
+        migrations.AlterField(
+            model_name='history',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True, verbose_name='تاریخ و ز مان بروز رسانی'),
+        ),
+    ]
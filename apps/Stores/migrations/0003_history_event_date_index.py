@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Stores', '0002_jalali_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='history',
+            name='event_date_time',
+            field=models.DateTimeField(db_index=True, verbose_name='تاریخ و زمان رویداد'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.1.14 on 2026-10-18 19:08
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+
+def fill_current_state(apps, schema_editor):
+    Equipment = apps.get_model('Stores', 'Equipment')
+    History = apps.get_model('Stores', 'History')
+    latest = History.objects.filter(equipment=OuterRef('pk')).order_by(
+        '-event_date_time', '-pk')
+    Equipment.objects.filter(Exists(latest)).update(
+        status=Subquery(latest.values('status')[:1]),
+        location=Subquery(latest.values('location')[:1]),
+        depot=None,
+        last_event_date=Subquery(latest.values('event_date_time')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Stores', '0003_history_event_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='last_event_date',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='تاریخ آخرین رویداد'),
+        ),
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['equipment', 'event_date_time'], name='Stores_hist_equipme_72a09e_idx'),
+        ),
+        migrations.RunPython(fill_current_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.1.14 on 2026-10-18 19:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Garrisons', '0004_report_job'),
+        ('BasicInformations', '0003_search_index_content_type'),
+        ('Stores', '0004_equipment_current_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='initial_depot',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Stores.depot', verbose_name='انبار اولیه'),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='initial_location',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Garrisons.location', verbose_name='مکان اولیه'),
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='initial_status',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='BasicInformations.statusequipment', verbose_name='وضعیت اولیه'),
+        ),
+        migrations.CreateModel(
+            name='EquipmentSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='تاریخ')),
+                ('depot', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Stores.depot', verbose_name='انبار')),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='Stores.equipment', verbose_name='کالا')),
+                ('location', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Garrisons.location', verbose_name='مکان')),
+                ('status', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='BasicInformations.statusequipment', verbose_name='وضعیت')),
+            ],
+            options={
+                'verbose_name': 'وضعیت روزانه کالا',
+                'verbose_name_plural': 'وضعیت روزانه تجهیزات',
+                'unique_together': {('date', 'equipment')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.1.14 on 2026-10-18 19:16
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+from apps.Stores.managers import split_amount
+
+
+def fill_allocations(apps, schema_editor):
+    Equipment = apps.get_model('Stores', 'Equipment')
+    Charge = apps.get_model('Stores', 'Charge')
+    ChargeAllocation = apps.get_model('Stores', 'ChargeAllocation')
+    amounts = dict(Equipment.objects.values_list('pk', 'amount'))
+    charge_ids = {}
+    for equipment_id, charge_id in Equipment.charges.through.objects.order_by(
+            'equipment_id', 'charge_id').values_list('equipment_id', 'charge_id'):
+        charge_ids.setdefault(equipment_id, []).append(charge_id)
+    ChargeAllocation.objects.bulk_create([
+        ChargeAllocation(equipment_id=equipment_id, charge_id=charge_id, amount=share)
+        for equipment_id, ids in charge_ids.items()
+        for charge_id, share in split_amount(amounts[equipment_id], ids).items()
+    ], batch_size=1000)
+    totals = ChargeAllocation.objects.filter(charge=OuterRef('pk')).order_by().values(
+        'charge').annotate(total=Sum('amount')).values('total')
+    Charge.objects.update(spent=Coalesce(Subquery(totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Stores', '0005_equipment_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='charge',
+            name='spent',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='هزینه شده به ریال'),
+        ),
+        migrations.CreateModel(
+            name='ChargeAllocation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='مبلغ به ریال')),
+                ('charge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='Stores.charge', verbose_name='اعتبار')),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='Stores.equipment', verbose_name='کالا')),
+            ],
+            options={
+                'verbose_name': 'هزینه از اعتبار',
+                'verbose_name_plural': 'هزینه ها از اعتبارات',
+                'unique_together': {('charge', 'equipment')},
+            },
+        ),
+        migrations.RunPython(fill_allocations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.14 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+from apps.Stores.network import ip_integer
+
+
+def fill_ip_integers(apps, schema_editor):
+    Equipment = apps.get_model('Stores', 'Equipment')
+    equipments = list(Equipment.objects.exclude(ip_address__isnull=True).exclude(
+        ip_address='').only('pk', 'ip_address'))
+    for equipment in equipments:
+        equipment.ip_integer = ip_integer(equipment.ip_address)
+    Equipment.objects.bulk_update(equipments, ['ip_integer'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Stores', '0006_charge_allocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='ip_integer',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='آدرس IP به عدد'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['ip_integer', 'port_number'], name='Stores_equi_ip_inte_347bd7_idx'),
+        ),
+        migrations.RunPython(fill_ip_integers, migrations.RunPython.noop),
+    ]
@@ -6,8 +6,12 @@ from django.db.models import Q
 from django.utils import timezone
 from jalali_date import datetime2jalali
 
+from apps.Garrisons.managers import GarrisonScopedQuerySet
 from apps.Garrisons.models import Garrison, Location, Owner, Personal
 
+from .managers import ChargeAllocationManager, EquipmentQuerySet, EquipmentSnapshotManager
+from .network import ip_integer, ip_text
+
 numeric = RegexValidator(r'^[0-9+]', 'فقط عدد وارد کنید.')
 ip_ic = RegexValidator(r'^[0-9.+]', 'فقط عدد و نقطه مجاز است.')
 
@@ -23,10 +27,16 @@ class Charge(models.Model):
                                  on_delete=models.CASCADE)
     receive_date = models.DateField(verbose_name='تاریخ دریافت')
     description = models.TextField(null=True, blank=True, verbose_name='توضیحات تکمیلی')
+    # the total of its `ChargeAllocation`s, kept in step by `Stores.signals`
+    spent = models.BigIntegerField(default=0, editable=False, verbose_name='هزینه شده به ریال')
     created = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')
     updated = models.DateTimeField(verbose_name='تاریخ و ز مان بروز رسانی', auto_now=True)
     pass
 
+    garrison_path = 'garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('name', 'amount')
+
     class Meta:
         verbose_name = 'اعتبار'
         verbose_name_plural = 'اعتبارات'
@@ -34,6 +44,16 @@ class Charge(models.Model):
     def __str__(self):
         return '{0} - {1} ریال'.format(self.name, str(self.amount))
 
+    @property
+    def remaining(self):
+        return self.amount - self.spent
+
+    def clean(self):
+        super().clean()
+        if self.amount is not None and self.amount < self.spent:
+            raise ValidationError({'amount': 'تا کنون {0} ریال از این اعتبار هزینه شده است.'
+                                   .format(self.spent)})
+
 
 class Shop(models.Model):
     name = models.CharField(
@@ -60,6 +80,8 @@ class Shop(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, blank=True, verbose_name='تاریخ و ز مان بروز رسانی')
 
+    str_fields = ('name',)
+
     class Meta:
         verbose_name = 'فروشگاه'
         verbose_name_plural = 'فروشگاه ها'
@@ -80,6 +102,10 @@ class Depot(models.Model):
     updated = models.DateTimeField(
         auto_now=True, null=True, blank=True, verbose_name='تاریخ و ز مان بروز رسانی')
 
+    garrison_path = 'garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('name',)
+
     class Meta:
         verbose_name = 'انبار'
         verbose_name_plural = 'انبار ها'
@@ -147,6 +173,9 @@ class Equipment(models.Model):
                                   validators=[ip_ic])
     port_number = models.IntegerField(null=True, blank=True, verbose_name='شماره پورت',
                                       validators=[MinValueValidator(1), ])
+    # `ip_address` as a number, for the range queries of a network
+    ip_integer = models.BigIntegerField(null=True, blank=True, editable=False,
+                                        verbose_name='آدرس IP به عدد')
     location = models.ForeignKey(
         Location, on_delete=models.SET_NULL, null=True, blank=True,
         verbose_name='مکان تحویل گیرنده')
@@ -157,13 +186,39 @@ class Equipment(models.Model):
     level_info = models.BooleanField(
         verbose_name='شامل اطلاعات طبقه بندی شده')
     description = models.TextField(null=True, blank=True, verbose_name='توضیحات تکمیلی')
-    created = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')
+    # of the latest `History` event, which also sets `status` and `location`
+    last_event_date = models.DateTimeField(
+        null=True, blank=True, editable=False, db_index=True,
+        verbose_name='تاریخ آخرین رویداد')
+    # entered by hand, kept when the first `History` event replaces them
+    initial_status = models.ForeignKey(
+        'BasicInformations.StatusEquipment', on_delete=models.SET_NULL, null=True,
+        blank=True, editable=False, related_name='+', verbose_name='وضعیت اولیه')
+    initial_location = models.ForeignKey(
+        Location, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name='+', verbose_name='مکان اولیه')
+    initial_depot = models.ForeignKey(
+        'Depot', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name='+', verbose_name='انبار اولیه')
+    created = models.DateTimeField(auto_now_add=True, db_index=True,
+                                   verbose_name='تاریخ و زمان درج')
     updated = models.DateTimeField(
-        auto_now=True, null=True, blank=True, verbose_name='تاریخ و ز مان بروز رسانی')
+        auto_now=True, null=True, blank=True, db_index=True,
+        verbose_name='تاریخ و ز مان بروز رسانی')
+
+    garrison_path = 'location__garrison'
+    objects = EquipmentQuerySet.as_manager()
+    str_fields = ('name',)
+    search_document_fields = ('name', 'brand', 'model', 'serial_number', 'sis_number',
+                              'lp_number', 'deploy_location', 'imperialistic', 'ip_address',
+                              'port_number', 'amount', 'description_equipment', 'description')
 
     class Meta:
         verbose_name = 'کالا'
         verbose_name_plural = 'تجهیزات'
+        indexes = [
+            models.Index(fields=['ip_integer', 'port_number']),
+        ]
 
     def clean(self):
         super().clean()
@@ -176,14 +231,26 @@ class Equipment(models.Model):
             if self.buy_date > self.imperialistic_date:
                 raise ValidationError(
                     "تاریخ بهره‌برداری نباید همزمان یا پیش از تاریخ خرید باشد.")
+        if self.ip_address and ip_integer(self.ip_address) is None:
+            raise ValidationError(
+                {'ip_address': 'آدرس IP معتبر نیست، مانند 192.168.1.10 وارد کنید.'})
 
     def __str__(self):
         return '{0}'.format(self.name)
 
+    def save(self, *args, **kwargs):
+        self.set_ip_integer()
+        super().save(*args, **kwargs)
+
+    def set_ip_integer(self):
+        self.ip_integer = ip_integer(self.ip_address)
+        if self.ip_integer is not None:
+            self.ip_address = ip_text(self.ip_integer)
+
 
 class History(models.Model):
     event_date_time = models.DateTimeField(
-        verbose_name='تاریخ و زمان رویداد')
+        verbose_name='تاریخ و زمان رویداد', db_index=True)
     precept_number = models.CharField(
         max_length=60, verbose_name='شماره امریه', unique=True)
     equipment = models.ForeignKey(
@@ -195,13 +262,22 @@ class History(models.Model):
         blank=False, verbose_name='وضعیت')
     location = models.ForeignKey(
         Location, verbose_name="مکان مقصد", on_delete=models.CASCADE)
-    created = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ و زمان درج')
+    created = models.DateTimeField(auto_now_add=True, db_index=True,
+                                   verbose_name='تاریخ و زمان درج')
     updated = models.DateTimeField(
-        auto_now=True, null=True, blank=True, verbose_name='تاریخ و ز مان بروز رسانی')
+        auto_now=True, null=True, blank=True, db_index=True,
+        verbose_name='تاریخ و ز مان بروز رسانی')
+
+    garrison_path = 'equipment__location__garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
+    str_fields = ('event_date_time',)
 
     class Meta:
         verbose_name = 'تاریخچه'
         verbose_name_plural = 'تاریخچه ها'
+        indexes = [
+            models.Index(fields=['equipment', 'event_date_time']),
+        ]
 
     def __str__(self):
         return '{0}'.format(datetime2jalali(
@@ -211,3 +287,51 @@ class History(models.Model):
         if not self.event_date_time:
             raise ValidationError("تاریخ و زمان رویداد را کامل وارد کنید.")
         return super().clean()
+
+
+class EquipmentSnapshot(models.Model):
+    """The state of an equipment at the end of `date`, see `EquipmentQuerySet.state_on`."""
+    date = models.DateField(verbose_name='تاریخ')
+    equipment = models.ForeignKey(
+        'Equipment', on_delete=models.CASCADE, related_name='snapshots',
+        verbose_name='کالا')
+    status = models.ForeignKey(
+        'BasicInformations.StatusEquipment', on_delete=models.SET_NULL, null=True,
+        related_name='+', verbose_name='وضعیت')
+    location = models.ForeignKey(
+        Location, on_delete=models.SET_NULL, null=True, related_name='+',
+        verbose_name='مکان')
+    depot = models.ForeignKey(
+        'Depot', on_delete=models.SET_NULL, null=True, related_name='+',
+        verbose_name='انبار')
+
+    objects = EquipmentSnapshotManager()
+
+    class Meta:
+        verbose_name = 'وضعیت روزانه کالا'
+        verbose_name_plural = 'وضعیت روزانه تجهیزات'
+        unique_together = [('date', 'equipment')]
+
+    def __str__(self):
+        return '{0} - {1}'.format(self.equipment_id, self.date)
+
+
+class ChargeAllocation(models.Model):
+    """The part of the price of an equipment paid from one of its charges."""
+    charge = models.ForeignKey(
+        'Charge', on_delete=models.CASCADE, related_name='allocations',
+        verbose_name='اعتبار')
+    equipment = models.ForeignKey(
+        'Equipment', on_delete=models.CASCADE, related_name='allocations',
+        verbose_name='کالا')
+    amount = models.IntegerField(verbose_name='مبلغ به ریال')
+
+    objects = ChargeAllocationManager()
+
+    class Meta:
+        verbose_name = 'هزینه از اعتبار'
+        verbose_name_plural = 'هزینه ها از اعتبارات'
+        unique_together = [('charge', 'equipment')]
+
+    def __str__(self):
+        return '{0} ریال از اعتبار {1}'.format(self.amount, self.charge_id)
@@ -0,0 +1,28 @@
+import ipaddress
+
+
+def ip_integer(text):
+    """The IPv4 address `text` as an integer, or None when it is not one."""
+    try:
+        return int(ipaddress.IPv4Address((text or '').strip()))
+    except ValueError:
+        return None
+
+
+def ip_text(value):
+    return str(ipaddress.IPv4Address(value))
+
+
+def network_range(term):
+    """The first and last addresses, as integers, of an address or a CIDR network.
+
+    e.g. '10.2.0.0/16', '10.2.3.4'. Returns None for another term.
+    """
+    term = (term or '').strip()
+    if '.' not in term:
+        return None
+    try:
+        network = ipaddress.IPv4Network(term, strict=False)
+    except ValueError:
+        return None
+    return int(network.network_address), int(network.broadcast_address)
@@ -0,0 +1,78 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Charge, ChargeAllocation, Equipment, EquipmentSnapshot, History
+
+
+def refresh_equipment(*equipment_ids):
+    equipment_ids = {pk for pk in equipment_ids if pk is not None}
+    if equipment_ids:
+        Equipment.objects.filter(pk__in=equipment_ids).refresh_current_state()
+
+
+@receiver(pre_save, sender=History)
+def _remember_equipment(sender, instance, raw, **kwargs):
+    instance._previous_equipment_id = instance._previous_event_date_time = None
+    if instance.pk and not raw:
+        previous = sender._base_manager.filter(pk=instance.pk).values_list(
+            'equipment_id', 'event_date_time').first()
+        if previous is not None:
+            instance._previous_equipment_id, instance._previous_event_date_time = previous
+
+
+@receiver(post_save, sender=History)
+def _update_equipment_state(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    refresh_equipment(instance.equipment_id, instance._previous_equipment_id)
+    EquipmentSnapshot.objects.discard_from(
+        instance.event_date_time, instance._previous_event_date_time)
+
+
+@receiver(post_delete, sender=History)
+def _revert_equipment_state(sender, instance, **kwargs):
+    refresh_equipment(instance.equipment_id)
+    EquipmentSnapshot.objects.discard_from(instance.event_date_time)
+
+
+@receiver(post_save, sender=Equipment)
+def _allocate_price(sender, instance, raw, **kwargs):
+    if raw or ChargeAllocation.objects.is_deferred():
+        return
+    ChargeAllocation.objects.post(instance.pk)
+
+
+@receiver(pre_delete, sender=Equipment)
+def _unallocate_price(sender, instance, **kwargs):
+    ChargeAllocation.objects.unpost(instance.pk)
+
+
+@receiver(m2m_changed, sender=Equipment.charges.through)
+def _reallocate_charges(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_equipment_ids = list(
+            instance.equipment_set.values_list('pk', flat=True))
+    if (action not in ('post_add', 'post_remove', 'post_clear')
+            or ChargeAllocation.objects.is_deferred()):
+        return
+    if not reverse:
+        equipment_ids = [instance.pk]
+    elif action == 'post_clear':
+        equipment_ids = instance._cleared_equipment_ids
+    else:
+        equipment_ids = pk_set
+    for equipment_id in sorted(equipment_ids):
+        ChargeAllocation.objects.post(equipment_id)
+
+
+@receiver(pre_delete, sender=Charge)
+def _remember_charge_equipment(sender, instance, **kwargs):
+    instance._allocated_equipment_ids = list(
+        instance.allocations.values_list('equipment_id', flat=True))
+
+
+@receiver(post_delete, sender=Charge)
+def _reallocate_charge_equipment(sender, instance, **kwargs):
+    # their price is split over the charges left
+    for equipment_id in sorted(instance._allocated_equipment_ids):
+        ChargeAllocation.objects.post(equipment_id)
@@ -1,3 +1,353 @@
-from django.test import TestCase
+import datetime
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.accounts.models import User
+from apps.BasicInformations.jalali import local_midnight
+from apps.BasicInformations.models import StatusEquipment
+from apps.BasicInformations.testing import ChangelistQueriesMixin, RowFactory
+from apps.Garrisons.models import Garrison, Location
+
+from . import models
+from .managers import split_amount
+from .network import ip_integer, ip_text, network_range
+
+
+def equipment_factory():
+    """A factory whose equipment is bought with one charge that never runs out."""
+    factory = RowFactory()
+    factory.share(factory.create(models.Charge, amount=10 ** 12))
+    return factory
+
+
+class SplitAmountTests(SimpleTestCase):
+
+    def test_even(self):
+        self.assertEqual(split_amount(900, [1, 2, 3]), {1: 300, 2: 300, 3: 300})
+
+    def test_remainder_on_the_first_charge(self):
+        self.assertEqual(split_amount(1001, [4, 7, 9]), {4: 335, 7: 333, 9: 333})
+
+    def test_no_charges_or_amount(self):
+        self.assertEqual(split_amount(1000, []), {})
+        self.assertEqual(split_amount(None, [1, 2]), {1: 0, 2: 0})
+
+
+class NetworkTests(SimpleTestCase):
+
+    def test_ip_integer(self):
+        self.assertEqual(ip_integer(' 10.0.0.1 '), 167772161)
+        self.assertEqual(ip_text(167772161), '10.0.0.1')
+        for text in (None, '', '10.0.0', '10.0.0.256', 'printer'):
+            self.assertIsNone(ip_integer(text))
+
+    def test_network_range(self):
+        self.assertEqual(network_range('10.2.0.0/16'),
+                         (ip_integer('10.2.0.0'), ip_integer('10.2.255.255')))
+        self.assertEqual(network_range('10.2.3.4'), (ip_integer('10.2.3.4'),) * 2)
+        # a host address with a prefix stands for its network
+        self.assertEqual(network_range('10.2.3.4/24'),
+                         (ip_integer('10.2.3.0'), ip_integer('10.2.3.255')))
+
+    def test_other_terms(self):
+        for term in (None, '', '1024', 'printer', '10.2.3/8', '10.2.3.4/33'):
+            self.assertIsNone(network_range(term))
+
+
+class ChargeAllocationTests(TestCase):
+
+    def setUp(self):
+        self.factory = RowFactory()
+        self.first, self.second = self.factory.create_rows(models.Charge, 2, amount=10000)
+
+    def spent(self):
+        return [charge.spent for charge in models.Charge.objects.order_by('pk')]
+
+    def test_posted_with_the_equipment(self):
+        equipment = self.factory.create(models.Equipment, amount=1001,
+                                        charges=[self.first, self.second])
+        self.assertEqual(self.spent(), [501, 500])
+
+        equipment.amount = 3000
+        equipment.save()
+        self.assertEqual(self.spent(), [1500, 1500])
+
+        equipment.charges.remove(self.first)
+        self.assertEqual(self.spent(), [0, 3000])
+
+        equipment.delete()
+        self.assertEqual(self.spent(), [0, 0])
+        self.assertFalse(models.ChargeAllocation.objects.exists())
+
+    def test_rebuild(self):
+        self.factory.create(models.Equipment, amount=1001, charges=[self.first, self.second])
+        self.factory.create(models.Equipment, amount=99, charges=[self.second])
+        posted = self.spent()
+        models.Charge.objects.update(spent=0)
+        models.ChargeAllocation.objects.all().delete()
+
+        self.assertEqual(models.ChargeAllocation.objects.rebuild(), 3)
+        self.assertEqual(self.spent(), posted)
+        self.assertEqual(posted, [501, 599])
+
+    def test_shortfalls(self):
+        equipment = self.factory.create(models.Equipment, amount=8000, charges=[self.first])
+        self.first.refresh_from_db()
+        # the share the equipment already takes is available to it again
+        self.assertEqual(models.ChargeAllocation.objects.shortfalls(
+            equipment, 10000, [self.first]), [])
+        self.assertEqual(models.ChargeAllocation.objects.shortfalls(
+            equipment, 10001, [self.first]), [(self.first, 10000)])
+
+    def test_overspending_is_refused_when_posted(self):
+        equipment = self.factory.create(models.Equipment, amount=8000, charges=[self.first])
+        # the check of the form is bypassed, or was made before another save
+        with self.assertRaisesMessage(ValidationError, 'بیش از 2000 ریال'), \
+                transaction.atomic():
+            self.factory.create(models.Equipment, amount=5000, charges=[self.first])
+        with self.assertRaises(ValidationError), transaction.atomic():
+            equipment.amount = 12000
+            equipment.save()
+        self.assertEqual(self.spent(), [8000, 0])
+        self.assertEqual(models.ChargeAllocation.objects.count(), 1)
+
+        # its own share is available to the equipment, and a smaller share always posts
+        equipment.amount = 10000
+        equipment.save()
+        models.Charge.objects.update(amount=1000)
+        equipment.amount = 9000
+        equipment.save()
+        self.assertEqual(self.spent(), [9000, 0])
+
+    def test_admin_posts_once_the_charges_are_saved(self):
+        equipment = self.factory.create(models.Equipment, amount=8000, charges=[self.first])
+        equipment.amount = 16000
+        # the first charge alone can not pay the new amount
+        form = mock.Mock(instance=equipment)
+        form.save_m2m.side_effect = lambda: equipment.charges.set([self.first, self.second])
+        request = RequestFactory().post('/')
+        request.user = mock.Mock()
+        model_admin = admin.site._registry[models.Equipment]
+        model_admin.save_model(request, equipment, form, True)
+        self.assertEqual(self.spent(), [8000, 0])
+        model_admin.save_related(request, form, [], True)
+        self.assertEqual(self.spent(), [8000, 8000])
+
+
+class CurrentStateTests(TestCase):
+
+    def setUp(self):
+        self.factory = equipment_factory()
+        self.office, self.lab = self.factory.create_rows(Location, 2)
+        self.new, self.broken = self.factory.create_rows(StatusEquipment, 2)
+        self.depot = self.factory.create(models.Depot)
+        self.equipment = self.factory.create(
+            models.Equipment, location=None, depot=self.depot, status=self.new)
+
+    def move(self, hour, location, status, equipment=None):
+        return self.factory.create(
+            models.History, equipment=equipment or self.equipment, location=location,
+            status=status, event_date_time=self.at(hour))
+
+    def at(self, hour):
+        return local_midnight(datetime.date(2021, 5, 1)) + datetime.timedelta(hours=hour)
+
+    def assertState(self, location, status, depot=None, last_event_date=None,
+                    equipment=None):
+        equipment = equipment or self.equipment
+        equipment.refresh_from_db()
+        self.assertEqual(
+            (equipment.location, equipment.status, equipment.depot, equipment.last_event_date),
+            (location, status, depot, last_event_date))
+
+    def test_first_event_keeps_the_state_entered_by_hand(self):
+        self.move(10, self.office, self.broken)
+        self.assertState(self.office, self.broken, last_event_date=self.at(10))
+        self.assertEqual(
+            (self.equipment.initial_location, self.equipment.initial_status,
+             self.equipment.initial_depot), (None, self.new, self.depot))
+
+        # a later event does not overwrite it
+        self.move(12, self.lab, self.new)
+        self.equipment.refresh_from_db()
+        self.assertEqual((self.equipment.initial_status, self.equipment.initial_depot),
+                         (self.new, self.depot))
+
+    def test_latest_event(self):
+        self.move(12, self.lab, self.new)
+        first = self.move(10, self.office, self.broken)
+        self.assertState(self.lab, self.new, last_event_date=self.at(12))
+        # on the same time, the event saved last
+        self.move(12, self.office, self.broken)
+        self.assertState(self.office, self.broken, last_event_date=self.at(12))
+
+        first.event_date_time = self.at(13)
+        first.save()
+        self.assertState(self.office, self.broken, last_event_date=self.at(13))
+
+    def test_event_moved_to_another_equipment(self):
+        other = self.factory.create(models.Equipment, location=self.lab, depot=None,
+                                    status=self.new)
+        event = self.move(10, self.office, self.broken)
+        event.equipment = other
+        event.save()
+        self.assertState(None, self.new, self.depot)
+        self.assertState(self.office, self.broken, last_event_date=self.at(10),
+                         equipment=other)
+
+    def test_deleting_the_events_restores_the_state_entered_by_hand(self):
+        first = self.move(10, self.office, self.broken)
+        last = self.move(12, self.lab, self.new)
+        last.delete()
+        self.assertState(self.office, self.broken, last_event_date=self.at(10))
+        first.delete()
+        self.assertState(None, self.new, self.depot)
+
+    def test_queries_do_not_grow_with_the_rows(self):
+        equipments = models.Equipment.objects.all()
+        with CaptureQueriesContext(connection) as one:
+            self.assertEqual(equipments.refresh_current_state(), 0)
+        for _ in range(10):
+            self.move(10, self.office, self.broken,
+                      equipment=self.factory.create(models.Equipment))
+        with self.assertNumQueries(len(one)):
+            self.assertEqual(equipments.refresh_current_state(), 10)
+
+    def test_rebuild_equipment_state(self):
+        self.move(10, self.office, self.broken)
+        models.Equipment.objects.update(location=self.lab, status=self.new)
+        output = StringIO()
+        call_command('rebuild_equipment_state', self.equipment.pk, stdout=output)
+        self.assertEqual(output.getvalue().strip(),
+                         'Updated 1 equipments from their latest history event.')
+        self.assertState(self.office, self.broken, last_event_date=self.at(10))
+
+
+class StateOnTests(TestCase):
+
+    def setUp(self):
+        self.factory = RowFactory()
+        self.store, self.office, self.lab = self.factory.create_rows(Location, 3)
+        self.new, self.broken = self.factory.create_rows(StatusEquipment, 2)
+        self.equipment = self.factory.create(
+            models.Equipment, buy_date=datetime.date(2021, 3, 1), location=self.store,
+            status=self.new, depot=None)
+
+    def move(self, day, location, status):
+        return self.factory.create(
+            models.History, equipment=self.equipment, location=location, status=status,
+            event_date_time=local_midnight(day) + datetime.timedelta(hours=10))
+
+    def state(self, day):
+        return models.Equipment.objects.state_on(day).filter(pk=self.equipment.pk).values_list(
+            'location_on', 'status_on').first()
+
+    def test_state_on(self):
+        self.move(datetime.date(2021, 3, 10), self.office, self.broken)
+        self.move(datetime.date(2021, 3, 20), self.lab, self.new)
+
+        self.assertIsNone(self.state(datetime.date(2021, 2, 28)))
+        self.assertEqual(self.state(datetime.date(2021, 3, 9)), (self.store.pk, self.new.pk))
+        self.assertEqual(self.state(datetime.date(2021, 3, 10)),
+                         (self.office.pk, self.broken.pk))
+        self.assertEqual(self.state(datetime.date(2021, 4, 1)), (self.lab.pk, self.new.pk))
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.location, self.lab)
+
+    def test_from_a_snapshot(self):
+        self.move(datetime.date(2021, 3, 10), self.office, self.broken)
+        models.EquipmentSnapshot.objects.take(datetime.date(2021, 3, 15))
+        self.assertEqual(self.state(datetime.date(2021, 3, 16)),
+                         (self.office.pk, self.broken.pk))
+
+        # an event before the snapshot makes it stale
+        self.move(datetime.date(2021, 3, 12), self.lab, self.new)
+        self.assertFalse(models.EquipmentSnapshot.objects.exists())
+        self.assertEqual(self.state(datetime.date(2021, 3, 16)), (self.lab.pk, self.new.pk))
+
+
+class NetworkSearchTests(TestCase):
+
+    def test_cidr_search(self):
+        factory = equipment_factory()
+        user = User.objects.create_superuser('admin', password='password',
+                                             has_valid_password=True)
+        inside = [factory.create(models.Equipment, ip_address=f'10.1.2.{host}')
+                  for host in (0, 77, 255)]
+        for address in ('10.1.3.0', '10.1.1.255', None):
+            factory.create(models.Equipment, ip_address=address)
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('admin:Stores_equipment_changelist'),
+                                   {'q': '10.1.2.0/24'})
+        self.assertCountEqual(response.context['cl'].result_list, inside)
+
+
+class AddressConflictTests(TestCase):
+
+    def setUp(self):
+        self.factory = equipment_factory()
+        self.first, self.second = self.factory.create_rows(Garrison, 2)
+        self.office = self.factory.create(Location, garrison=self.first)
+        self.other_office = self.factory.create(Location, garrison=self.second)
+        self.depot = self.factory.create(models.Depot, garrison=self.first)
+        # a missing port is port 0, and a depot is in its garrison as an office is
+        self.no_port = [self.equipment('10.0.0.1', None, location=self.office),
+                        self.equipment('10.0.0.1', 0, depot=self.depot)]
+        self.same_port = [self.equipment('10.0.0.2', 80, location=self.office),
+                          self.equipment('10.0.0.2', 80, depot=self.depot)]
+        self.equipment('10.0.0.1', None, location=self.other_office)
+        self.equipment('10.0.0.1', 8080, location=self.office)
+        self.equipment('10.0.0.3', 80, location=self.office)
+        self.equipment(None, None, location=self.office)
+        self.equipment(None, None, location=self.office)
+
+    def equipment(self, ip_address, port_number, location=None, depot=None):
+        return self.factory.create(models.Equipment, ip_address=ip_address,
+                                   port_number=port_number, location=location, depot=depot)
+
+    def test_address_conflicts(self):
+        self.assertEqual(list(models.Equipment.objects.address_conflicts()), [
+            {'address_garrison': self.first.pk, 'ip_integer': ip_integer('10.0.0.1'),
+             'address_port': 0, 'count': 2},
+            {'address_garrison': self.first.pk, 'ip_integer': ip_integer('10.0.0.2'),
+             'address_port': 80, 'count': 2},
+        ])
+
+    def test_in_address_conflict(self):
+        self.assertCountEqual(models.Equipment.objects.in_address_conflict(),
+                              self.no_port + self.same_port)
+
+    def test_admin(self):
+        user = User.objects.create_superuser('admin', password='password',
+                                             has_valid_password=True)
+        self.client.force_login(user)
+        changelist = reverse('admin:Stores_equipment_changelist')
+
+        response = self.client.get(reverse('admin:Stores_equipment_address_conflicts'))
+        self.assertEqual([(row['garrison'], row['ip_address'], row['count'])
+                          for row in response.context['conflicts']],
+                         [(str(self.first), '10.0.0.1', 2), (str(self.first), '10.0.0.2', 2)])
+        self.assertContains(response, f'{changelist}?q=10.0.0.2&amp;ip_conflict=yes')
+
+        response = self.client.get(changelist, {'ip_conflict': 'yes'})
+        self.assertCountEqual(response.context['cl'].result_list,
+                              self.no_port + self.same_port)
+        response = self.client.get(changelist, {'ip_conflict': 'yes', 'q': '10.0.0.2'})
+        self.assertCountEqual(response.context['cl'].result_list, self.same_port)
+
+
+class ChangelistQueriesTests(ChangelistQueriesMixin, TestCase):
+    app_labels = ('Stores',)
+
+    def setUp(self):
+        super().setUp()
+        self.factory = equipment_factory()
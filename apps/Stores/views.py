@@ -3,5 +3,8 @@ from django.shortcuts import get_object_or_404, render
 from . import models
 
 def equipment_to_pdf(request, eq_id):
+    equipment = get_object_or_404(models.Equipment.objects.for_user(request.user), id=eq_id)
+    history = equipment.history.select_related('location').order_by(
+        'event_date_time', 'pk')
     return render(request, 'reports/equipment-to-pdf.html',
-                  {'equipment': get_object_or_404(models.Equipment, id=eq_id)})
+                  {'equipment': equipment, 'history': history})
@@ -1,11 +1,18 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Permission
+from django.db.models import Min
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
-from jalali_date import datetime2jalali
 from jalali_date.admin import ModelAdminJalaliMixin
 
+from apps.BasicInformations.filters import JalaliDateHierarchyFilter
+from apps.BasicInformations.jalali import jalali_months
+from apps.BasicInformations.mixins import (ExportAdminMixin, JalaliColumnsAdminMixin,
+                                          KeysetPaginationAdminMixin,
+                                          QueryPlanAdminMixin, jalali_column)
+
 from . import models
 from . import views as custom_views
 
@@ -55,10 +62,31 @@ class CustomUserAdmin(ModelAdminJalaliMixin, UserAdmin):
         return request.user.is_superuser
 
 
+class EventMonthFilter(JalaliDateHierarchyFilter):
+    """Narrow the log to one Jalali month, an index range on `event_date`.
+
+    The months are listed from the oldest entry kept in the table, read off
+    the index, instead of counting the whole log like the parent filter.
+    """
+    title = _('event date')
+    parameter_name = 'event_month'
+    field_name = 'event_date'
+
+    def lookups(self, request, model_admin):
+        oldest = model_admin.model.objects.aggregate(oldest=Min('event_date'))['oldest']
+        if oldest is None:
+            return []
+        months = jalali_months(timezone.localtime(oldest).date(), timezone.localdate())
+        return [(self.format_period(period), self.format_period(period))
+                for period in reversed(list(months))]
+
+
 @admin.register(models.CustomLogger)
-class CustomLoggerAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+class CustomLoggerAdmin(ExportAdminMixin, KeysetPaginationAdminMixin, JalaliColumnsAdminMixin,
+                        ModelAdminJalaliMixin, admin.ModelAdmin):
     # date_hierarchy = 'event_date'
-    list_filter = ['event_date', 'action_flag', 'user']
+    list_filter = [EventMonthFilter, 'action_flag', 'user']
+    ordering = ['-event_date']
     search_fields = ['action', 'user', ]
     list_display = ['event_date_jalali', 'user',
                     'action', 'event_link', 'object_description']
@@ -77,20 +105,13 @@ class CustomLoggerAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     #     return request.user.is_superuser
 
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        qs = qs.filter(user__garrison=request.user.garrison).distinct(
-        ) if qs.count() >= 1 else qs
+        return super().get_queryset(request).for_user(request.user)
 
     def object_description(self, obj):
         return obj
     object_description.short_description = _('event description')
 
-    def event_date_jalali(self, obj):
-        return datetime2jalali(obj.event_date).strftime('%y/%m/%d _ %H:%M:%S')
-    event_date_jalali.short_description = _('event date')
-    event_date_jalali.admin_order_field = 'event_date'
+    event_date_jalali = jalali_column('event_date', _('event date'), '%y/%m/%d _ %H:%M:%S')
 
     def event_link(self, obj):
         if obj.object_link:
@@ -111,10 +132,11 @@ def perm_str(self):
 
 
 Permission.__str__ = perm_str
+Permission.str_fields = ('codename', 'content_type')
 
 
 @admin.register(Permission)
-class CustomPermissionAdmin(admin.ModelAdmin):
+class CustomPermissionAdmin(QueryPlanAdminMixin, admin.ModelAdmin):
     def has_add_permission(self, request):
         return request.user.is_superuser  # False
 
@@ -126,3 +148,25 @@ class CustomPermissionAdmin(admin.ModelAdmin):
 
     def has_view_permission(self, request, obj=None):
         return request.user.is_superuser
+
+
+@admin.register(models.LogArchive)
+class LogArchiveAdmin(admin.ModelAdmin):
+    list_display = ['month_jalali', 'rows', 'file', 'updated']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def has_view_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def month_jalali(self, obj):
+        return obj.month_to_jalali()
+    month_jalali.short_description = _('Month')
+    month_jalali.admin_order_field = 'month'
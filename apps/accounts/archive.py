@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+
+import jdatetime
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from apps.BasicInformations.jalali import (date_range_q, jalali_months,
+                                           jalali_period_range)
+
+from .models import CustomLogger, LogArchive, log_archive_storage
+
+ARCHIVED_FIELDS = ('id', 'event_date', 'user', 'action', 'action_flag',
+                   'object_type', 'object_link', 'garrison_id')
+
+
+def expired_months(keep_months):
+    """The Jalali months of the log older than the last `keep_months` months."""
+    oldest = CustomLogger.objects.aggregate(oldest=Min('event_date'))['oldest']
+    if oldest is None:
+        return []
+    today = jdatetime.date.fromgregorian(date=timezone.localdate())
+    year, month = divmod(today.year * 12 + today.month - 1 - keep_months, 12)
+    cutoff = jdatetime.date(year, month + 1, 1).togregorian()
+    return [period for period in jalali_months(timezone.localtime(oldest).date(), cutoff)
+            if jalali_period_range(*period)[1] <= cutoff]
+
+
+def archive_month(year, month, chunk_size=2000):
+    """Append the log rows of a Jalali month to its archive and delete them.
+
+    The size of the archive is saved with the delete, and every run first cuts
+    the file back to it. What a run failing before its delete committed had
+    appended is dropped, so its rows, which are still in the table, are not
+    archived twice. Returns the number of rows moved.
+    """
+    start, end = jalali_period_range(year, month)
+    rows = CustomLogger.objects.filter(
+        date_range_q(CustomLogger._meta.get_field('event_date'), start, end))
+    # rows logged while the file is written stay for the next run
+    last_pk = rows.aggregate(last=Max('pk'))['last']
+    if last_pk is None:
+        return 0
+    rows = rows.filter(pk__lte=last_pk)
+
+    archive = LogArchive.objects.filter(month=start).first() or LogArchive(
+        month=start, file=f'custom-logger-{year:04d}-{month:02d}.jsonl.gz')
+    storage = log_archive_storage()
+    os.makedirs(storage.location, exist_ok=True)
+    moved = 0
+    with open(storage.path(archive.file.name), 'ab') as raw:
+        if raw.tell() < archive.size:
+            raise ValueError(f'{raw.name} is shorter than the {archive.size} bytes archived.')
+        raw.truncate(archive.size)
+        # gzip members can be concatenated, a later run appends its own
+        with gzip.open(raw, 'at', encoding='utf-8') as output:
+            for row in rows.order_by('pk').values(*ARCHIVED_FIELDS).iterator(chunk_size):
+                output.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+                output.write('\n')
+                moved += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+        size = raw.seek(0, os.SEEK_END)
+
+    with transaction.atomic():
+        rows.delete()
+        archive.rows += moved
+        archive.size = size
+        archive.save()
+    return moved
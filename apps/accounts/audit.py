@@ -0,0 +1,134 @@
+import atexit
+import logging
+import threading
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, connection, transaction
+
+from .models import CustomLogger
+
+logger = logging.getLogger(__name__)
+
+# the user of the request being handled, see `middleware.AuditUserMiddleware`
+request_user = ContextVar('request_user', default=None)
+
+
+class AuditWriter:
+    """Queue `CustomLogger` rows in process and insert them in batches.
+
+    A daemon thread writes the queue every `interval` seconds, or as soon as
+    `batch_size` rows are waiting. Whatever is left is written when the
+    process exits. At most `max_pending` rows are kept, the oldest are
+    dropped first, and a batch failing `max_retries` times in a row is
+    written row by row, so that the rows which can never be written are
+    dropped instead of blocking the others.
+    """
+
+    def __init__(self, batch_size, interval, max_pending, max_retries):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.pending = []
+        self.dropped = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def log(self, **fields):
+        # render the labels now, in the language of the request
+        fields['action'] = str(fields['action'])
+        fields['user'] = str(fields['user'])
+        record = CustomLogger(**fields)
+        with self.lock:
+            self.pending.append(record)
+            self.trim()
+            full = len(self.pending) >= self.batch_size
+            if self.thread is None:
+                self.start()
+        if full:
+            self.wakeup.set()
+
+    def trim(self):
+        # called with the lock held
+        overflow = len(self.pending) - self.max_pending
+        if overflow > 0:
+            del self.pending[:overflow]
+            self.dropped += overflow
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='audit-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not write the audit log, retrying.')
+            finally:
+                connection.close()
+
+    def close(self):
+        try:
+            self.flush(retry=False)
+        except Exception:
+            logger.exception('Lost %d audit log rows at exit.', len(self.pending))
+
+    def flush(self, retry=True):
+        with self.lock:
+            records, self.pending = self.pending, []
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.error('Dropped %d audit log rows, the queue was full.', dropped)
+        if not records:
+            return
+        try:
+            CustomLogger.objects.bulk_create(records, batch_size=self.batch_size)
+        except Exception:
+            self.failures += 1
+            if retry and self.failures < self.max_retries:
+                self.requeue(records)
+                raise
+            self.failures = 0
+            self.write_each(records)
+        else:
+            self.failures = 0
+
+    def write_each(self, records):
+        for index, record in enumerate(records):
+            try:
+                CustomLogger.objects.bulk_create([record])
+            except (InterfaceError, OperationalError):
+                # the database is out of reach, not the row at fault
+                self.requeue(records[index:])
+                raise
+            except Exception:
+                logger.exception('Dropped an audit log row that could not be written: %s',
+                                 record.action)
+
+    def requeue(self, records):
+        with self.lock:
+            self.pending[:0] = records
+            self.trim()
+
+
+writer = AuditWriter(settings.AUDIT_BATCH_SIZE, settings.AUDIT_FLUSH_INTERVAL,
+                     settings.AUDIT_MAX_PENDING, settings.AUDIT_MAX_RETRIES)
+
+
+def audit_log(**fields):
+    """Record a `CustomLogger` row once the current transaction commits.
+
+    The row is kept with the garrison of `user`, when it is a `User`.
+    """
+    fields.setdefault('garrison_id', getattr(fields.get('user'), 'garrison_id', None))
+    if not settings.AUDIT_ASYNC:
+        transaction.on_commit(lambda: CustomLogger.objects.create(**fields))
+        return
+    transaction.on_commit(lambda: writer.log(**fields))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.accounts.archive import archive_month, expired_months
+
+
+class Command(BaseCommand):
+    help = 'Move the log entries of expired months to gzipped archives on disk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int,
+                            default=settings.LOG_RETENTION_MONTHS,
+                            help='Jalali months kept in the database, '
+                                 'besides the current one')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the months which would be archived')
+
+    def handle(self, *args, **options):
+        archived = 0
+        for year, month in expired_months(options['keep_months']):
+            if options['dry_run']:
+                self.stdout.write(f'{year:04d}/{month:02d}')
+                continue
+            moved = archive_month(year, month)
+            if moved:
+                archived += 1
+                self.stdout.write(f'{year:04d}/{month:02d}: archived {moved} entries.')
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Archived {archived} months.'))
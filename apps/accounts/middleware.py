@@ -1,42 +1,53 @@
 import re
-from datetime import timedelta
+from functools import lru_cache
 
 from django.conf import settings
 from django.contrib.auth.middleware import AuthenticationMiddleware
 from django.http import HttpResponse
 from django.shortcuts import redirect
-from django.urls import resolve, reverse
-from django.utils import timezone
+from django.urls import reverse
 from django.utils.deprecation import MiddlewareMixin
 from django.utils.translation import gettext_lazy as _
 
-from .models import LoginFailedIP
+from .audit import request_user
+from .throttling import BLOCKED, RELEASED, get_login_throttle
 from .utils import get_client_ip
 
-IGNORE_PATHS = [re.compile(settings.LOGIN_URL)]
+# one alternation, matched once per path instead of once per pattern
+IGNORE_PATHS = re.compile('|'.join(
+    f'(?:{url})' for url in [settings.LOGIN_URL, *getattr(
+        settings, 'LOGIN_REQUIRED_IGNORE_PATHS', [])]))
 
-IGNORE_PATHS += [
-    re.compile(url) for url in getattr(settings, 'LOGIN_REQUIRED_IGNORE_PATHS', [])
-]
+IGNORE_VIEW_NAMES = frozenset(
+    getattr(settings, 'LOGIN_REQUIRED_IGNORE_VIEW_NAMES', []))
 
-IGNORE_VIEW_NAMES = [
-    name for name in getattr(settings, 'LOGIN_REQUIRED_IGNORE_VIEW_NAMES', [])
-]
+
+@lru_cache(maxsize=None)
+def is_public_view(view_name):
+    """Whether anonymous users may reach every path of `view_name`.
+
+    Keyed on the view names of the URLconf, which are few and fixed. The
+    paths are not cached: any client can send as many as it likes.
+    """
+    return view_name in IGNORE_VIEW_NAMES
+
+
+def is_public(path, view_name):
+    """Whether anonymous users may reach `path`, resolved to `view_name`."""
+    return is_public_view(view_name) or IGNORE_PATHS.match(path) is not None
 
 
 class LoginRequiredMiddleware(AuthenticationMiddleware):
     def process_view(self, request, view_func, view_args, view_kwargs):
-        path = request.path
+        # public paths are let through without loading the session's user
+        if is_public(request.path, request.resolver_match.view_name):
+            return
         if request.user.is_authenticated:
             return
 
-        resolver = resolve(path)
-        views = ((name == resolver.view_name) for name in IGNORE_VIEW_NAMES)
-
-        if not any(views) and not any(url.match(path) for url in IGNORE_PATHS):
-            return redirect('{}?next={}'.format(
-                reverse('admin:login'),
-                request.path))
+        return redirect('{}?next={}'.format(
+            reverse('admin:login'),
+            request.path))
 
 
 class PasswordValidationMiddleware(AuthenticationMiddleware):
@@ -50,6 +61,17 @@ class PasswordValidationMiddleware(AuthenticationMiddleware):
                         request.path))
 
 
+class AuditUserMiddleware(MiddlewareMixin):
+    """Keep `request.user`, loaded once, for the log rows written by the request."""
+
+    def process_request(self, request):
+        request_user.set(request.user)
+
+    def process_response(self, request, response):
+        request_user.set(None)
+        return response
+
+
 class SessionExpiry(MiddlewareMixin):
     """ Set the session expiry according to settings """
 
@@ -61,28 +83,21 @@ class SessionExpiry(MiddlewareMixin):
 
 class LoginFailedMiddleware(MiddlewareMixin):
     def process_request(self, request):
-        ip = get_client_ip(request)
-        if LoginFailedIP.objects.filter(ip=ip).exists():
-            offender = LoginFailedIP.objects.get(ip=ip)
-
-            if offender.tries > settings.LOGIN_FAILED_LIMIT:
-                mul = offender.tries - settings.LOGIN_FAILED_LIMIT
-                base_cooldown = settings.LOGIN_FAILED_COOLDOWN
-                stop = mul * base_cooldown
-                cooldown = offender.last_try + timedelta(seconds=stop)
-                cl, now = cooldown.timestamp(), timezone.now().timestamp()
-                if timezone.now() <= cooldown:
-                    # TODO: This response should be translated
-                    return HttpResponse(
-                        _('<center dir="rtl" style="margin-top: 30px;">'
-                          "Too many attempts please try again after "
-                          "<span id=\"cooldown-error\">{cooldown}</span>"
-                          '</center>'
-                          "<script>window.onload = function () {{var minute = {cooldown};var sec = 60;setInterval(function () {{document.getElementById('cooldown-error').innerHTML = minute-1 + ':' + sec;sec--;if (sec == 00) {{minute--;if(minute==00){{ window.location = window.location.href; }}sec = 60;}}}}, 1000);}};</script>").format(
-                            cooldown=settings.LOGIN_FAILED_COOLDOWN // 60))
-                else:
-                    offender.tries -= 1
-                    offender.save()
-                    return redirect(reverse('admin:login'))
+        username = None
+        if request.method == 'POST' and request.path.startswith(settings.LOGIN_URL):
+            username = request.POST.get('username')
+
+        state = get_login_throttle().check(get_client_ip(request), username)
+        if state == BLOCKED:
+            # TODO: This response should be translated
+            return HttpResponse(
+                _('<center dir="rtl" style="margin-top: 30px;">'
+                  "Too many attempts please try again after "
+                  "<span id=\"cooldown-error\">{cooldown}</span>"
+                  '</center>'
+                  "<script>window.onload = function () {{var minute = {cooldown};var sec = 60;setInterval(function () {{document.getElementById('cooldown-error').innerHTML = minute-1 + ':' + sec;sec--;if (sec == 00) {{minute--;if(minute==00){{ window.location = window.location.href; }}sec = 60;}}}}, 1000);}};</script>").format(
+                    cooldown=settings.LOGIN_FAILED_COOLDOWN // 60))
+        if state == RELEASED:
+            return redirect(reverse('admin:login'))
 
         return None
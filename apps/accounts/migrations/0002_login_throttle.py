@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loginfailedip',
+            name='username',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=150, verbose_name='Username'),
+        ),
+        migrations.AlterField(
+            model_name='loginfailedip',
+            name='ip',
+            field=models.GenericIPAddressField(blank=True, db_index=True, null=True, verbose_name='IP'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.1.14 on 2026-10-18 18:17
+
+import apps.accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_login_throttle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Month')),
+                ('file', models.FileField(storage=apps.accounts.models.log_archive_storage, upload_to='', verbose_name='File')),
+                ('rows', models.PositiveIntegerField(default=0, verbose_name='Rows')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+            ],
+            options={
+                'verbose_name': 'Log Archive',
+                'verbose_name_plural': 'Log Archives',
+                'ordering': ('-month',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='customlogger',
+            index=models.Index(fields=['event_date'], name='accounts_cu_event_d_a78aff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customlogger',
+            index=models.Index(fields=['action_flag', 'event_date'], name='accounts_cu_action__3057f5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customlogger',
+            index=models.Index(fields=['user', 'event_date'], name='accounts_cu_user_16d161_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.14 on 2026-10-18 19:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Garrisons', '0004_report_job'),
+        ('accounts', '0003_log_indexes_and_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customlogger',
+            name='garrison',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Garrisons.garrison', verbose_name='Garrison'),
+        ),
+        migrations.AddIndex(
+            model_name='customlogger',
+            index=models.Index(fields=['garrison', 'event_date'], name='accounts_cu_garriso_82bdb2_idx'),
+        ),
+    ]
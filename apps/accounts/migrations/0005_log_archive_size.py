@@ -0,0 +1,27 @@
+# Generated by Django 3.1.14 on 2026-10-18 20:11
+
+from django.db import migrations, models
+
+
+def fill_sizes(apps, schema_editor):
+    # the archives written so far are taken as complete
+    LogArchive = apps.get_model('accounts', 'LogArchive')
+    for archive in LogArchive.objects.all():
+        if archive.file.storage.exists(archive.file.name):
+            archive.size = archive.file.size
+            archive.save(update_fields=['size'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_log_garrison'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logarchive',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Size'),
+        ),
+        migrations.RunPython(fill_sizes, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,14 @@
 from django.contrib.auth.models import AbstractUser
+from django.conf import settings
 from django.contrib.sessions.models import Session
 from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from jalali_date import datetime2jalali
 
+from apps.BasicInformations.jalali import format_jalali
+from apps.Garrisons.managers import GarrisonScopedQuerySet
 from apps.Garrisons.models import Soldier
 
 ADDITION = 1
@@ -22,7 +25,10 @@ ACTION_FLAG_CHOICES = (
 
 
 class LoginFailedIP(models.Model):
-    ip = models.GenericIPAddressField(_("IP"), protocol="both", unpack_ipv4=False)
+    ip = models.GenericIPAddressField(_("IP"), protocol="both", unpack_ipv4=False,
+                                      null=True, blank=True, db_index=True)
+    username = models.CharField(_("Username"), max_length=150, blank=True, default='',
+                                db_index=True)
     tries = models.PositiveSmallIntegerField(_("Try Count"))
     last_try = models.DateTimeField(_("Last Try"), auto_now=True)
 
@@ -45,6 +51,8 @@ class User(AbstractUser):
                                  null=True, blank=True,
                                  related_name='admin_user', on_delete=models.SET_NULL)
 
+    str_fields = ('username', 'personal')
+
     def set_session_key(self, key):
         if self.last_session_key and not self.last_session_key == key:
             if Session.objects.filter(session_key=self.last_session_key).exists():
@@ -69,6 +77,8 @@ class UserPassword(models.Model):
     user = models.ForeignKey(User, verbose_name=_("User"), on_delete=models.CASCADE)
     password = models.CharField(_("Password"), max_length=100)
 
+    str_fields = ('user',)
+
     def __str__(self):
         """Unicode representation of UserPassword."""
         return f'{self.user}'
@@ -84,17 +94,59 @@ class CustomLogger(models.Model):
     # object_repr = models.CharField(_('object repr'), max_length=200)
     object_type = models.CharField(_("Object Type"), max_length=250, default="")
     object_link = models.CharField(_("Object URL"), max_length=250, null=True, blank=True)
+    # the garrison of the user, when the event is done by one
+    garrison = models.ForeignKey("Garrisons.Garrison", verbose_name=_("Garrison"),
+                                 null=True, blank=True, db_index=False,
+                                 related_name='+', on_delete=models.SET_NULL)
+
+    str_fields = ('event_date', 'user', 'action')
+    garrison_path = 'garrison'
+    objects = GarrisonScopedQuerySet.as_manager()
 
     class Meta:
         verbose_name = _("Log Entry")
         verbose_name_plural = _("Log Entries")
         # ordering = ('-action_time',)
+        indexes = [
+            models.Index(fields=['event_date']),
+            models.Index(fields=['action_flag', 'event_date']),
+            models.Index(fields=['user', 'event_date']),
+            models.Index(fields=['garrison', 'event_date']),
+        ]
 
     def event_date_to_jalali(self):
-        return datetime2jalali(self.event_date).strftime('%y/%m/%d _ %H:%M:%S')
+        return format_jalali(self.event_date, '%y/%m/%d _ %H:%M:%S')
 
     def __str__(self):
         date = self.event_date_to_jalali()
         string = _("date: {event_date}, user: {user}, action: {action}")
         return string.format(event_date=date,
                              user=self.user, action=self.action)
+
+
+def log_archive_storage():
+    return FileSystemStorage(location=settings.LOG_ARCHIVE_ROOT)
+
+
+class LogArchive(models.Model):
+    """One Jalali month of `CustomLogger` rows, moved to a gzipped JSON lines file."""
+    month = models.DateField(_("Month"), unique=True)
+    file = models.FileField(_("File"), storage=log_archive_storage)
+    rows = models.PositiveIntegerField(_("Rows"), default=0)
+    # bytes of the file written by the archive runs that committed
+    size = models.PositiveBigIntegerField(_("Size"), default=0, editable=False)
+    created = models.DateTimeField(_("Created"), auto_now_add=True)
+    updated = models.DateTimeField(_("Updated"), auto_now=True)
+
+    str_fields = ('month',)
+
+    class Meta:
+        verbose_name = _("Log Archive")
+        verbose_name_plural = _("Log Archives")
+        ordering = ('-month',)
+
+    def month_to_jalali(self):
+        return format_jalali(self.month, '%Y/%m')
+
+    def __str__(self):
+        return self.month_to_jalali()
@@ -14,7 +14,9 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 from jalali_date import datetime2jalali
 
-from .models import LOGINLOGOUT, CustomLogger, LoginFailedIP, User
+from .audit import audit_log, request_user
+from .models import LOGINLOGOUT, User
+from .throttling import get_login_throttle
 from .utils import get_client_ip
 
 
@@ -27,9 +29,7 @@ def _concurrent_logins(sender, **kwargs):
     ip = get_client_ip(request)
 
     # delete previous login failed for this user
-    if LoginFailedIP.objects.filter(ip=ip).exists():
-        offender = LoginFailedIP.objects.get(ip=ip)
-        offender.delete()
+    get_login_throttle().reset(ip, user.get_username())
 
     # convert last last_logout to jalali_date
     last_logout = ''
@@ -56,7 +56,7 @@ def _concurrent_logins(sender, **kwargs):
         user.set_session_key(request.session.session_key)
 
     # create log-entry for user login
-    CustomLogger.objects.create(user=user, action=_("logged in"), action_flag=LOGINLOGOUT)
+    audit_log(user=user, action=_("logged in"), action_flag=LOGINLOGOUT)
 
 
 @receiver(user_logged_out)
@@ -72,7 +72,7 @@ def _user_logged_out(sender, user, request, **kwargs):
         user.has_valid_password = False
 
     # create log-entry for user log out
-    CustomLogger.objects.create(
+    audit_log(
         user=user, action=_("logged out"),
         action_flag=LOGINLOGOUT)
 
@@ -81,28 +81,23 @@ def _user_logged_out(sender, user, request, **kwargs):
 def _user_login_failed_callback(sender, credentials, **kwargs):
     request = kwargs.get('request')
     req_ip = ''
-    # create or update LoginFailedIP object incase of login failed.
+    # count the failed try against the ip and the username
     if request is not None:
         req_ip = get_client_ip(request)
-        if LoginFailedIP.objects.filter(ip=req_ip).exists():
-            offender = LoginFailedIP.objects.get(ip=req_ip)
-            offender.tries += 1
-            offender.save()
-            if offender.tries > settings.LOGIN_FAILED_LIMIT:
-                messages.error(
-                    request,
-                    mark_safe(_("Too many attempts please try again after "
-                                "<span id=\"cooldown-error\">{cooldown}</span>"
-                                "<script>window.onload = function () {{var minute = {cooldown};var sec = 60;setInterval(function () {{document.getElementById('cooldown-error').innerHTML = minute-1 + ':' + sec;sec--;if (sec == 00) {{minute--;if(minute==00){{ window.location = window.location.href; }}sec = 60;}}}}, 1000);}};</script>").format(
-                        cooldown=settings.LOGIN_FAILED_COOLDOWN // 60)))
-        else:
-            LoginFailedIP.objects.create(ip=req_ip, tries=1)
+        tries = get_login_throttle().failed(req_ip, credentials.get('username'))
+        if tries > settings.LOGIN_FAILED_LIMIT:
+            messages.error(
+                request,
+                mark_safe(_("Too many attempts please try again after "
+                            "<span id=\"cooldown-error\">{cooldown}</span>"
+                            "<script>window.onload = function () {{var minute = {cooldown};var sec = 60;setInterval(function () {{document.getElementById('cooldown-error').innerHTML = minute-1 + ':' + sec;sec--;if (sec == 00) {{minute--;if(minute==00){{ window.location = window.location.href; }}sec = 60;}}}}, 1000);}};</script>").format(
+                    cooldown=settings.LOGIN_FAILED_COOLDOWN // 60)))
 
     # create log-entry for login failed
     message = _("ip: {req_ip} tries to log in.")
     user = _("Anonymous user")
-    CustomLogger.objects.create(action=message.format(req_ip=req_ip),
-                                user=user, action_flag=LOGINLOGOUT)
+    audit_log(action=message.format(req_ip=req_ip),
+              user=user, action_flag=LOGINLOGOUT)
 
 
 @receiver(post_save, sender=LogEntry)
@@ -110,7 +105,7 @@ def _logentry_capture(sender, instance, **kwargs):
     '''Create a log entry based on Django default LogEntry events'''
 
     action_dict = {1: _("Addition"), 2: _("Change"), 3: _("Deletion")}
-    user = User.objects.get(id=instance.user_id)
+    user = log_user(instance.user_id)
     action = action_dict[instance.action_flag]
     object_name = ""
 
@@ -126,6 +121,14 @@ def _logentry_capture(sender, instance, **kwargs):
             link = f'<a href="{obj.get_admin_url()}">{ct.name}</a>'
         return mark_safe(link)
 
-    CustomLogger.objects.create(action_flag=instance.action_flag, user=user,
-                                action=action, object_type=object_name,
-                                object_link=object_link(instance))
+    audit_log(action_flag=instance.action_flag, user=user,
+              action=action, object_type=object_name,
+              object_link=object_link(instance))
+
+
+def log_user(user_id):
+    '''The user `user_id`, the one of the request when it is already loaded'''
+    user = request_user.get()
+    if user is not None and user.is_authenticated and user.pk == user_id:
+        return user
+    return User.objects.select_related('personal').get(id=user_id)
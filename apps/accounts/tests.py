@@ -1,3 +1,274 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import jdatetime
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from apps.BasicInformations.testing import ChangelistQueriesMixin
+
+from . import models
+from .archive import archive_month
+from .audit import AuditWriter, request_user
+from .middleware import LoginRequiredMiddleware, is_public, is_public_view
+from .signals import log_user
+from .throttling import (BLOCKED, CacheLoginThrottle, DatabaseLoginThrottle,
+                         get_login_throttle)
+
+
+class LogUserTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = models.User.objects.create_user('user')
+        cls.other = models.User.objects.create_user('other')
+
+    def test_request_user_is_reused(self):
+        token = request_user.set(self.user)
+        self.addCleanup(request_user.reset, token)
+        with self.assertNumQueries(0):
+            self.assertIs(log_user(self.user.pk), self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(log_user(self.other.pk), self.other)
+
+    def test_without_request(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(str(log_user(self.user.pk)), 'user')
+
+
+class LoginRequiredTests(TestCase):
+
+    def process_view(self, path):
+        request = RequestFactory().get(path)
+        request.resolver_match = resolve(path)
+        request.user = SimpleLazyObject(lambda: self.fail('the user was loaded'))
+        return LoginRequiredMiddleware(lambda request: None).process_view(
+            request, request.resolver_match.func, (), {})
+
+    def test_public_views_do_not_load_the_user(self):
+        self.assertIsNone(self.process_view(reverse('admin:login')))
+        self.assertIsNone(self.process_view(reverse('captcha-image', args=['key'])))
+
+    def test_anonymous_users_are_sent_to_login(self):
+        path = reverse('guard:guardtablet_to_pdf', args=[1])
+        response = self.client.get(path)
+        self.assertRedirects(response, f"{reverse('admin:login')}?next={path}",
+                             fetch_redirect_response=False)
+
+    def test_paths(self):
+        # LOGIN_URL is exempt whatever view it resolves to
+        self.assertTrue(is_public('/admin/login/', 'accounts:change_password'))
+        self.assertFalse(is_public('/admin/', 'admin:index'))
+
+    def test_cache_is_bounded_by_the_view_names(self):
+        is_public_view.cache_clear()
+        for key in range(100):
+            path = reverse('captcha-image', args=[f'key{key}'])
+            self.assertTrue(is_public(path, resolve(path).view_name))
+        self.assertEqual(is_public_view.cache_info().currsize, 1)
+
+
+class AuditWriterTests(TransactionTestCase):
+
+    def setUp(self):
+        self.writer = AuditWriter(batch_size=3, interval=60, max_pending=5, max_retries=2)
+        self.writer.thread = mock.Mock()  # flushed by the tests instead
+
+    def log(self, *actions, **fields):
+        for action in actions:
+            self.writer.log(**{'action': action, 'user': 'user',
+                               'action_flag': models.ADDITION, **fields})
+
+    def assertWritten(self, *actions):
+        self.assertCountEqual(models.CustomLogger.objects.values_list('action', flat=True),
+                              actions)
+
+    def test_batches(self):
+        self.log('0', '1')
+        self.assertFalse(self.writer.wakeup.is_set())
+        self.log('2')
+        self.assertTrue(self.writer.wakeup.is_set())
+        with CaptureQueriesContext(connection) as queries:
+            self.writer.flush()
+        self.assertEqual(sum('INSERT' in query['sql'] for query in queries), 1)
+        self.assertWritten('0', '1', '2')
+        self.assertEqual(self.writer.pending, [])
+
+    def test_queue_is_capped(self):
+        self.log(*map(str, range(7)))
+        self.assertEqual(len(self.writer.pending), 5)
+        with self.assertLogs('apps.accounts.audit', 'ERROR') as logs:
+            self.writer.flush()
+        self.assertIn('Dropped 2 audit log rows', logs.output[0])
+        self.assertWritten('2', '3', '4', '5', '6')
+
+    def test_unreachable_database(self):
+        self.log('0', '1')
+        with mock.patch.object(models.CustomLogger.objects, 'bulk_create',
+                               side_effect=OperationalError):
+            for retry in range(3):
+                with self.assertRaises(OperationalError):
+                    self.writer.flush()
+                self.assertEqual(len(self.writer.pending), 2)
+        self.writer.flush()
+        self.assertWritten('0', '1')
+
+    def test_rows_that_cannot_be_written_are_dropped(self):
+        self.log('0')
+        self.log('bad', action_flag=None)
+        self.log('1')
+        with self.assertRaises(Exception):
+            self.writer.flush()
+        self.assertWritten()
+        with self.assertLogs('apps.accounts.audit', 'ERROR') as logs:
+            self.writer.flush()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('bad', logs.output[0])
+        self.assertWritten('0', '1')
+        self.assertEqual(self.writer.pending, [])
+
+    def test_flushed_at_exit(self):
+        self.writer.thread = None
+        with mock.patch('apps.accounts.audit.threading.Thread') as thread, \
+                mock.patch('apps.accounts.audit.atexit.register') as register:
+            self.log('0')
+            self.log('bad', action_flag=None)
+        thread.return_value.start.assert_called_once_with()
+        register.assert_called_once_with(self.writer.close)
+        # no retry is left at exit
+        with self.assertLogs('apps.accounts.audit', 'ERROR'):
+            self.writer.close()
+        self.assertWritten('0')
+
+
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        get_login_throttle.cache_clear()
+        self.addCleanup(get_login_throttle.cache_clear)
+
+    @override_settings(LOGIN_FAILED_CACHE='shared')
+    def test_shared_cache(self):
+        self.assertIsInstance(get_login_throttle(), CacheLoginThrottle)
+
+    @override_settings(LOGIN_FAILED_CACHE='default')
+    def test_local_cache_falls_back_to_the_database(self):
+        with self.assertLogs('apps.accounts.throttling', 'WARNING'):
+            throttle = get_login_throttle()
+        self.assertIsInstance(throttle, DatabaseLoginThrottle)
+
+    @override_settings(LOGIN_FAILED_LIMIT=2)
+    def test_blocked_after_the_limit(self):
+        throttle = DatabaseLoginThrottle()
+        for tries in range(1, 3):
+            self.assertEqual(throttle.failed('10.0.0.1', 'admin'), tries)
+            self.assertIsNone(throttle.check('10.0.0.1'))
+        throttle.failed('10.0.0.1', 'admin')
+        self.assertEqual(throttle.check('10.0.0.2', 'admin'), BLOCKED)
+        throttle.reset('10.0.0.1', 'admin')
+        self.assertIsNone(throttle.check('10.0.0.1', 'admin'))
+
+
+class ArchiveTests(TestCase):
+    # 1400/01 runs from 2021-03-21 to 2021-04-20
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archive_root = override_settings(LOG_ARCHIVE_ROOT=directory.name)
+        archive_root.enable()
+        self.addCleanup(archive_root.disable)
+
+    def log(self, *days):
+        return [models.CustomLogger.objects.create(
+            action='changed', user='user', action_flag=models.ADDITION,
+            event_date=timezone.make_aware(datetime.datetime(2021, 3, 20, 12) + days_after)).pk
+            for days_after in map(datetime.timedelta, days)]
+
+    def path(self, archive):
+        return models.log_archive_storage().path(archive.file.name)
+
+    def archived(self):
+        archive = models.LogArchive.objects.get(month=datetime.date(2021, 3, 21))
+        with gzip.open(self.path(archive), 'rt', encoding='utf-8') as rows:
+            return archive, [json.loads(row)['id'] for row in rows]
+
+    def test_archive_month(self):
+        before, = self.log(0)
+        moved = self.log(1, 15, 31)
+        after, = self.log(32)
+        self.assertEqual(archive_month(1400, 1), 3)
+        archive, archived = self.archived()
+        self.assertEqual(archived, moved)
+        self.assertEqual((archive.rows, archive.size),
+                         (3, models.log_archive_storage().size(archive.file.name)))
+        self.assertCountEqual(models.CustomLogger.objects.values_list('pk', flat=True),
+                              [before, after])
+        self.assertEqual(archive_month(1400, 1), 0)
+
+    def test_later_runs_append(self):
+        first = self.log(1, 2)
+        archive_month(1400, 1)
+        second = self.log(3)
+        self.assertEqual(archive_month(1400, 1), 1)
+        archive, archived = self.archived()
+        self.assertEqual(archived, first + second)
+        self.assertEqual(archive.rows, 3)
+
+    def test_failed_delete_is_not_archived_twice(self):
+        first = self.log(1)
+        archive_month(1400, 1)
+        second = self.log(2, 3)
+        with mock.patch('apps.accounts.archive.transaction.atomic',
+                        side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                archive_month(1400, 1)
+        self.assertEqual(models.CustomLogger.objects.count(), 2)
+
+        self.assertEqual(archive_month(1400, 1), 2)
+        archive, archived = self.archived()
+        self.assertEqual(archived, first + second)
+        self.assertEqual(archive.rows, 3)
+
+    def test_truncated_file(self):
+        self.log(1)
+        archive_month(1400, 1)
+        archive, archived = self.archived()
+        with open(self.path(archive), 'r+b') as output:
+            output.truncate(archive.size - 1)
+        self.log(2)
+        with self.assertRaises(ValueError):
+            archive_month(1400, 1)
+        self.assertEqual(models.CustomLogger.objects.count(), 1)
+
+    def test_archive_logs_command(self):
+        self.log(1, 2, 32)
+        # 1400/03 is the first month kept
+        today = jdatetime.date.fromgregorian(date=timezone.localdate())
+        months = today.year * 12 + today.month - (1400 * 12 + 3)
+
+        output = StringIO()
+        call_command('archive_logs', keep_months=months, dry_run=True, stdout=output)
+        self.assertEqual(output.getvalue().split(), ['1400/01', '1400/02'])
+        self.assertEqual(models.CustomLogger.objects.count(), 3)
+
+        output = StringIO()
+        call_command('archive_logs', keep_months=months, stdout=output)
+        self.assertEqual(output.getvalue().splitlines(), [
+            '1400/01: archived 2 entries.', '1400/02: archived 1 entries.',
+            'Archived 2 months.'])
+        self.assertFalse(models.CustomLogger.objects.exists())
+        self.assertEqual(models.LogArchive.objects.count(), 2)
+
+
+class ChangelistQueriesTests(ChangelistQueriesMixin, TestCase):
+    app_labels = ('accounts', 'auth')
@@ -0,0 +1,148 @@
+import logging
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.BasicInformations.checks import is_shared_cache
+
+from .models import LoginFailedIP
+
+logger = logging.getLogger(__name__)
+
+BLOCKED = 'blocked'
+RELEASED = 'released'
+
+
+class LoginThrottle:
+    """Count failed logins per IP and per username.
+
+    A key with more than LOGIN_FAILED_LIMIT tries is blocked for
+    (tries - LOGIN_FAILED_LIMIT) * LOGIN_FAILED_COOLDOWN seconds after its
+    last try. The first request after that forgives one try. Tries older
+    than LOGIN_FAILED_WINDOW are forgotten. Subclasses store the
+    (tries, last_try) of each key.
+    """
+
+    def keys(self, ip, username=None):
+        keys = [('ip', ip)] if ip else []
+        if username:
+            keys.append(('username', username))
+        return keys
+
+    def check(self, ip, username=None):
+        """BLOCKED, RELEASED when a cooldown just ended, or None."""
+        now = timezone.now()
+        released = None
+        for key, (tries, last_try) in self.get_many(self.keys(ip, username)).items():
+            if tries <= settings.LOGIN_FAILED_LIMIT:
+                continue
+            cooldown = timedelta(seconds=(
+                tries - settings.LOGIN_FAILED_LIMIT) * settings.LOGIN_FAILED_COOLDOWN)
+            if now <= last_try + cooldown:
+                return BLOCKED
+            self.set(key, tries - 1, now)
+            released = RELEASED
+        return released
+
+    def failed(self, ip, username=None):
+        """Count one more try and return the highest count of the keys."""
+        keys = self.keys(ip, username)
+        records = self.get_many(keys)
+        now = timezone.now()
+        highest = 0
+        for key in keys:
+            tries = records.get(key, (0, None))[0] + 1
+            self.set(key, tries, now)
+            highest = max(highest, tries)
+        return highest
+
+    def reset(self, ip, username=None):
+        self.delete_many(self.keys(ip, username))
+
+    def get_many(self, keys):
+        raise NotImplementedError
+
+    def set(self, key, tries, last_try):
+        raise NotImplementedError
+
+    def delete_many(self, keys):
+        raise NotImplementedError
+
+
+class CacheLoginThrottle(LoginThrottle):
+    """Keep the tries in the LOGIN_FAILED_CACHE cache, without touching the DB.
+
+    The cache has to be shared by the workers (file based, memcached, ...)
+    for the counts to hold across them, see `get_login_throttle`.
+    """
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or settings.LOGIN_FAILED_CACHE]
+
+    def cache_key(self, key):
+        kind, value = key
+        return 'login-failed:{}:{}'.format(kind, quote(value))
+
+    def get_many(self, keys):
+        cache_keys = {self.cache_key(key): key for key in keys}
+        return {cache_keys[cache_key]: record
+                for cache_key, record in self.cache.get_many(cache_keys).items()}
+
+    def set(self, key, tries, last_try):
+        self.cache.set(self.cache_key(key), (tries, last_try),
+                       settings.LOGIN_FAILED_WINDOW)
+
+    def delete_many(self, keys):
+        self.cache.delete_many([self.cache_key(key) for key in keys])
+
+
+class DatabaseLoginThrottle(LoginThrottle):
+    """Keep the tries in `LoginFailedIP`, one row per IP or per username."""
+
+    def lookup(self, key):
+        kind, value = key
+        if kind == 'ip':
+            return Q(ip=value, username='')
+        return Q(ip__isnull=True, username=value)
+
+    def rows(self, keys):
+        query = Q()
+        for key in keys:
+            query |= self.lookup(key)
+        return LoginFailedIP.objects.filter(query) if keys else LoginFailedIP.objects.none()
+
+    def get_many(self, keys):
+        since = timezone.now() - timedelta(seconds=settings.LOGIN_FAILED_WINDOW)
+        return {('ip', row.ip) if row.ip else ('username', row.username):
+                (row.tries, row.last_try)
+                for row in self.rows(keys).filter(last_try__gte=since)}
+
+    def set(self, key, tries, last_try):
+        kind, value = key
+        LoginFailedIP.objects.update_or_create(
+            ip=value if kind == 'ip' else None,
+            username='' if kind == 'ip' else value,
+            defaults={'tries': tries})
+
+    def delete_many(self, keys):
+        self.rows(keys).delete()
+
+
+@lru_cache(maxsize=None)
+def get_login_throttle():
+    """The LOGIN_FAILED_BACKEND, or the database when its cache is not shared."""
+    throttle_class = import_string(settings.LOGIN_FAILED_BACKEND)
+    if (issubclass(throttle_class, CacheLoginThrottle)
+            and not is_shared_cache(caches[settings.LOGIN_FAILED_CACHE])):
+        # each worker would count the tries made to it alone
+        logger.warning('LOGIN_FAILED_CACHE %r is not shared by the processes, '
+                       'counting the failed logins in the database.',
+                       settings.LOGIN_FAILED_CACHE)
+        return DatabaseLoginThrottle()
+    return throttle_class()
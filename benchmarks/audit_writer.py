@@ -0,0 +1,64 @@
+"""Cost of writing CustomLogger rows one by one and through the AuditWriter
+
+Times the `AUDIT_ASYNC = False` path, one INSERT per row, against queueing
+the same rows with `AuditWriter.log` and writing them with `flush`. The rows
+are written to a test database, created and destroyed by the script. Run
+from the repository root:
+
+    python benchmarks/audit_writer.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.admin.models import ADDITION  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from apps.accounts.audit import AuditWriter  # noqa: E402
+from apps.accounts.models import CustomLogger  # noqa: E402
+
+
+def timed(name, rows, write):
+    CustomLogger.objects.all().delete()
+    started = time.perf_counter()
+    write()
+    seconds = time.perf_counter() - started
+    assert CustomLogger.objects.count() == rows
+    print(f'{name:>12}: {seconds / rows * 1e6:8.1f} µs per row')
+
+
+def main(rows=5000):
+    fields = {'action': 'changed', 'user': 'user', 'action_flag': ADDITION}
+    writer = AuditWriter(settings.AUDIT_BATCH_SIZE, settings.AUDIT_FLUSH_INTERVAL,
+                         settings.AUDIT_MAX_PENDING, settings.AUDIT_MAX_RETRIES)
+    writer.thread = True  # flushed below, in this thread
+
+    def one_by_one():
+        for _ in range(rows):
+            CustomLogger.objects.create(**fields)
+
+    def batched():
+        for number in range(rows):
+            writer.log(**fields)
+            if (number + 1) % writer.batch_size == 0:
+                writer.flush()
+        writer.flush()
+
+    timed('one by one', rows, one_by_one)
+    timed('AuditWriter', rows, batched)
+
+
+if __name__ == '__main__':
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        main()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,55 @@
+"""Per-request cost of the LoginRequiredMiddleware exemption check
+
+Compares the check of the baseline, which resolved the path again and tried
+each ignored view name and path regex in turn, with `is_public`, which takes
+the view name Django already resolved. Run from the repository root:
+
+    python benchmarks/login_required.py
+"""
+import os
+import re
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.urls import resolve  # noqa: E402
+
+from apps.accounts.middleware import is_public  # noqa: E402
+
+BASELINE_PATHS = [re.compile(url) for url in [
+    settings.LOGIN_URL, *getattr(settings, 'LOGIN_REQUIRED_IGNORE_PATHS', [])]]
+BASELINE_VIEW_NAMES = list(getattr(settings, 'LOGIN_REQUIRED_IGNORE_VIEW_NAMES', []))
+
+
+def baseline_is_public(path):
+    resolver = resolve(path)
+    views = ((name == resolver.view_name) for name in BASELINE_VIEW_NAMES)
+    return any(views) or any(url.match(path) for url in BASELINE_PATHS)
+
+
+def main(number=20000):
+    # captcha keys differ on every request, as the paths of real traffic do
+    paths = ['/admin/login/', '/admin/Guards/guardtablet/', '/people/reports/1',
+             *(f'/captcha/image/{uuid.uuid4().hex}/' for _ in range(number))]
+    matches = [(path, resolve(path)) for path in paths]
+    for path, match in matches:
+        assert baseline_is_public(path) == is_public(path, match.view_name), path
+
+    for name, check in [
+            ('baseline', lambda: [baseline_is_public(path) for path, match in matches]),
+            ('is_public', lambda: [is_public(path, match.view_name)
+                                   for path, match in matches])]:
+        seconds = min(timeit.repeat(check, number=1, repeat=5))
+        print(f'{name:>10}: {seconds / len(matches) * 1e6:6.2f} µs per request')
+
+
+if __name__ == '__main__':
+    main()
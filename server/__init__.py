@@ -72,7 +72,7 @@ class ModeTeHeAdminSite(admin.AdminSite):
 
         # Sort the models alphabetically within each app.
         for app in app_list:
-            app['models'].sort(key=lambda x: ordering[x['name']])
+            app['models'].sort(key=lambda x: ordering.get(x['name'], len(ordering)))
 
         return app_list
 
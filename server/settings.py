@@ -75,6 +75,7 @@ MIDDLEWARE = [
 # custom middlewares
 MIDDLEWARE += [
     'apps.accounts.middleware.LoginRequiredMiddleware',
+    'apps.accounts.middleware.AuditUserMiddleware',
     'apps.accounts.middleware.PasswordValidationMiddleware',
     'apps.accounts.middleware.LoginFailedMiddleware',
 ]
@@ -141,8 +142,44 @@ SESSION_COOKIE_AGE = 700 * 60  # SESSION_EXPIRY in seconds
 
 PASSWORD_EXPIRE_INTERVAL_DAYS = 45
 
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    # what the workers must agree on, a file based cache shared by the ones of this host
+    'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+               'LOCATION': config('SHARED_CACHE_DIR', default=str(BASE_DIR / 'cache'))},
+}
+
 LOGIN_FAILED_LIMIT = 3
 LOGIN_FAILED_COOLDOWN = (5 * 60)  # seconds
+LOGIN_FAILED_WINDOW = (24 * 60 * 60)  # seconds a failed try is remembered
+# or 'apps.accounts.throttling.DatabaseLoginThrottle'
+LOGIN_FAILED_BACKEND = 'apps.accounts.throttling.CacheLoginThrottle'
+LOGIN_FAILED_CACHE = 'shared'  # shared by the workers, else the tries are counted in the DB
+
+AUDIT_ASYNC = True  # write the CustomLogger rows in batches from a thread
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL = 2  # seconds
+AUDIT_MAX_PENDING = 10000  # rows kept while the database is unreachable
+AUDIT_MAX_RETRIES = 5  # failed flushes before a batch is written row by row
+
+ADMIN_COUNT_CACHE_TIMEOUT = 5 * 60  # seconds a changelist count is reused
+SEARCH_RANKED_RESULTS = 200  # best search matches listed first, the rest follow
+AUTOCOMPLETE_CACHE_TIMEOUT = 30  # seconds the choices of a term are reused per garrison
+REFERENCE_DATA_CACHE = 'shared'  # holds the versions of the reference tables, not locmem
+REFERENCE_DATA_CHECK_INTERVAL = 5  # seconds before a process checks for changes made elsewhere
+EXPORT_CHUNK_SIZE = 2000  # rows of an export read and converted together
+
+SOLDIER_SERVICE_MONTHS = 21  # before surpluses and diminutions
+SOLDIER_REPORT_STREAM_LIMIT = 100  # larger selections are rendered in the background
+SOLDIER_REPORT_JOB_TIMEOUT = 10 * 60  # seconds without progress before a job counts as failed
+SOLDIER_IMPORT_CHUNK_SIZE = 500  # rows of an imported file validated and inserted together
+SOLDIER_IMPORT_ERRORS_SHOWN = 100  # the others are in the downloadable error report
+
+INVENTORY_ROWS_SHOWN = 500  # rows of the inventory of a day listed, the export has them all
+
+GUARD_SHIFT_HOURS = 2  # length of the shifts of a generated roster, divides 24
+GUARD_REST_HOURS = 4  # between two shifts of one military police
+GUARD_ROSTER_HISTORY_DAYS = 7  # shifts counted to rotate the night shifts
 
 CAPTCHA_IMAGE_SIZE = [150, 38]
 CAPTCHA_FONT_SIZE = 22
@@ -192,6 +229,13 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"
 
+# not served publicly, see people:report_job_file
+REPORTS_ROOT = BASE_DIR / "reports"
+
+# archived CustomLogger months, see the archive_logs command
+LOG_ARCHIVE_ROOT = BASE_DIR / "log-archives"
+LOG_RETENTION_MONTHS = 12
+
 
 JALALI_DATE_DEFAULTS = {
     'Strftime': {